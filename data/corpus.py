@@ -0,0 +1,433 @@
+#data/corpus.py
+import multiprocessing
+import os
+from collections.abc import Mapping, Sequence
+from concurrent.futures import ProcessPoolExecutor
+from logging import getLogger
+from pathlib import Path
+from typing import Dict, Any, List, Iterable, Iterator
+import numpy as np
+from data.data_parser import Article, Entity, Relation, iter_chunks, _chunk_fields, article_detail
+
+logger = getLogger(__name__)
+
+_PARALLEL_MIN_BYTES = 16 * 1024 * 1024
+
+
+class _Strings:
+    """字符串驻留表：值 → 整数 ID"""
+
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+        self.values: List[str] = []
+
+    def __call__(self, value: str) -> int:
+        i = self.ids.get(value)
+        if i is None:
+            i = self.ids[value] = len(self.values)
+            self.values.append(value)
+        return i
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+
+class Corpus(Sequence):
+    """
+    列式语料：标题 / 摘要按文档存放，实体与关系存为 NumPy 列，
+    实体文本、类型、MeSH 与关系名驻留为字符串表，列中只存 ID。
+    第 i 篇文档的实体为 ent_*[ent_offsets[i]:ent_offsets[i + 1]]，关系同理；
+    每篇文档的关系中前 rel_text_counts[i] 个来自文本，之后是 join_relations 连接的 TSV 关系。
+    corpus[i] 返回 DocView，expected_entities 等派生字段在访问时才计算。
+    """
+
+    def __init__(self):
+        self.pmids: List[str] = []
+        self.titles: List[str] = []
+        self.abstracts: List[str] = []
+        self.texts, self.etypes, self.meshes, self.rel_types = _Strings(), _Strings(), _Strings(), _Strings()
+        self._ent: List[tuple] = []    # 构建期间的 (text, type, mesh, start, end)
+        self._rel: List[tuple] = []    # 构建期间的 (head, tail, type)
+        self._ent_counts: List[int] = []
+        self._rel_counts: List[int] = []
+        self._rel_text_counts: List[int] = []
+        # 来源文件：第 k 个文件的文档为 file_offsets[k]:file_offsets[k + 1]
+        self.files: List[str] = []
+        self.file_offsets = np.zeros(1, dtype=np.int64)
+
+    # ---------- 构建 ----------
+    def add(self, pmid: str, title: str, abstract: str, entities: Iterable[tuple], relations: Iterable[tuple],
+            text_relations: int | None = None) -> None:
+        """
+        实体为 (text, etype, mesh, start, end)，关系为 (head_mesh, tail_mesh, relation)；
+        text_relations 为其中来自文本的前几个关系数，默认全部
+        """
+        self.pmids.append(pmid)
+        self.titles.append(title)
+        self.abstracts.append(abstract)
+        n = len(self._ent)
+        self._ent.extend((self.texts(t), self.etypes(e), self.meshes(m), s, en) for t, e, m, s, en in entities)
+        self._ent_counts.append(len(self._ent) - n)
+        n = len(self._rel)
+        self._rel.extend((self.meshes(h), self.meshes(t), self.rel_types(r)) for h, t, r in relations)
+        self._rel_counts.append(len(self._rel) - n)
+        self._rel_text_counts.append(self._rel_counts[-1] if text_relations is None else text_relations)
+
+    def freeze(self) -> "Corpus":
+        """把构建期间的行转为列数组"""
+        ent = np.array(self._ent, dtype=np.int64).reshape(-1, 5)
+        self.ent_text, self.ent_type, self.ent_mesh = (ent[:, i].astype(np.int32) for i in range(3))
+        self.ent_start, self.ent_end = ent[:, 3].astype(np.int32), ent[:, 4].astype(np.int32)
+        rel = np.array(self._rel, dtype=np.int32).reshape(-1, 3)
+        self.rel_head, self.rel_tail, self.rel_type = rel[:, 0].copy(), rel[:, 1].copy(), rel[:, 2].copy()
+        self.ent_offsets = np.concatenate([[0], np.cumsum(self._ent_counts, dtype=np.int64)])
+        self.rel_offsets = np.concatenate([[0], np.cumsum(self._rel_counts, dtype=np.int64)])
+        self.rel_text_counts = np.array(self._rel_text_counts, dtype=np.int64)
+        docs = np.arange(len(self.pmids), dtype=np.int32)
+        self.ent_doc = np.repeat(docs, self._ent_counts)
+        self.rel_doc = np.repeat(docs, self._rel_counts)
+        self._ent, self._rel, self._ent_counts, self._rel_counts, self._rel_text_counts = [], [], [], [], []
+        return self
+
+    @classmethod
+    def from_file(cls, source) -> "Corpus":
+        """逐行读取 PubTator 文件，不构建 Article；文档顺序与 iter_pubtator 一致"""
+        corpus = cls()
+        for chunk in iter_chunks(source):
+            corpus.add(*_chunk_fields(chunk))
+        if isinstance(source, (str, Path)):
+            corpus.files = [Path(source).name]
+            corpus.file_offsets = np.array([0, len(corpus.pmids)], dtype=np.int64)
+        return corpus.freeze()
+
+    @classmethod
+    def concat(cls, parts: Sequence["Corpus"]) -> "Corpus":
+        """按顺序合并多个语料：字符串表合并后把各部分的 ID 重新映射，文档与文件范围依次拼接"""
+        merged = cls()
+        ent_cols: Dict[str, list] = {k: [] for k in ('text', 'type', 'mesh', 'start', 'end')}
+        rel_cols: Dict[str, list] = {k: [] for k in ('head', 'tail', 'type')}
+        ent_counts, rel_counts, text_counts, file_counts = [], [], [], []
+        for part in parts:
+            remap = {name: np.array([getattr(merged, name)(v) for v in getattr(part, name).values] or [0],
+                                    dtype=np.int32)
+                     for name in ('texts', 'etypes', 'meshes', 'rel_types')}
+            ent_cols['text'].append(remap['texts'][part.ent_text])
+            ent_cols['type'].append(remap['etypes'][part.ent_type])
+            ent_cols['mesh'].append(remap['meshes'][part.ent_mesh])
+            ent_cols['start'].append(part.ent_start)
+            ent_cols['end'].append(part.ent_end)
+            rel_cols['head'].append(remap['meshes'][part.rel_head])
+            rel_cols['tail'].append(remap['meshes'][part.rel_tail])
+            rel_cols['type'].append(remap['rel_types'][part.rel_type])
+            merged.pmids += part.pmids
+            merged.titles += part.titles
+            merged.abstracts += part.abstracts
+            ent_counts.append(np.diff(part.ent_offsets))
+            rel_counts.append(np.diff(part.rel_offsets))
+            text_counts.append(part.rel_text_counts)
+            merged.files += part.files
+            file_counts.append(np.diff(part.file_offsets))
+
+        def cat(arrays, dtype):
+            return np.concatenate(arrays).astype(dtype) if arrays else np.zeros(0, dtype=dtype)
+        merged.ent_text, merged.ent_type, merged.ent_mesh, merged.ent_start, merged.ent_end = (
+            cat(ent_cols[k], np.int32) for k in ('text', 'type', 'mesh', 'start', 'end'))
+        merged.rel_head, merged.rel_tail, merged.rel_type = (cat(rel_cols[k], np.int32) for k in ('head', 'tail', 'type'))
+        ent_counts, rel_counts = cat(ent_counts, np.int64), cat(rel_counts, np.int64)
+        merged.ent_offsets = np.concatenate([[0], np.cumsum(ent_counts)])
+        merged.rel_offsets = np.concatenate([[0], np.cumsum(rel_counts)])
+        merged.rel_text_counts = cat(text_counts, np.int64)
+        merged.file_offsets = np.concatenate([[0], np.cumsum(cat(file_counts, np.int64))])
+        docs = np.arange(len(merged.pmids), dtype=np.int32)
+        merged.ent_doc, merged.rel_doc = np.repeat(docs, ent_counts), np.repeat(docs, rel_counts)
+        return merged
+
+    def join_relations(self, pmids: List[str], types: List[str], heads: List[str], tails: List[str]) -> int:
+        """
+        把 TSV 关系按 PMID 哈希连接到文档上（同一 PMID 出现在多篇文档时每篇都加），
+        追加在各文档原有关系之后（rel_text_counts 不变）。返回找不到 PMID 而被跳过的行数。
+        """
+        positions: Dict[str, List[int]] = {}
+        for i, pmid in enumerate(self.pmids):
+            positions.setdefault(pmid, []).append(i)
+        rows, docs, skipped = [], [], 0
+        for i, pmid in enumerate(pmids):
+            hit = positions.get(pmid)
+            if hit is None:
+                skipped += 1
+                continue
+            rows += [i] * len(hit)
+            docs += hit
+        if rows:
+            head = np.array([self.meshes(heads[i]) for i in rows], dtype=np.int32)
+            tail = np.array([self.meshes(tails[i]) for i in rows], dtype=np.int32)
+            rtype = np.array([self.rel_types(types[i]) for i in rows], dtype=np.int32)
+            doc = np.array(docs, dtype=np.int32)
+            # 原有关系在前，TSV 关系在后，按文档稳定排序后重建偏移
+            all_doc = np.concatenate([self.rel_doc, doc])
+            order = np.argsort(all_doc, kind='stable')
+            self.rel_doc = all_doc[order]
+            self.rel_head = np.concatenate([self.rel_head, head])[order]
+            self.rel_tail = np.concatenate([self.rel_tail, tail])[order]
+            self.rel_type = np.concatenate([self.rel_type, rtype])[order]
+            self.rel_offsets = np.concatenate([[0], np.cumsum(np.bincount(self.rel_doc, minlength=len(self)))])
+        return skipped
+
+    def select(self, docs: slice) -> "Corpus":
+        """连续文档范围的子语料（共享字符串表）"""
+        start, stop, _ = docs.indices(len(self))
+        sub = Corpus()
+        sub.texts, sub.etypes, sub.meshes, sub.rel_types = self.texts, self.etypes, self.meshes, self.rel_types
+        sub.pmids, sub.titles, sub.abstracts = self.pmids[start:stop], self.titles[start:stop], self.abstracts[start:stop]
+        e0, e1 = int(self.ent_offsets[start]), int(self.ent_offsets[stop])
+        r0, r1 = int(self.rel_offsets[start]), int(self.rel_offsets[stop])
+        for name in ('ent_text', 'ent_type', 'ent_mesh', 'ent_start', 'ent_end'):
+            setattr(sub, name, getattr(self, name)[e0:e1])
+        for name in ('rel_head', 'rel_tail', 'rel_type'):
+            setattr(sub, name, getattr(self, name)[r0:r1])
+        sub.ent_doc, sub.rel_doc = self.ent_doc[e0:e1] - start, self.rel_doc[r0:r1] - start
+        sub.ent_offsets = self.ent_offsets[start:stop + 1] - e0
+        sub.rel_offsets = self.rel_offsets[start:stop + 1] - r0
+        sub.rel_text_counts = self.rel_text_counts[start:stop]
+        return sub
+
+    def file_range(self, k: int) -> slice:
+        return slice(int(self.file_offsets[k]), int(self.file_offsets[k + 1]))
+
+    # ---------- 访问 ----------
+    def __len__(self) -> int:
+        return len(self.pmids)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [DocView(self, j) for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return DocView(self, i)
+
+    def entity_range(self, i: int) -> slice:
+        return slice(int(self.ent_offsets[i]), int(self.ent_offsets[i + 1]))
+
+    def relation_range(self, i: int) -> slice:
+        return slice(int(self.rel_offsets[i]), int(self.rel_offsets[i + 1]))
+
+    def article(self, i: int) -> Article:
+        """
+        还原为 Article（会计算全部派生字段）。
+        与 ChemDisGeneParser 一致：expected_relations 只含文本中的关系，TSV 关系构建后再追加到 res
+        """
+        view = self[i]
+        res = [Relation(**r) for r in view['res']]
+        n = int(self.rel_text_counts[i if i >= 0 else i + len(self)])
+        art = Article(view['pmid'], view['title'], view['abstract'],
+                      [Entity(**e) for e in view['entities']], res[:n])
+        art.res.extend(res[n:])
+        return art
+
+    # ---------- 统计与查找 ----------
+    def stats(self) -> Dict[str, Any]:
+        """文档 / 实体 / 关系总数，及每个实体类型、关系类型的数量、不同 MeSH 数和出现的文档数"""
+        n_docs, n_types = len(self), len(self.etypes)
+        per_doc = np.diff(self.ent_offsets)
+        by_type = np.bincount(self.ent_type, minlength=n_types)
+        # (类型, MeSH) 与 (类型, 文档) 去重计数；字符串表可能与其他语料共享（select），计数只看本语料的列
+        mesh_pairs = np.unique(self.ent_type.astype(np.int64) * max(len(self.meshes), 1) + self.ent_mesh)
+        doc_pairs = np.unique(self.ent_type.astype(np.int64) * max(n_docs, 1) + self.ent_doc)
+        uniq_mesh = np.bincount(mesh_pairs // max(len(self.meshes), 1), minlength=n_types)
+        uniq_docs = np.bincount(doc_pairs // max(n_docs, 1), minlength=n_types)
+        rel_by_type = np.bincount(self.rel_type, minlength=len(self.rel_types))
+        mesh_ids = np.unique(np.concatenate([self.ent_mesh, self.rel_head, self.rel_tail]))
+        return {
+            'documents': n_docs,
+            'entities': int(len(self.ent_type)),
+            'relations': int(len(self.rel_type)),
+            'entities_per_doc': {'mean': float(per_doc.mean()) if n_docs else 0.,
+                                 'max': int(per_doc.max()) if n_docs else 0},
+            'surfaces': int(len(np.unique(self.ent_text))),
+            'mesh_ids': int(len(mesh_ids)),
+            'entity_types': {name: {'count': int(by_type[t]), 'mesh_ids': int(uniq_mesh[t]),
+                                    'documents': int(uniq_docs[t])}
+                             for t, name in enumerate(self.etypes.values) if by_type[t]},
+            'relation_types': {name: int(rel_by_type[t]) for t, name in enumerate(self.rel_types.values)
+                               if rel_by_type[t]},
+        }
+
+    def surface_mesh(self) -> Dict[str, str]:
+        """
+        整个语料的 小写表面形式 → MeSH：取该形式第一次出现的文档中、同一写法的全部 MeSH（排序后用 | 连接）
+        """
+        if not len(self.ent_text):
+            return {}
+        lower = _Strings()
+        lower_of = np.array([lower(t.lower()) for t in self.texts.values], dtype=np.int64)
+        keys = lower_of[self.ent_text]
+        _, first = np.unique(keys, return_index=True)
+        # 第一次出现所在的 (文档, 原始写法)
+        n_text = len(self.texts)
+        pair = self.ent_doc.astype(np.int64) * n_text + self.ent_text
+        chosen = np.isin(pair, pair[first])
+        meshes: Dict[str, set] = {}
+        for k, m in zip(keys[chosen].tolist(), self.ent_mesh[chosen].tolist()):
+            meshes.setdefault(lower.values[k], set()).add(self.meshes.values[m])
+        return {text: '|'.join(sorted(ms)) for text, ms in meshes.items()}
+
+
+def read_tsv(path: str) -> tuple[List[str], List[str], List[str], List[str]]:
+    """ChemDisGene 关系 TSV（pmid, 关系, head, tail）→ 四列；格式不对的行跳过"""
+    cols: tuple[list, list, list, list] = ([], [], [], [])
+    with open(path, newline='', encoding='utf-8') as f:
+        for line in f:
+            parts = line.rstrip('\r\n').split('\t')
+            if len(parts) == 4:
+                for col, value in zip(cols, parts):
+                    col.append(value)
+    return cols
+
+
+def load_files(paths: Sequence[Path], tsv_paths: Sequence[Path] = ()) -> Corpus:
+    """
+    解析多个 PubTator 文件与 TSV，合并为一个语料并按 PMID 连接 TSV 关系。
+    文件多于一个且总大小超过 _PARALLEL_MIN_BYTES 时在进程池中并行解析（每个文件一个任务），
+    结果按 paths 的顺序合并；小数据集进程启动开销更大，直接在本进程解析。
+    """
+    paths, tsv_paths = [str(p) for p in paths], [str(p) for p in tsv_paths]
+    workers = min(len(paths) + len(tsv_paths), os.cpu_count() or 1)
+    size = sum(os.path.getsize(p) for p in (*paths, *tsv_paths))
+    if workers > 1 and size >= _PARALLEL_MIN_BYTES:
+        # spawn：避免 fork 复制 Flask 与实验事件循环的线程
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            parts = [pool.submit(Corpus.from_file, p) for p in paths]
+            tables = [pool.submit(read_tsv, p) for p in tsv_paths]
+            parts, tables = [f.result() for f in parts], [f.result() for f in tables]
+    else:
+        parts = [Corpus.from_file(p) for p in paths]
+        tables = [read_tsv(p) for p in tsv_paths]
+    corpus = parts[0] if len(parts) == 1 else Corpus.concat(parts)
+    for tsv_path, (pmids, types, heads, tails) in zip(tsv_paths, tables):
+        skipped = corpus.join_relations(pmids, types, heads, tails)
+        if skipped:
+            logger.info("%s: %d relations with a PMID not in the dataset were skipped", Path(tsv_path).name, skipped)
+    return corpus
+
+
+class CorpusFile:
+    """
+    合并语料中一个来源文件的文档，接口与 DocIndex 相同（docs / page / article / get），
+    多文件数据集的列表页和详情页用它代替逐文件的文档索引。path / stamp 供倒排索引使用。
+    """
+
+    def __init__(self, corpus: Corpus, k: int, path: Path, stamp: tuple = ()):
+        self.corpus = corpus
+        self.path = path
+        self.stamp = stamp
+        # 同一 PMID 出现多次时与 DocIndex 一致：保留第一次的位置、最后一次的内容
+        self._position: Dict[str, int] = {}
+        for i in range(*corpus.file_range(k).indices(len(corpus))):
+            self._position[corpus.pmids[i]] = i
+        ents, rels = np.diff(corpus.ent_offsets).tolist(), np.diff(corpus.rel_offsets).tolist()
+        self.docs = [{'pmid': pmid, 'title': corpus.titles[i], 'entities_cnt': ents[i], 'relations_cnt': rels[i]}
+                     for pmid, i in self._position.items()]
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    def __contains__(self, pmid: str) -> bool:
+        return pmid in self._position
+
+    def article(self, pmid: str) -> Article | None:
+        i = self._position.get(pmid)
+        return None if i is None else self.corpus.article(i)
+
+    def get(self, pmid: str) -> dict:
+        """与 CIDParser.get 相同的详情结构，不存在时返回 {}"""
+        art = self.article(pmid)
+        return article_detail(art) if art else {}
+
+    def page(self, offset: int, limit: int) -> List[Dict[str, Any]]:
+        return self.docs[offset:offset + limit]
+
+
+class DocView(Mapping):
+    """
+    语料中一篇文档的只读视图，键与 asdict(Article) 相同。
+    派生字段（text、labels、expected_entities、expected_relations、entity_link）在访问时计算。
+    """
+    __slots__ = ('corpus', 'i')
+    _KEYS = tuple(Article.__dataclass_fields__)
+
+    def __init__(self, corpus: Corpus, i: int):
+        self.corpus = corpus
+        self.i = i
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._KEYS)
+
+    def __len__(self) -> int:
+        return len(self._KEYS)
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self._KEYS:
+            raise KeyError(key)
+        return getattr(self, '_' + key)()
+
+    def _columns(self):
+        c = self.corpus
+        r = c.entity_range(self.i)
+        return c.ent_text[r].tolist(), c.ent_type[r].tolist(), c.ent_mesh[r].tolist(), r
+
+    def _pmid(self):
+        return self.corpus.pmids[self.i]
+
+    def _title(self):
+        return self.corpus.titles[self.i]
+
+    def _abstract(self):
+        return self.corpus.abstracts[self.i]
+
+    def _text(self):
+        return f'{self._title()} {self._abstract()}'
+
+    def _entities(self):
+        c = self.corpus
+        texts, types, meshes, r = self._columns()
+        return [{'pmid': self._pmid(), 'text': c.texts.values[t], 'etype': c.etypes.values[e],
+                 'mesh': c.meshes.values[m], 'start': s, 'end': en}
+                for t, e, m, s, en in zip(texts, types, meshes, c.ent_start[r].tolist(), c.ent_end[r].tolist())]
+
+    def _res(self):
+        c = self.corpus
+        r = c.relation_range(self.i)
+        return [{'pmid': self._pmid(), 'head_mesh': c.meshes.values[h], 'tail_mesh': c.meshes.values[t],
+                 'relation': c.rel_types.values[k]}
+                for h, t, k in zip(c.rel_head[r].tolist(), c.rel_tail[r].tolist(), c.rel_type[r].tolist())]
+
+    def _labels(self):
+        c = self.corpus
+        _, types, _, _ = self._columns()
+        return ','.join(sorted({c.etypes.values[e] for e in types if c.etypes.values[e]}))
+
+    def _expected_entities(self):
+        c = self.corpus
+        texts, types, _, _ = self._columns()
+        expected: Dict[str, List[str]] = {}
+        for t, e in zip(texts, types):
+            if c.etypes.values[e]:
+                expected.setdefault(c.etypes.values[e], []).append(c.texts.values[t])
+        return expected
+
+    def _expected_relations(self):
+        """与 Article 一致，只含文本中的关系，不含 TSV 关系"""
+        c = self.corpus
+        start = int(c.rel_offsets[self.i])
+        r = slice(start, start + int(c.rel_text_counts[self.i]))
+        return [(c.meshes.values[h], c.meshes.values[t]) for h, t in zip(c.rel_head[r].tolist(), c.rel_tail[r].tolist())]
+
+    def _entity_link(self):
+        c = self.corpus
+        texts, _, meshes, _ = self._columns()
+        link: Dict[str, set] = {}
+        for t, m in zip(texts, meshes):
+            link.setdefault(c.texts.values[t], set()).add(c.meshes.values[m])
+        return {text: sorted(ms) if len(ms) > 1 else next(iter(ms)) for text, ms in link.items()}
@@ -1,13 +1,58 @@
+from data.corpus import Corpus, CorpusFile, load_files
 from data.data_parser import CIDParser,ChemDisGeneParser
+from data.doc_index import DocIndex, doc_index, _stamp
+from data.profile import profile_files, summarize
+from utils.text_index import TextIndex, text_index
 
+import os
+import threading
 from pathlib import Path
 
 DATA_ROOT = Path('./data')  # 根目录
+
+# 目录扫描缓存：{数据集目录: ({目录: mtime_ns}, txt 文件, tsv 文件)}
+_scans: dict = {}
+# 合并语料缓存：{数据集目录: (stamp, Corpus)}
+_corpora: dict = {}
+# 多文件数据集中单个文件的视图：{txt 路径: CorpusFile}，所属语料重新加载后重建
+_corpus_files: dict = {}
+_lock = threading.Lock()
+
+def _dir_stamps(dirs) -> dict | None:
+    try:
+        return {d: os.stat(d).st_mtime_ns for d in dirs}
+    except OSError:
+        return None
+
+def scan_dataset(root: Path) -> tuple[list[Path], list[Path]]:
+    """
+    数据集目录下的 (顶层 .txt, 全部子目录中的 .tsv)，均已排序。
+    结果按各级目录的 mtime 缓存：增删文件会改变所在目录的 mtime，未变化时不再 rglob。
+    """
+    key = str(root)
+    with _lock:
+        hit = _scans.get(key)
+    if hit and _dir_stamps(hit[0]) == hit[0]:
+        return hit[1], hit[2]
+    dirs, txt_files, tsv_files = [], [], []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        dirs.append(dirpath)
+        for name in filenames:
+            if dirpath == str(root) and name.endswith('.txt'):
+                txt_files.append(Path(dirpath) / name)
+            elif name.endswith('.tsv'):
+                tsv_files.append(Path(dirpath) / name)
+    stamps = _dir_stamps(dirs) or {}
+    txt_files.sort()
+    tsv_files.sort()
+    with _lock:
+        _scans[key] = (stamps, txt_files, tsv_files)
+    return txt_files, tsv_files
+
 def has_tsv_in_tree(root: Path) -> bool:
     """root 目录（含子目录）里只要有 ≥1 个 .tsv 就返回 True"""
-    for p in root.rglob('*.tsv'):
-        return True
-    return False
+    return bool(scan_dataset(root)[1])
 
 def load_parser(dataset: str, file_name: str):
     base_dir = DATA_ROOT / dataset
@@ -15,17 +60,98 @@ def load_parser(dataset: str, file_name: str):
     if not base_dir.exists():
         return None
     # 1. 整个数据集目录里只要出现任意 .tsv → 走关系解析
-    if has_tsv_in_tree(base_dir):
+    tsv_files = scan_dataset(base_dir)[1]
+    if tsv_files:
         # 可以一次性把目录里所有 tsv 合并解析
-        tsv_files = sorted(base_dir.rglob('*.tsv'))
-        parser=ChemDisGeneParser(txt_path.read_text(encoding='utf-8'),tsv_files)
+        parser=ChemDisGeneParser.from_file(txt_path, tsv_paths=tsv_files)
         return parser
     # 2. 没有 tsv → 原 txt 解析
     if txt_path.exists():
-        parser=CIDParser(txt_path.read_text(encoding='utf-8'))
+        parser=CIDParser.from_file(txt_path)
         return parser
     return None
 
+def load_index(dataset: str, file_name: str) -> DocIndex | CorpusFile | None:
+    """
+    数据集文件的文档列表（标题 + 计数）与按 PMID 读取详情，列表和详情页用它代替 load_parser。
+    多文件数据集（多个 .txt，或带 .tsv 关系）用 load_corpus 并行解析全部文件、按 PMID 连接关系后缓存，
+    返回其中该文件的视图，切换文件不再重新解析；只有一个 .txt 时用文档索引，只读取需要的那一篇。
+    """
+    base_dir = DATA_ROOT / dataset
+    txt_path = base_dir / file_name
+    if not txt_path.is_file():
+        return None
+    txt_files, tsv_files = scan_dataset(base_dir)
+    if txt_path not in txt_files or len(txt_files) + len(tsv_files) == 1:
+        return doc_index(txt_path, tsv_files)
+    corpus = load_corpus(dataset)
+    key = str(txt_path)
+    with _lock:
+        view = _corpus_files.get(key)
+    if view is None or view.corpus is not corpus:
+        view = CorpusFile(corpus, corpus.files.index(txt_path.name), txt_path, _stamp(txt_path, tsv_files))
+        with _lock:
+            _corpus_files[key] = view
+    return view
+
+def load_search_index(dataset: str, file_name: str) -> TextIndex | None:
+    """
+    数据集文件的倒排索引，文档位置与 load_index 的 docs 一致。
+    文档索引以字节范围为各文档的标识，增量重建时不必重新读取文本；合并语料的视图按文本哈希比较。
+    收录标题、摘要、PMID、实体文本与 MeSH，可用 title: / abstract: / entities: / mesh: 限定字段。
+    """
+    index = load_index(dataset, file_name)
+    if index is None:
+        return None
+
+    def text(i):
+        art = index.article(index.docs[i]['pmid'])
+        return {'pmid': art.pmid, 'title': art.title, 'abstract': art.abstract,
+                'entities': ' '.join(e.text for e in art.entities),
+                'mesh': ' '.join(e.mesh for e in art.entities)}
+
+    def key(i):
+        doc = index.docs[i]
+        return f"{doc['pmid']}:{doc['offset']}:{doc['length']}"
+
+    return text_index(index.path, index.stamp, len(index), text, key if isinstance(index, DocIndex) else None)
+
+def load_profile(dataset: str, file_name: str | None = None) -> dict | None:
+    """
+    数据集统计：{'dataset', 'files': {文件名: 统计}, 'total': 可加总的计数}。
+    file_name 为空时统计数据集下全部 .txt；与 load_parser 一样合并目录中 .tsv 的关系。
+    """
+    base_dir = DATA_ROOT / dataset
+    if not dataset or not base_dir.is_dir():
+        return None
+    txt_files, tsv_files = scan_dataset(base_dir)
+    paths = [base_dir / file_name] if file_name else txt_files
+    if not all(p.is_file() for p in paths):
+        return None
+    profiles = profile_files(paths, tsv_files)
+    return {'dataset': dataset, 'files': profiles, 'total': summarize(profiles)}
+
+def load_corpus(dataset: str) -> Corpus | None:
+    """
+    整个数据集（全部 .txt 与 .tsv）合并为一个列式语料：各文件在进程池中并行解析，
+    TSV 关系按 PMID 哈希连接，文本中没有的 PMID 跳过。按各文件的 mtime / size 缓存。
+    """
+    base_dir = DATA_ROOT / dataset
+    if not dataset or not base_dir.is_dir():
+        return None
+    txt_files, tsv_files = scan_dataset(base_dir)
+    if not txt_files:
+        return None
+    stamp = tuple(_stamp(p, tsv_files) for p in txt_files)
+    with _lock:
+        hit = _corpora.get(str(base_dir))
+    if hit and hit[0] == stamp:
+        return hit[1]
+    corpus = load_files(txt_files, tsv_files)
+    with _lock:
+        _corpora[str(base_dir)] = (stamp, corpus)
+    return corpus
+
 def load_datasets():
     """
     返回 dict:
@@ -38,9 +164,7 @@ def load_datasets():
     for ds_dir in DATA_ROOT.iterdir():
         if ds_dir.is_dir():
             # 相对路径字符串，排序
-            datasets[ds_dir.name] = sorted([
-                p.name for p in ds_dir.glob('*.txt')
-            ])
+            datasets[ds_dir.name] = [p.name for p in scan_dataset(ds_dir)[0]]
     return datasets
 
 
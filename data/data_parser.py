@@ -2,7 +2,9 @@
 # -*- coding: utf-8 -*-
 from collections import defaultdict
 import re
-from dataclasses import dataclass, asdict, field
+from dataclasses import dataclass, asdict, field, is_dataclass
+from pathlib import Path
+from typing import Iterable, Iterator, List
 
 class DataParser:
     def __init__(self, text: str):
@@ -47,7 +49,14 @@ class Relation:
     tail_mesh: str
     relation: str = 'CID'  # 默认化学-疾病关系
 
-@dataclass
+def _plain(value):
+    """与 asdict 的结果一致：实体 / 关系 dataclass 转为 dict"""
+    if isinstance(value, list):
+        return [asdict(v) if is_dataclass(v) else v for v in value]
+    return value
+
+
+@dataclass(slots=True)
 class Article:
     pmid: str
     title: str
@@ -85,15 +94,18 @@ class Article:
             """
             像 dict.get 一样访问字段。
             支持嵌套 key，例如 get('entities.0.name')。
+            只转换访问路径上的第一层字段，不对整篇文档做 asdict。
             """
-            d = asdict(self)
             if '.' not in key:
-                return d.get(key, default)
+                value = getattr(self, key, default) if key in self.__dataclass_fields__ else default
+                return _plain(value)
 
             # 简单支持一层嵌套
             parts = key.split('.')
-            cur = d
-            for p in parts:
+            if parts[0] not in self.__dataclass_fields__:
+                return default
+            cur = _plain(getattr(self, parts[0]))
+            for p in parts[1:]:
                 if isinstance(cur, dict):
                     cur = cur.get(p, default)
                 elif isinstance(cur, list) and p.isdigit():
@@ -103,28 +115,136 @@ class Article:
                     return default
             return cur
 
+
+def _chunk_fields(lines: list) -> tuple[str, str, str, list, list]:
+    """
+    一篇文档的行 → (pmid, 标题, 摘要, 实体, 关系)，
+    实体为 (text, etype, mesh, start, end)，关系为 (head_mesh, tail_mesh, relation)
+    """
+    pmid = lines[0].split('|', 1)[0]
+    title = abstr = ''
+    entities, res = [], []
+
+    for L in lines:
+        if '|t|' in L:
+            title = L.split('|t|', 1)[1]
+        elif '|a|' in L:
+            abstr = L.split('|a|', 1)[1]
+        elif L.count('\t') == 5:
+            _, st, en, txt, etp, mesh = L.split('\t')
+            entities.append((txt, etp, mesh, int(st), int(en)))
+        elif '\tCID\t' in L:
+            _, _, chem_mesh, dis_mesh = L.split('\t')
+            res.append((chem_mesh, dis_mesh, 'CID'))
+    return pmid, title, abstr, entities, res
+
+
+def _parse_chunk(lines: list) -> Article:
+    """一篇文档的行（标题、摘要、实体、关系）→ Article"""
+    pmid, title, abstr, entities, res = _chunk_fields(lines)
+    return Article(pmid, title, abstr,
+                   [Entity(pmid, txt, etp, mesh, st, en) for txt, etp, mesh, st, en in entities],
+                   [Relation(pmid, head, tail, rel) for head, tail, rel in res])
+
+
+def iter_chunks(source) -> Iterator[list]:
+    """逐行读取，按空行切分出每篇文档的行"""
+    chunk = []
+    for line in _lines(source):
+        line = line.rstrip()
+        if line.strip():
+            chunk.append(line)
+        elif chunk:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _lines(source):
+    """source 为文件路径时逐行读取文件，否则视为可迭代的行"""
+    if isinstance(source, (str, Path)):
+        with open(source, encoding='utf-8') as f:
+            yield from f
+    else:
+        yield from source
+
+
+def iter_pubtator(source) -> Iterator[Article]:
+    """
+    流式解析 PubTator 文本：逐行读取，空行分隔文档，每解析完一篇立即 yield。
+    source: 文件路径，或任意可迭代的行（如打开的文件、str.splitlines()）
+    """
+    for chunk in iter_chunks(source):
+        yield _parse_chunk(chunk)
+
+
+def count_pubtator(source) -> int:
+    """只数文档数（空行分隔的非空块），不构建 Article"""
+    count, in_doc = 0, False
+    for line in _lines(source):
+        if line.strip():
+            if not in_doc:
+                count += 1
+            in_doc = True
+        else:
+            in_doc = False
+    return count
+
+
+def article_detail(art: Article) -> dict:
+    """文档详情页使用的结构：实体带位置，关系的头尾 MeSH 还原为本文中的实体文本与类型"""
+    # 1. 实体
+    entities = [
+        {
+            'text': e.text,
+            'type': e.etype,
+            'mesh': e.mesh,
+            'position': f'{e.start}:{e.end}'
+        }
+        for e in art.entities
+    ]
+
+    # 2. 建立 mesh→(text, type) 映射（仅当前文章）
+    ent_map = {e.mesh: (e.text, e.etype) for e in art.entities}
+
+    # 3. 关系（动态查找类型 & 关系名）
+    relations = []
+    for rel in art.res:
+        head_txt, head_type = ent_map.get(rel.head_mesh, (rel.head_mesh, 'Unknown'))
+        tail_txt, tail_type = ent_map.get(rel.tail_mesh, (rel.tail_mesh, 'Unknown'))
+        relations.append({
+            'head_entity': head_txt,
+            'head_type': head_type,
+            'head_mesh': rel.head_mesh,
+            'relationship': rel.relation,  # 不再写死 CID
+            'tail_entity': tail_txt,
+            'tail_type': tail_type,
+            'tail_mesh': rel.tail_mesh
+        })
+
+    return {
+        'doc_id': art.pmid,
+        'title': art.title,
+        'abstract': art.abstract,
+        'entities': entities,
+        'relations': relations
+    }
+
+
 class CIDParser(DataParser):
-    def __init__(self, text: str):
+    def __init__(self, text: str = None, articles: Iterable[Article] = None):
+        """text 为整个文件内容；大文件请用 from_file 逐行解析"""
         super().__init__(text)
-        chunks = re.split(r'\n\s*\n', text.strip())
-        for chk in chunks:
-            lines = [L.rstrip() for L in chk.splitlines() if L.strip()]
-            pmid = lines[0].split('|', 1)[0]
-            title = abstr = ''
-            entities, res = [], []
-
-            for L in lines:
-                if '|t|' in L:
-                    title = L.split('|t|', 1)[1]
-                elif '|a|' in L:
-                    abstr = L.split('|a|', 1)[1]
-                elif L.count('\t') == 5:
-                    _, st, en, txt, etp, mesh = L.split('\t')
-                    entities.append(Entity(pmid, txt, etp, mesh, int(st), int(en)))
-                elif '\tCID\t' in L:
-                    _, _, chem_mesh, dis_mesh = L.split('\t')
-                    res.append(Relation(pmid, chem_mesh, dis_mesh, 'CID'))
-            self.article_map[pmid]=Article(pmid, title, abstr, entities, res)
+        if articles is None:
+            articles = iter_pubtator(text.splitlines())
+        for art in articles:
+            self.article_map[art.pmid] = art
+
+    @classmethod
+    def from_file(cls, path, **kwargs):
+        """逐行读取文件构建，不把整个文件读成一个字符串"""
+        return cls(articles=iter_pubtator(path), **kwargs)
 
     def get_articles(self) -> list:
         """
@@ -137,49 +257,12 @@ class CIDParser(DataParser):
         art = self.article_map.get(doc_id)
         if not art:
             return {}
-        # 1. 实体
-        entities = [
-            {
-                'text': e.text,
-                'type': e.etype,
-                'mesh': e.mesh,
-                'position': f'{e.start}:{e.end}'
-            }
-            for e in art.entities
-        ]
-
-        # 2. 建立 mesh→(text, type) 映射（仅当前文章）
-        ent_map = {e.mesh: (e.text, e.etype) for e in art.entities}
-
-        # 3. 关系（动态查找类型 & 关系名）
-        relations = []
-        for rel in art.res:
-            head_txt, head_type = ent_map.get(rel.head_mesh, (rel.head_mesh, 'Unknown'))
-            tail_txt, tail_type = ent_map.get(rel.tail_mesh, (rel.tail_mesh, 'Unknown'))
-            relations.append({
-                'head_entity': head_txt,
-                'head_type': head_type,
-                'head_mesh': rel.head_mesh,
-                'relationship': rel.relation,  # 不再写死 CID
-                'tail_entity': tail_txt,
-                'tail_type': tail_type,
-                'tail_mesh': rel.tail_mesh
-            })
-
-        return {
-            'doc_id': doc_id,
-            'title': art.title,
-            'abstract': art.abstr,
-            'entities': entities,
-            'relations': relations
-        }
+        return article_detail(art)
 
 
-from pathlib import Path
-from typing import List
 class ChemDisGeneParser(CIDParser):
-    def __init__(self, text: str, tsv_paths: List[Path]):
-        super().__init__(text)
+    def __init__(self, text: str = None, tsv_paths: List[Path] = (), articles: Iterable[Article] = None):
+        super().__init__(text, articles)
         self.tsv_paths = tsv_paths
         for tsv_path in tsv_paths:
             with tsv_path.open(newline='', encoding='utf-8') as f:
@@ -189,5 +272,8 @@ class ChemDisGeneParser(CIDParser):
                         continue
                     pmid, rel_type, head, tail = line.split('\t')
                     article=self.article_map.get(pmid)
+                    if article is None:
+                        # TSV 覆盖整个数据集，本文件中没有的 PMID 跳过
+                        continue
                     article.res.append(Relation(pmid, head, tail, rel_type))
 
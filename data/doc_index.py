@@ -0,0 +1,220 @@
+#data/doc_index.py
+import json
+import mmap
+import threading
+from logging import getLogger
+from pathlib import Path
+from typing import Dict, Any, List, Sequence
+from data.data_parser import Article, Relation, _parse_chunk, article_detail
+
+logger = getLogger(__name__)
+
+# 数据集文件旁的索引：<file>.idx.json，记录每篇文档的字节范围、标题与实体 / 关系数
+INDEX_SUFFIX = '.idx.json'
+_VERSION = 1
+
+# 进程内缓存：{txt 路径: (stamp, DocIndex)}
+_indexes: Dict[str, tuple[tuple, "DocIndex"]] = {}
+# TSV 行位置缓存：{TSV 路径: (stamp, {PMID: 行位置})}
+_tsv_indexes: Dict[tuple, tuple[tuple, Dict[str, List[List[int]]]]] = {}
+_lock = threading.Lock()
+
+
+class DocIndex:
+    """
+    一个 PubTator 文件的文档索引。
+    列表页只用索引中的标题和计数；详情页按 PMID 找到字节范围，经 mmap 只读取并解析这一篇。
+    TSV 关系（ChemDisGene）按 PMID 记录各行在 TSV 文件中的 (文件序号, 偏移, 长度)。
+    """
+
+    def __init__(self, path: Path, docs: List[Dict[str, Any]], tsv_paths: Sequence[Path] = (),
+                 tsv_rows: Dict[str, List[List[int]]] | None = None, stamp: tuple = ()):
+        self.path = path
+        self.stamp = stamp
+        self.docs = docs
+        self.tsv_paths = list(tsv_paths)
+        self.tsv_rows = tsv_rows or {}
+        self._position = {doc['pmid']: i for i, doc in enumerate(docs)}
+        self._mm: mmap.mmap | None = None
+        self._mm_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    def __contains__(self, pmid: str) -> bool:
+        return pmid in self._position
+
+    def _read(self, offset: int, length: int) -> bytes:
+        """在锁内读取，避免与 close 并发时读到已关闭的映射"""
+        with self._mm_lock:
+            if self._mm is None:
+                with open(self.path, 'rb') as f:
+                    self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            return self._mm[offset:offset + length]
+
+    def close(self) -> None:
+        """释放 mmap（及其占用的文件描述符）；之后再读取时会重新映射"""
+        with self._mm_lock:
+            if self._mm is not None:
+                self._mm.close()
+                self._mm = None
+
+    def _tsv_relations(self, pmid: str) -> List[Relation]:
+        relations = []
+        handles = {}
+        try:
+            for file_no, offset, length in self.tsv_rows.get(pmid, []):
+                f = handles.get(file_no)
+                if f is None:
+                    f = handles[file_no] = open(self.tsv_paths[file_no], 'rb')
+                f.seek(offset)
+                _, rel_type, head, tail = f.read(length).decode('utf-8').rstrip('\r\n').split('\t')
+                relations.append(Relation(pmid, head, tail, rel_type))
+        finally:
+            for f in handles.values():
+                f.close()
+        return relations
+
+    def article(self, pmid: str) -> Article | None:
+        """按需读取一篇文档，不存在时返回 None"""
+        i = self._position.get(pmid)
+        if i is None:
+            return None
+        doc = self.docs[i]
+        raw = self._read(doc['offset'], doc['length']).decode('utf-8')
+        art = _parse_chunk([line.rstrip() for line in raw.splitlines() if line.strip()])
+        if pmid in self.tsv_rows:
+            # 与 ChemDisGeneParser 一致：TSV 关系追加在文中关系之后
+            art.res.extend(self._tsv_relations(pmid))
+        return art
+
+    def get(self, pmid: str) -> dict:
+        """与 CIDParser.get 相同的详情结构，不存在时返回 {}"""
+        art = self.article(pmid)
+        return article_detail(art) if art else {}
+
+    def page(self, offset: int, limit: int) -> List[Dict[str, Any]]:
+        return self.docs[offset:offset + limit]
+
+    def dump(self) -> Dict[str, Any]:
+        return {'version': _VERSION, 'stamp': self.stamp, 'tsv_paths': [str(p) for p in self.tsv_paths],
+                'docs': self.docs, 'tsv_rows': self.tsv_rows}
+
+
+def _stamp(path: Path, tsv_paths: Sequence[Path]) -> tuple:
+    """txt 与各 TSV 的 (mtime_ns, size)，任一变化则重建索引"""
+    stamp = []
+    for file in (path, *tsv_paths):
+        st = file.stat()
+        stamp.append((file.name, st.st_mtime_ns, st.st_size))
+    return tuple(stamp)
+
+
+def _scan(path: Path) -> List[Dict[str, Any]]:
+    """逐行扫描 txt，记录每篇文档（空行分隔的块）的字节范围，并解析一次得到标题与计数"""
+    docs: Dict[str, Dict[str, Any]] = {}
+    chunk, start, pos = [], 0, 0
+
+    def flush(end: int):
+        art = _parse_chunk(chunk)
+        # 同一 PMID 出现多次时与 CIDParser 一致：保留第一次的位置、最后一次的内容
+        docs[art.pmid] = {'pmid': art.pmid, 'offset': start, 'length': end - start, 'title': art.title,
+                          'entities_cnt': len(art.entities), 'relations_cnt': len(art.res)}
+
+    with open(path, 'rb') as f:
+        for raw in f:
+            line = raw.decode('utf-8').rstrip()
+            if line.strip():
+                if not chunk:
+                    start = pos
+                chunk.append(line)
+            elif chunk:
+                flush(pos)
+                chunk = []
+            pos += len(raw)
+    if chunk:
+        flush(pos)
+    return list(docs.values())
+
+
+def _tsv_positions(tsv_paths: Sequence[Path]) -> Dict[str, List[List[int]]]:
+    """{PMID: [(文件序号, 偏移, 长度), ...]}，同一数据集的所有 txt 共用，按 TSV 的 stamp 缓存"""
+    stamp = _stamp(tsv_paths[0], tsv_paths[1:]) if tsv_paths else ()
+    key = tuple(str(p) for p in tsv_paths)
+    with _lock:
+        hit = _tsv_indexes.get(key)
+    if hit and hit[0] == stamp:
+        return hit[1]
+    rows: Dict[str, List[List[int]]] = {}
+    for file_no, tsv_path in enumerate(tsv_paths):
+        pos = 0
+        with open(tsv_path, 'rb') as f:
+            for raw in f:
+                line = raw.decode('utf-8').rstrip('\r\n')
+                if line:
+                    rows.setdefault(line.split('\t', 1)[0], []).append([file_no, pos, len(raw)])
+                pos += len(raw)
+    with _lock:
+        _tsv_indexes[key] = (stamp, rows)
+    return rows
+
+
+def _scan_tsv(tsv_paths: Sequence[Path], docs: List[Dict[str, Any]]) -> Dict[str, List[List[int]]]:
+    """按 PMID 哈希连接 TSV 行；文本中没有的 PMID 跳过"""
+    positions = _tsv_positions(tsv_paths)
+    rows: Dict[str, List[List[int]]] = {}
+    for doc in docs:
+        hit = positions.get(doc['pmid'])
+        if hit:
+            rows[doc['pmid']] = hit
+            doc['relations_cnt'] += len(hit)
+    return rows
+
+
+def build_index(path: Path, tsv_paths: Sequence[Path] = ()) -> DocIndex:
+    docs = _scan(path)
+    return DocIndex(path, docs, tsv_paths, _scan_tsv(tsv_paths, docs) if tsv_paths else {})
+
+
+def _load_sidecar(file: Path, stamp: tuple) -> Dict[str, Any] | None:
+    try:
+        data = json.loads(file.read_text(encoding='utf-8'))
+    except FileNotFoundError:
+        return None
+    except ValueError as e:
+        logger.warning("Document index %s is corrupt, rebuilding: %s", file, e)
+        return None
+    if data.get('version') != _VERSION or tuple(tuple(s) for s in data.get('stamp', [])) != stamp:
+        return None
+    return data
+
+
+def doc_index(path: Path, tsv_paths: Sequence[Path] = ()) -> DocIndex:
+    """
+    读取或构建文件的文档索引：内存缓存 → <file>.idx.json → 重新扫描。
+    txt 或 TSV 的修改时间 / 大小变化后自动重建并关闭旧索引的 mmap；索引文件写不进去时只保留在内存中。
+    """
+    path = Path(path)
+    stamp = _stamp(path, tsv_paths)
+    key = str(path.resolve())
+    with _lock:
+        hit = _indexes.get(key)
+    if hit and hit[0] == stamp:
+        return hit[1]
+    sidecar = path.with_name(path.name + INDEX_SUFFIX)
+    data = _load_sidecar(sidecar, stamp)
+    if data is not None:
+        index = DocIndex(path, data['docs'], tsv_paths, data.get('tsv_rows'), stamp)
+    else:
+        index = build_index(path, tsv_paths)
+        index.stamp = stamp
+        try:
+            sidecar.write_text(json.dumps(index.dump(), ensure_ascii=False), encoding='utf-8')
+        except OSError as e:
+            logger.warning("Write document index %s failed: %s", sidecar, e)
+    with _lock:
+        old = _indexes.get(key)
+        _indexes[key] = (stamp, index)
+    if old and old[1] is not index:
+        old[1].close()
+    return index
@@ -0,0 +1,131 @@
+#data/profile.py
+import json
+import re
+import threading
+from logging import getLogger
+from pathlib import Path
+from typing import Dict, Any, Sequence
+import numpy as np
+from data.corpus import Corpus, load_files
+from data.doc_index import _stamp
+
+logger = getLogger(__name__)
+
+# 数据集文件旁的统计缓存：<file>.profile.json
+PROFILE_SUFFIX = '.profile.json'
+_VERSION = 1
+CHARS_PER_TOKEN = 4       # 估算 LLM token 数：英文约 4 个字符一个 token
+_SENTENCE = re.compile(r'(?<=[.!?])\s+(?=[A-Z0-9(\[])')
+_WORD = re.compile(r'\w+|[^\w\s]')
+_PERCENTILES = (50, 90, 99)
+
+# 进程内缓存：{txt 路径: (stamp, profile)}
+_profiles: Dict[str, tuple[tuple, Dict[str, Any]]] = {}
+_lock = threading.Lock()
+
+
+def _distribution(values: np.ndarray) -> Dict[str, Any]:
+    if not len(values):
+        return {'total': 0, 'mean': 0., 'min': 0, 'max': 0, **{f'p{p}': 0 for p in _PERCENTILES}}
+    return {'total': int(values.sum()), 'mean': round(float(values.mean()), 2),
+            'min': int(values.min()), 'max': int(values.max()),
+            **{f'p{p}': int(np.percentile(values, p)) for p in _PERCENTILES}}
+
+
+def _sentences(title: str, abstract: str) -> int:
+    """标题算一句，摘要按句末标点 + 空白 + 大写 / 数字开头切分"""
+    return bool(title) + (1 + len(_SENTENCE.findall(abstract)) if abstract else 0)
+
+
+def profile_corpus(corpus: Corpus) -> Dict[str, Any]:
+    """
+    语料的统计：文档数、各类型实体数 / 不同 MeSH 数 / 文档数、各类型关系数（含已连接的 TSV 关系）、
+    每篇文档的句子数、词数、字符数与估算 LLM token 数的分布。
+    """
+    stats = corpus.stats()
+    texts = [f'{t} {a}' for t, a in zip(corpus.titles, corpus.abstracts)]
+    chars = np.fromiter((len(t) for t in texts), dtype=np.int64, count=len(texts))
+    words = np.fromiter((len(_WORD.findall(t)) for t in texts), dtype=np.int64, count=len(texts))
+    sentences = np.fromiter((_sentences(t, a) for t, a in zip(corpus.titles, corpus.abstracts)),
+                            dtype=np.int64, count=len(texts))
+    return {
+        'documents': stats['documents'],
+        'entities': stats['entities'],
+        'relations': stats['relations'],
+        'entity_types': stats['entity_types'],
+        'relation_types': stats['relation_types'],
+        'mesh_ids': stats['mesh_ids'],
+        'surfaces': stats['surfaces'],
+        'entities_per_doc': _distribution(np.diff(corpus.ent_offsets)),
+        'sentences_per_doc': _distribution(sentences),
+        'words_per_doc': _distribution(words),
+        'chars_per_doc': _distribution(chars),
+        'est_llm_tokens_per_doc': _distribution(-(-chars // CHARS_PER_TOKEN)),
+    }
+
+
+def _sidecar(path: Path) -> Path:
+    return path.with_name(path.name + PROFILE_SUFFIX)
+
+
+def _cached(path: Path, stamp: tuple) -> Dict[str, Any] | None:
+    key = str(path.resolve())
+    with _lock:
+        hit = _profiles.get(key)
+    if hit and hit[0] == stamp:
+        return hit[1]
+    try:
+        data = json.loads(_sidecar(path).read_text(encoding='utf-8'))
+    except FileNotFoundError:
+        return None
+    except ValueError as e:
+        logger.warning("Profile cache %s is corrupt, recomputing: %s", _sidecar(path), e)
+        return None
+    if data.get('version') != _VERSION or tuple(tuple(s) for s in data.get('stamp', [])) != stamp:
+        return None
+    with _lock:
+        _profiles[key] = (stamp, data['profile'])
+    return data['profile']
+
+
+def _store(path: Path, stamp: tuple, profile: Dict[str, Any]) -> None:
+    with _lock:
+        _profiles[str(path.resolve())] = (stamp, profile)
+    try:
+        _sidecar(path).write_text(json.dumps({'version': _VERSION, 'stamp': stamp, 'profile': profile},
+                                             ensure_ascii=False), encoding='utf-8')
+    except OSError as e:
+        logger.warning("Write profile cache %s failed: %s", _sidecar(path), e)
+
+
+def profile_files(paths: Sequence[Path], tsv_paths: Sequence[Path] = ()) -> Dict[str, Dict[str, Any]]:
+    """
+    {文件名: 统计}。按 txt / TSV 的 (mtime_ns, size) 缓存；
+    需要重新计算的文件由 load_files 在进程池中并行解析。
+    """
+    stamps = {path: _stamp(path, tsv_paths) for path in paths}
+    result = {path.name: _cached(path, stamps[path]) for path in paths}
+    todo = [path for path in paths if result[path.name] is None]
+    if todo:
+        # 一次并行解析全部待统计文件并连接 TSV，再按来源文件分别统计
+        corpus = load_files(todo, tsv_paths)
+        for k, path in enumerate(todo):
+            profile = profile_corpus(corpus.select(corpus.file_range(k)))
+            _store(path, stamps[path], profile)
+            result[path.name] = profile
+    return result
+
+
+def summarize(profiles: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """多个文件的可加总计数（分布无法精确合并，只给出各文件的结果）"""
+    total: Dict[str, Any] = {'files': len(profiles), 'documents': 0, 'entities': 0, 'relations': 0,
+                             'est_llm_tokens': 0, 'entity_types': {}, 'relation_types': {}}
+    for p in profiles.values():
+        for k in ('documents', 'entities', 'relations'):
+            total[k] += p[k]
+        total['est_llm_tokens'] += p['est_llm_tokens_per_doc']['total']
+        for t, v in p['entity_types'].items():
+            total['entity_types'][t] = total['entity_types'].get(t, 0) + v['count']
+        for t, n in p['relation_types'].items():
+            total['relation_types'][t] = total['relation_types'].get(t, 0) + n
+    return total
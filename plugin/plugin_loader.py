@@ -1,13 +1,15 @@
 import asyncio
 import inspect
 import importlib.util
+import threading
 from pathlib import Path
 
 
 # ---------- 模块私有变量 ----------
-_sync_plugins = {}          # 同步资源
+_sync_plugins = None        # 同步资源，load_plugins 之前为 None
 _async_plugins = {}         # 异步资源
 _lock = asyncio.Lock()      # 保证异步加载只跑一次
+_sync_lock = threading.Lock()  # 保证同步加载只跑一次
 
 # ---------- 工具 ----------
 def _import_plugins_module():
@@ -22,7 +24,7 @@ def _all_subclasses(cls):
         [s for c in cls.__subclasses__() for s in _all_subclasses(c)]
     )
 
-# ---------- 同步加载（进程启动时自动跑） ----------
+# ---------- 同步加载（load_plugins 或第一次 get_plugin 时跑） ----------
 def _load_sync():
     mod = _import_plugins_module()
     classes = [c for c in _all_subclasses(mod.Plugin) if not inspect.isabstract(c)]
@@ -47,12 +49,21 @@ async def _load_async():
     _async_plugins.update(async_loaded)
 
 # ---------- 对外接口 ----------
+def load_plugins() -> dict:
+    """
+    加载全部同步插件（只加载一次）。服务和实验工作进程启动时显式调用；
+    导入本模块不再加载，进程池里只做解析、统计的工作进程不会加载 Flair 等模型。
+    """
+    global _sync_plugins
+    if _sync_plugins is None:
+        with _sync_lock:
+            if _sync_plugins is None:
+                _sync_plugins = _load_sync()
+    return _sync_plugins
+
 def get_plugin(name: str):
-    """取同步资源（立即返回）"""
-    if name in _sync_plugins:
-        return _sync_plugins[name]
-    else:
-        return None
+    """取同步资源（未加载时先加载全部同步插件）"""
+    return load_plugins().get(name)
 
 async def aget_plugin(name: str):
     """取异步资源（自动保证只初始化一次）"""
@@ -64,10 +75,6 @@ async def aget_plugin(name: str):
     else:
         return None
 
-# ---------- 模块初始化：同步资源立即就绪 ----------
-_sync_plugins = _load_sync()
-
-
 
 async def _aclose_plugins():
     """统一关闭所有异步资源"""
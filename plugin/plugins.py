@@ -19,7 +19,68 @@ class FlairTagger(Plugin):
         flair_tagger = SequenceTagger.load(str(MODEL_DIR)) 
         '''
         flair_tagger = Classifier.load("hunflair2")
-        return {"tag": flair_tagger}
+
+        import queue
+        import threading
+        import time
+        from concurrent.futures import Future
+
+        class BatchTagger:
+            """
+            合批标注：并发调用方（SUB 迭代、并发的实验行）提交的句子在后台线程中
+            按 batch_size / max_wait 合并成一批，调用一次 predict(list, mini_batch_size=...)，
+            再把结果分发回各调用方。与 tagger.predict 用法相同，标注结果写回传入的 Sentence。
+            """
+
+            def __init__(self, tagger, batch_size: int = 32, max_wait: float = 0.01):
+                self.tagger = tagger
+                self.batch_size = batch_size
+                self.max_wait = max_wait   # 凑批最多等待的秒数
+                self._queue = queue.Queue()
+                self._worker = None
+                self._lock = threading.Lock()
+
+            def _ensure_worker(self):
+                with self._lock:
+                    if self._worker is None or not self._worker.is_alive():
+                        self._worker = threading.Thread(target=self._loop, name="flair-batch", daemon=True)
+                        self._worker.start()
+
+            def _loop(self):
+                while True:
+                    batch = [self._queue.get()]
+                    deadline = time.monotonic() + self.max_wait
+                    while len(batch) < self.batch_size:
+                        timeout = deadline - time.monotonic()
+                        if timeout <= 0:
+                            break
+                        try:
+                            batch.append(self._queue.get(timeout=timeout))
+                        except queue.Empty:
+                            break
+                    sentences = [sentence for sentence, _ in batch]
+                    try:
+                        self.tagger.predict(sentences, mini_batch_size=self.batch_size)
+                    except Exception as e:
+                        for _, future in batch:
+                            future.set_exception(e)
+                        continue
+                    for _, future in batch:
+                        future.set_result(None)
+
+            def predict(self, sentences, **kwargs):
+                if not isinstance(sentences, list):
+                    sentences = [sentences]
+                self._ensure_worker()
+                futures = []
+                for sentence in sentences:
+                    future = Future()
+                    self._queue.put((sentence, future))
+                    futures.append(future)
+                for future in futures:
+                    future.result()
+
+        return {"tag": flair_tagger, "tag_batch": BatchTagger(flair_tagger)}
 
 class PGMExecutor(Plugin):
     def load(self):
@@ -93,9 +154,9 @@ class Metrics(Plugin):
         class MetricsCalculation:
 
             @staticmethod
-            def calculate(expected, predicted):
+            def _pairs(expected, predicted):
+                """统一为 (实体, 标签) 集合：list of pairs 与 {label:[ent,...]} 两种格式，实体小写去重"""
                 from ast import literal_eval
-                from sklearn.metrics import precision_recall_fscore_support
 
                 # --------------- 统一字符串 → Python 对象 ---------------
                 if isinstance(expected, str):
@@ -103,86 +164,97 @@ class Metrics(Plugin):
                 if isinstance(predicted, str):
                     predicted = literal_eval(predicted)
 
-                def flatten_to_binary(gold_set, pred_set):
-                    """将两个集合转换为二进制标签列表"""
-                    y_true, y_pred = [], []
-                    for item in gold_set | pred_set:
-                        y_true.append(int(item in gold_set))
-                        y_pred.append(int(item in pred_set))
-                    return y_true, y_pred
-
-                # --------------- 辅助函数：去重 + 小写归一化 ---------------
-                def norm_doc(doc):
-                    return {k: list(dict.fromkeys(ent.lower() for ent in v))
-                            for k, v in doc.items()}
-
                 # --------------- 格式1: list of tuples [(),()] 或 [[],[]] ---------------
                 if isinstance(expected, list) and isinstance(predicted, list):
                     def normalize_list_of_pairs(lst):
-                        result = []
-                        for item in lst:
-                            if len(item) == 2:
-                                entity, label = item
-                                result.append((entity.lower(), label.lower()))
-                        return result
-
-                    expected_pairs = normalize_list_of_pairs(expected)
-                    predicted_pairs = normalize_list_of_pairs(predicted)
-
-                    gold_set = set(expected_pairs)
-                    pred_set = set(predicted_pairs)
-
-                    # 计算 TP/FP/FN（集合运算）
-                    tp = len(gold_set & pred_set)
-                    fp = len(pred_set - gold_set)
-                    fn = len(gold_set - pred_set)
-
-                    # 原指标计算逻辑保留
-                    y_true, y_pred = flatten_to_binary(gold_set, pred_set)
-                    prec, rec, f1, _ = precision_recall_fscore_support(
-                        y_true, y_pred, average='binary', zero_division=0)
-
-                    return {
-                        "precision": float(prec),
-                        "recall": float(rec),
-                        "f1": float(f1),
-                        "tp": tp,  # 新增
-                        "fp": fp,  # 新增
-                        "fn": fn  # 新增
-                    }
-
-                else:
-                    # --------------- 老格式：{label:[ent,...]} ---------------
-                    expected = norm_doc(expected)
-                    predicted = norm_doc(predicted)
-
-                    total_tp = total_fp = total_fn = 0
-                    y_true, y_pred = [], []
-
-                    for lbl in set(expected) | set(predicted):
-                        g_set = set(expected.get(lbl, []))
-                        p_set = set(predicted.get(lbl, []))
-
-                        # 累加各 label 的 TP/FP/FN
-                        total_tp += len(g_set & p_set)
-                        total_fp += len(p_set - g_set)
-                        total_fn += len(g_set - p_set)
-
-                        y_t, y_p = flatten_to_binary(g_set, p_set)
-                        y_true.extend(y_t)
-                        y_pred.extend(y_p)
-
-                    prec, rec, f1, _ = precision_recall_fscore_support(
-                        y_true, y_pred, average='binary', zero_division=0)
-
-                    return {
-                        "precision": float(prec),
-                        "recall": float(rec),
-                        "f1": float(f1),
-                        "tp": total_tp,  # 新增
-                        "fp": total_fp,  # 新增
-                        "fn": total_fn  # 新增
-                    }
+                        return {(item[0].lower(), item[1].lower()) for item in lst if len(item) == 2}
+
+                    return normalize_list_of_pairs(expected), normalize_list_of_pairs(predicted)
+
+                # --------------- 老格式：{label:[ent,...]} ---------------
+                def norm_doc(doc):
+                    return {(ent.lower(), lbl) for lbl, v in doc.items() for ent in v}
+
+                return norm_doc(expected), norm_doc(predicted)
+
+            @staticmethod
+            def _prf(tp, fp, fn):
+                """逐元素计算 P/R/F1，分母为 0 时取 0（与 sklearn zero_division=0 一致）"""
+                tp, fp, fn = (np.asarray(x, dtype=np.float64) for x in (tp, fp, fn))
+                prec = np.divide(tp, tp + fp, out=np.zeros_like(tp), where=(tp + fp) > 0)
+                rec = np.divide(tp, tp + fn, out=np.zeros_like(tp), where=(tp + fn) > 0)
+                f1 = np.divide(2 * tp, 2 * tp + fp + fn, out=np.zeros_like(tp), where=(2 * tp + fp + fn) > 0)
+                return prec, rec, f1
+
+            @staticmethod
+            def calculate_batch(expected_list, predicted_list) -> Dict[str, Any]:
+                """
+                一次计算全部文档：(实体, 标签) 先映射为整数 ID，TP/FP/FN 由数组运算得到。
+                返回 {'documents': [每篇文档的 P/R/F1/TP/FP/FN], 'labels': {label: {...}},
+                      'micro': {...}, 'macro': {...}（按文档平均）, 'label_macro': {...}（按标签平均）}
+                """
+                vocab: Dict[tuple, int] = {}
+                labels: Dict[str, int] = {}
+                label_of: List[int] = []
+                keys = ([], [])   # gold / pred 的 (文档号, 条目 ID)
+
+                def intern(item):
+                    i = vocab.get(item)
+                    if i is None:
+                        i = vocab[item] = len(vocab)
+                        label_of.append(labels.setdefault(item[1], len(labels)))
+                    return i
+
+                docs = len(expected_list)
+                for d, (expected, predicted) in enumerate(zip(expected_list, predicted_list)):
+                    for side, items in zip(keys, MetricsCalculation._pairs(expected, predicted)):
+                        side.extend((d, intern(item)) for item in items)
+
+                n = max(len(vocab), 1)
+                gold, pred = (np.asarray(side, dtype=np.int64).reshape(-1, 2) for side in keys)
+                gold_key = gold[:, 0] * n + gold[:, 1]
+                pred_key = pred[:, 0] * n + pred[:, 1]
+                tp_key = np.intersect1d(gold_key, pred_key, assume_unique=True)
+
+                # ---------- 每篇文档 ----------
+                tp = np.bincount(tp_key // n, minlength=docs)
+                fp = np.bincount(pred[:, 0], minlength=docs) - tp
+                fn = np.bincount(gold[:, 0], minlength=docs) - tp
+                prec, rec, f1 = MetricsCalculation._prf(tp, fp, fn)
+                documents = [{"precision": float(p), "recall": float(r), "f1": float(f),
+                              "tp": int(a), "fp": int(b), "fn": int(c)}
+                             for p, r, f, a, b, c in zip(prec, rec, f1, tp, fp, fn)]
+
+                # ---------- 每个标签 ----------
+                label_arr = np.asarray(label_of, dtype=np.int64)
+                n_labels = len(labels)
+                l_tp = np.bincount(label_arr[tp_key % n], minlength=n_labels)
+                l_fp = np.bincount(label_arr[pred[:, 1]], minlength=n_labels) - l_tp
+                l_fn = np.bincount(label_arr[gold[:, 1]], minlength=n_labels) - l_tp
+                l_prec, l_rec, l_f1 = MetricsCalculation._prf(l_tp, l_fp, l_fn)
+                per_label = {lbl: {"precision": float(l_prec[i]), "recall": float(l_rec[i]), "f1": float(l_f1[i]),
+                                   "tp": int(l_tp[i]), "fp": int(l_fp[i]), "fn": int(l_fn[i])}
+                             for lbl, i in labels.items()}
+
+                # ---------- micro / macro ----------
+                m_prec, m_rec, m_f1 = MetricsCalculation._prf(tp.sum(), fp.sum(), fn.sum())
+
+                def mean(values):
+                    return float(values.mean()) if len(values) else 0.
+
+                return {
+                    "documents": documents,
+                    "labels": per_label,
+                    "micro": {"precision": float(m_prec), "recall": float(m_rec), "f1": float(m_f1),
+                              "tp": int(tp.sum()), "fp": int(fp.sum()), "fn": int(fn.sum())},
+                    "macro": {"precision": mean(prec), "recall": mean(rec), "f1": mean(f1)},
+                    "label_macro": {"precision": mean(l_prec), "recall": mean(l_rec), "f1": mean(l_f1)},
+                }
+
+            @staticmethod
+            def calculate(expected, predicted):
+                """单篇文档的 P/R/F1 与 TP/FP/FN"""
+                return MetricsCalculation.calculate_batch([expected], [predicted])["documents"][0]
 
             def compute_micro_macro(metrics: Dict[Any, Dict[str, float]]) -> Dict[str, Dict[str, float]]:
                 """
@@ -193,26 +265,22 @@ class Metrics(Plugin):
                     return {'micro': {'precision': 0., 'recall': 0., 'f1': 0.},
                             'macro': {'precision': 0., 'recall': 0., 'f1': 0.}}
 
-                # 取出 value 列表，后续和原逻辑完全一致
                 metrics_list = list(metrics.values())
 
+                def column(key):
+                    return np.fromiter((m[key] for m in metrics_list if key in m), dtype=np.float64)
+
                 # ---------- macro：直接平均 ----------
-                macro = {
-                    'precision': float(np.mean([m['precision'] for m in metrics_list if 'precision' in m ])),
-                    'recall': float(np.mean([m['recall'] for m in metrics_list  if 'recall' in m ])),
-                    'f1': float(np.mean([m['f1'] for m in metrics_list  if 'f1' in m]))
-                }
+                macro = {key: float(np.mean(column(key))) for key in ('precision', 'recall', 'f1')}
 
                 # ---------- micro：累 TP/FP/FN ----------
-                tp_sum = sum(m['tp'] for m in metrics_list  if 'tp' in m)
-                fp_sum = sum(m['fp'] for m in metrics_list  if 'fp' in m)
-                fn_sum = sum(m['fn'] for m in metrics_list  if 'tp' in m)
+                tp_sum, fp_sum, fn_sum = (column(key).sum() for key in ('tp', 'fp', 'fn'))
 
                 prec_micro = tp_sum / (tp_sum + fp_sum + 1e-15)
                 rec_micro = tp_sum / (tp_sum + fn_sum + 1e-15)
                 f1_micro = 2 * prec_micro * rec_micro / (prec_micro + rec_micro + 1e-15)
 
-                return {'micro': {'precision': prec_micro, 'recall': rec_micro, 'f1': f1_micro},
+                return {'micro': {'precision': float(prec_micro), 'recall': float(rec_micro), 'f1': float(f1_micro)},
                         'macro': macro}
 
 
@@ -1,4 +1,4 @@
 #!/usr/bin/env bash
 cd "$(dirname "$0")"
 export PYTHONPATH=$(pwd):$PYTHONPATH
-nohup python -m ui.app "$@" &
+nohup python -m ui "$@" &
@@ -1,7 +1,5 @@
 from logging import getLogger
 from langgraph.types import Checkpointer
-from langchain_ollama import ChatOllama
-from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
 from langchain.agents import create_agent
 from langchain.messages import AIMessage
@@ -11,6 +9,7 @@ import csv
 from typing_extensions import get_type_hints
 from typing import Dict, Any, List, get_type_hints, Iterator
 from service.entity.tool import ToolLoader
+from service.entity.llm import LLMRegistry
 from utils.conversion import convert_to_list, T,jsonify_state
 from service.entity.entity import Entity, EntityLoader
 from service.meta.loader import MetaLoader
@@ -37,25 +36,14 @@ class AgentEntity(Entity):
         self.idx: str | None = meta.get("idx")
         self.process = meta.get("process", None)
         if self.type=="PGM":
+            self._code, self._compile_error = self._compile_process(self.process)
             self.agent = create_graph(self,self.checkpointer)
         if self.type == "LLM":
             # 获取 llm_url 和 model，如果不存在则提供默认值或处理逻辑
             llm_model_id = meta.get("model", "").strip()  # 默认为空字符串
             llm_info = MetaLoader.load("llms",llm_model_id)
-            if llm_info['type']=='ollama':
-                self.model= ChatOllama(
-                    model=llm_info['model'],  # ollama list 里看到的模型名
-                    base_url=llm_info['base_url'],  # 注意带 /v1
-                    temperature=llm_info['temperature'],
-                )
-            elif llm_info['type']=='custom':
-                self.model = ChatOpenAI(
-                    model=llm_info['model'],  # ollama list 里看到的模型名
-                    base_url=llm_info['base_url'],
-                    api_key=llm_info['api_key'],
-                    temperature=llm_info['temperature'],
-                    max_tokens=llm_info['max_tokens']
-                )
+            # 同一配置共享一个模型实例及其连接池，并由 LLMGovernor 限制并发与 RPM/TPM
+            self.model = LLMRegistry.get(llm_info)
 
             self.template = ChatPromptTemplate(
                 [("system", self.template_name["system"]),
@@ -239,46 +227,61 @@ class AgentEntity(Entity):
                     yield f"[Stream Error] {str(e)}\n"
                     return
 
-    def execute_process(self, code_string: str, state: dict) -> dict:
-        """安全地执行代码（处理缩进问题）"""
+    @staticmethod
+    def _normalize_indent(code: str) -> str:
+        """标准化代码缩进：移除与第一行相同的缩进"""
+        lines = code.split('\n')
+        if not lines:
+            return code
+
+        # 找到第一行的缩进
+        first_line = lines[0]
+        initial_indent = len(first_line) - len(first_line.lstrip())
+
+        # 清理每一行的缩进
+        cleaned_lines = []
+        for line in lines:
+            if line.startswith(' ' * initial_indent):
+                line = line[initial_indent:]
+            cleaned_lines.append(line)
+
+        return '\n'.join(cleaned_lines)
+
+    def _compile_process(self, code_string: str | None) -> tuple[Any, str | None]:
+        """加载时编译 process 代码一次，返回 (code 对象, 错误信息)；错误留到调用时写入 state['error']"""
+        if not code_string:
+            return None, None
         try:
-            # 1. 清理代码字符串的缩进
-            def normalize_indent(code):
-                """标准化代码缩进"""
-                lines = code.split('\n')
-                if not lines:
-                    return code
-
-                # 找到第一行的缩进
-                first_line = lines[0]
-                initial_indent = len(first_line) - len(first_line.lstrip())
-
-                # 清理每一行的缩进
-                cleaned_lines = []
-                for line in lines:
-                    # 移除与第一行相同的缩进
-                    if line.startswith(' ' * initial_indent):
-                        line = line[initial_indent:]
-                    cleaned_lines.append(line)
-
-                return '\n'.join(cleaned_lines)
-
-            # 清理代码
-            cleaned_code = normalize_indent(code_string)
-            exec_globals = get_plugin('exec_globals')
-            exec_globals['state']=state
-            exec_globals['get_plugin']=get_plugin
-            # 4. 直接执行清理后的代码
-            exec(cleaned_code, exec_globals)
-            # 5. 获取结果
-            if '__result__' in exec_globals and exec_globals['__result__'] is not None:
-                return exec_globals['__result__']
-            else:
-                return state
-
-
+            return compile(self._normalize_indent(code_string), f"<agent {self.id}>", "exec"), None
         except IndentationError as e:
-            state['error'] = f"Indentation error: {str(e)}"
+            return None, f"Indentation error: {str(e)}"
+        except Exception as e:
+            return None, f"Execution error: {str(e)}"
+
+    def execute_process(self, code_string: str, state: dict) -> dict:
+        """
+        执行 process 代码。
+        self.process 在加载时已编译；每次调用使用独立的命名空间（共享沙箱 builtins），
+        并发执行的行之间不会互相覆盖 state / __result__。
+        """
+        if code_string is self.process:
+            code, error = self._code, self._compile_error
+        else:
+            code, error = self._compile_process(code_string)
+        if error:
+            state['error'] = error
+            return state
+        if code is None:
+            return state
+        try:
+            namespace = dict(get_plugin('exec_globals'))
+            namespace['__result__'] = None
+            namespace['state'] = state
+            namespace['get_plugin'] = get_plugin
+            exec(code, namespace)
+            # 获取结果
+            if namespace['__result__'] is not None:
+                return namespace['__result__']
             return state
         except Exception as e:
             state['error'] = f"Execution error: {str(e)}"
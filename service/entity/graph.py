@@ -1,26 +1,45 @@
+import contextvars
 import json
+from concurrent.futures import ThreadPoolExecutor
 from logging import getLogger
 from langgraph.graph import StateGraph, START, END
 from langgraph.types import Checkpointer
-from service.entity.agent import AgentLoader
+from service.entity.agent import AgentLoader, AgentEntity
 from service.entity.entity import Entity, EntityLoader
-from typing import Dict, Any, Iterator
+from service.entity.node_cache import memoize
+from typing import Dict, Any, Iterator, List
 from service.meta.loader import MetaLoader
 from utils.conversion import  T,jsonify_state
-from utils.graphutils import compute_states,create_state_typeddict
+from utils.graphutils import compute_states,create_state_typeddict,downstream_nodes,partial_edges
 logger = getLogger(__name__)
 
 class GraphEntity(Entity):
-    def __init__(self,  meta: Dict[str, Any],checkpointer: Checkpointer=None):
+    def __init__(self,  meta: Dict[str, Any],checkpointer: Checkpointer=None,
+                 start_node: str | None = None, agents: Dict[str, Dict[str, Any]] | None = None,
+                 extra_state: List[str] | None = None):
+        """
+        start_node: 只编译该节点及其下游节点（重新评估已完成的实验），其余字段由输入 state 提供
+        agents: {节点: agent 定义}，覆盖 meta/agents 中的定义
+        extra_state: 额外保留的 state 字段（如已保存结果中的字段）
+        """
         super().__init__(meta,checkpointer)
         token_map = {"START": START, "END": END}
-        state = compute_states(meta.get("id"))
-        StateDict = create_state_typeddict(state)
+        agents = agents or {}
+        state = set(compute_states(meta.get("id"))) | set(extra_state or [])
+        for agent in agents.values():
+            state.update(agent.get("inputs", []))
+            if agent.get("outputs", {}).get("name"):
+                state.add(agent["outputs"]["name"])
+        StateDict = create_state_typeddict(sorted(state))
         sg = StateGraph(StateDict)
-        for n in meta["nodes"]:
-            sg.add_node(n, _call_agent(n))
+        nodes, edges = meta["nodes"], meta["edges"]
+        if start_node:
+            nodes = downstream_nodes(meta, start_node)
+            edges = partial_edges(meta, start_node)
+        for n in nodes:
+            sg.add_node(n, _call_agent(n, agents.get(n)))
         # 3. 画边（token 替换）
-        for src, tgt in meta["edges"]:
+        for src, tgt in edges:
             src_key = token_map.get(src, src) if isinstance(src, str) else [token_map.get(s, s) for s in src]
             tgt_key = token_map.get(tgt, tgt)
             sg.add_edge(src_key, tgt_key)
@@ -82,16 +101,37 @@ def safe_load(s):
             pass
     return s
 
-def _call_agent(name: str):
-    agent=AgentLoader.load(name)
+def get_sub_concurrency(meta: Dict[str, Any]) -> int:
+    """SUB agent 的 concurrency：同时执行的子图数，默认 1（顺序执行）"""
+    try:
+        return max(1, int(meta.get("concurrency") or 1))
+    except (TypeError, ValueError):
+        return 1
+
+
+def _map_subgraph(subgraph: GraphEntity, sub_states: List[Dict[str, Any]], concurrency: int) -> List[Dict[str, Any]]:
+    """按输入顺序返回每次子图调用的结果；每个任务复制当前 contextvars（回调、LLM governor 等）"""
+    if concurrency <= 1 or len(sub_states) <= 1:
+        return [subgraph.invoke(sub_state) for sub_state in sub_states]
+    with ThreadPoolExecutor(max_workers=min(concurrency, len(sub_states)),
+                            thread_name_prefix="sub") as pool:
+        futures = [pool.submit(contextvars.copy_context().run, subgraph.invoke, sub_state)
+                   for sub_state in sub_states]
+        return [f.result() for f in futures]
+
+
+def _call_agent(name: str, meta: Dict[str, Any] | None = None):
+    """meta 不为空时使用该定义代替 meta/agents 中的 agent"""
+    agent=AgentEntity(dict(meta, id=name)) if meta else AgentLoader.load(name)
     if agent.type != "SUB":
         def invoke(s):
             out= agent.invoke(s)
             return out
-        return invoke
+        return memoize(name, agent, invoke, meta)
     else:
         # SUBGRAPH：构建子图调用逻辑
         subgraph = GraphLoader.load(name)  # 递归加载子图
+        concurrency = get_sub_concurrency(agent.metadata)
         def invoke(s):
 
             inputs = s[agent.inputs[0]]
@@ -102,7 +142,7 @@ def _call_agent(name: str):
                     inputs = inputs.split(',')
                 else:
                     inputs = json.loads(inputs)
-            results= None
+            sub_states = []
             for inp in inputs:
                 # 子图输入：当前 state + 输入注入
                 sub_state = dict(s)
@@ -112,8 +152,10 @@ def _call_agent(name: str):
                         sub_state[index] = inp[index]
                     else:
                         sub_state[index]=inp
-                # 调用子图
-                out = subgraph.invoke(sub_state)
+                sub_states.append(sub_state)
+            # 调用子图（concurrency > 1 时并行），输出保持输入顺序
+            results= None
+            for out in _map_subgraph(subgraph, sub_states, concurrency):
                 output=out[agent.outputs['name']]
 
                 if isinstance(output, str):
@@ -140,7 +182,7 @@ def _call_agent(name: str):
 
             return {agent.outputs['name']: results}
 
-        return invoke
+        return memoize(name, agent, invoke, meta)
 
 
 
@@ -0,0 +1,523 @@
+#service/entity/llm.py
+import asyncio
+import contextvars
+import json
+import threading
+import time
+from contextlib import contextmanager, asynccontextmanager
+from logging import getLogger
+from typing import Dict, Any, List, Iterator, AsyncIterator
+import httpx
+from concurrent.futures import Future
+from langchain_core.language_models import BaseChatModel
+from langchain_core.language_models.chat_models import generate_from_stream
+from langchain_core.messages import BaseMessage, AIMessageChunk
+from langchain_core.outputs import ChatResult, ChatGenerationChunk
+from langchain_ollama import ChatOllama
+from langchain_openai import ChatOpenAI
+from pydantic import Field
+from service.entity.llm_cache import ResponseCache, SingleFlight, cache_key, normalize_prompt, DEFAULT_TTL
+
+logger = getLogger(__name__)
+
+_POLL_INTERVAL = 0.05   # 异步等待并发槽位时的轮询间隔（秒）
+DEFAULT_POOL_SIZE = 10   # 未配置 max_concurrency 时每个客户端保持的连接数
+KEEPALIVE_EXPIRY = 30    # 空闲 keep-alive 连接保留秒数
+# 当前调用链已持有的 governor（如 _generate 内部转调 _stream），避免重复占用槽位导致死锁
+_held: contextvars.ContextVar[frozenset] = contextvars.ContextVar("llm_governor_held", default=frozenset())
+_flights = SingleFlight()
+# 当前调用链正在执行的缓存键（如默认的 _agenerate 在线程中转调 _generate），避免等待自己
+_leading: contextvars.ContextVar[frozenset] = contextvars.ContextVar("llm_flight_leading", default=frozenset())
+
+
+class TokenBucket:
+    """
+    令牌桶：容量为每分钟配额，按秒匀速补充。
+    允许透支（先按估算扣，再按实际用量补扣），透支部分由后续请求等待偿还。
+    """
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float) -> float:
+        """预约 amount 个令牌并立即扣除，返回需要等待的秒数（0 表示立即可用）"""
+        with self._lock:
+            self._refill()
+            amount = min(amount, self.capacity)   # 单次请求超过容量时按容量计，避免永远等待
+            self.tokens -= amount
+            return -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+    def charge(self, amount: float) -> None:
+        """请求结束后补扣实际用量（可为负债）"""
+        with self._lock:
+            self._refill()
+            self.tokens -= amount
+
+
+class LLMGovernor:
+    """
+    进程级的 LLM 并发/速率控制，按 meta/llms 的 id 共享。
+    支持的配置字段：
+    - max_concurrency: 同时在途的请求数
+    - rpm: 每分钟请求数（未配置时沿用 rate_limit）
+    - tpm: 每分钟 token 数（按字符数估算 prompt，结束后按实际用量补扣）
+    请求超限时排队等待，而不是直接失败返回 429。
+    """
+    _registry: Dict[str, "LLMGovernor"] = {}
+    _registry_lock = threading.Lock()
+
+    def __init__(self, llm_id: str, max_concurrency: int = 0, rpm: int = 0, tpm: int = 0):
+        self.llm_id = llm_id
+        self._cond = threading.Condition()
+        self.in_flight = 0
+        self.configure(max_concurrency, rpm, tpm)
+
+    def configure(self, max_concurrency: int = 0, rpm: int = 0, tpm: int = 0) -> None:
+        limits = (max_concurrency, rpm, tpm)
+        if getattr(self, "limits", None) == limits:
+            return
+        self.limits = limits
+        self.max_concurrency = max_concurrency
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+
+    @staticmethod
+    def _limits(llm_info: Dict[str, Any]) -> tuple[int, int, int]:
+        def as_int(key: str) -> int:
+            try:
+                return max(0, int(llm_info.get(key) or 0))
+            except (TypeError, ValueError):
+                return 0
+        rpm = as_int("rpm") or as_int("rate_limit")
+        return as_int("max_concurrency"), rpm, as_int("tpm")
+
+    @classmethod
+    def for_llm(cls, llm_info: Dict[str, Any]) -> "LLMGovernor | None":
+        """按 llm 配置取共享的 governor；未配置任何限制时返回 None"""
+        limits = cls._limits(llm_info)
+        llm_id = llm_info.get("id")
+        with cls._registry_lock:
+            governor = cls._registry.get(llm_id)
+            if governor:
+                governor.configure(*limits)   # 配置文件修改后即时生效
+                return governor
+            if not any(limits):
+                return None
+            governor = cls(llm_id, *limits)
+            cls._registry[llm_id] = governor
+            return governor
+
+    @classmethod
+    def lookup(cls, llm_id: str | None) -> "LLMGovernor | None":
+        return cls._registry.get(llm_id) if llm_id else None
+
+    # ---------- 槽位 ----------
+    def _try_enter(self) -> bool:
+        with self._cond:
+            if self.max_concurrency and self.in_flight >= self.max_concurrency:
+                return False
+            self.in_flight += 1
+            return True
+
+    def _leave(self) -> None:
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify()
+
+    def _wait_time(self, tokens: int) -> float:
+        wait = self.requests.reserve(1) if self.requests else 0.0
+        if self.tokens:
+            wait = max(wait, self.tokens.reserve(tokens))
+        return wait
+
+    @contextmanager
+    def slot(self, tokens: int = 0) -> Iterator[None]:
+        with self._cond:
+            while self.max_concurrency and self.in_flight >= self.max_concurrency:
+                self._cond.wait()
+            self.in_flight += 1
+        held = _held.set(_held.get() | {self.llm_id})
+        try:
+            wait = self._wait_time(tokens)
+            if wait:
+                time.sleep(wait)
+            yield
+        finally:
+            _held.reset(held)
+            self._leave()
+
+    @asynccontextmanager
+    async def aslot(self, tokens: int = 0) -> AsyncIterator[None]:
+        while not self._try_enter():
+            await asyncio.sleep(_POLL_INTERVAL)
+        held = _held.set(_held.get() | {self.llm_id})
+        try:
+            wait = self._wait_time(tokens)
+            if wait:
+                await asyncio.sleep(wait)
+            yield
+        finally:
+            _held.reset(held)
+            self._leave()
+
+    def charge(self, tokens: int) -> None:
+        if self.tokens and tokens > 0:
+            self.tokens.charge(tokens)
+
+
+def estimate_tokens(messages: List[BaseMessage]) -> int:
+    """粗略估算 prompt token 数（约 4 字符 / token）"""
+    return sum(len(str(m.content)) for m in messages) // 4 + 1
+
+
+def _output_tokens(message: Any) -> int:
+    usage = getattr(message, "usage_metadata", None) or {}
+    if usage.get("output_tokens"):
+        return usage["output_tokens"]
+    return len(str(getattr(message, "content", ""))) // 4
+
+
+def _stream_tokens(chunks: List[Any]) -> int:
+    """流式输出的实际 token 数：优先取 usage_metadata，否则按累计字符估算"""
+    reported = sum((getattr(c.message, "usage_metadata", None) or {}).get("output_tokens", 0) for c in chunks)
+    return reported or sum(len(str(c.message.content)) for c in chunks) // 4
+
+
+def _to_chunk(result: ChatResult) -> ChatGenerationChunk:
+    """把完整结果转成单个流式 chunk（缓存命中 / 等待在途请求时使用）"""
+    generation = result.generations[0]
+    message = generation.message
+    return ChatGenerationChunk(
+        message=AIMessageChunk(
+            content=message.content,
+            additional_kwargs=message.additional_kwargs,
+            response_metadata=message.response_metadata,
+            tool_call_chunks=[
+                {"name": tc["name"], "args": json.dumps(tc["args"]), "id": tc.get("id"), "index": i}
+                for i, tc in enumerate(getattr(message, "tool_calls", None) or [])
+            ],
+        ),
+        generation_info=generation.generation_info,
+    )
+
+
+class GovernedChatModel(BaseChatModel):
+    """
+    在 ChatOllama / ChatOpenAI 的底层调用外套一层 LLMGovernor。
+    开启响应缓存（response_cache）时，相同 prompt 的并发请求只发一次（single-flight）。
+    缓存不注册为 langchain 的 cache：查询和写入都在本类中完成，每次调用只查一次、写一次。
+    """
+    llm_id: str | None = None
+    response_cache: ResponseCache | None = Field(default=None, exclude=True)
+
+    def _governor(self) -> LLMGovernor | None:
+        if self.llm_id in _held.get():
+            return None
+        return LLMGovernor.lookup(self.llm_id)
+
+    def _flight(self, messages, stop, kwargs) -> tuple[str, str] | None:
+        """开启响应缓存时返回 (prompt, llm_string)，与 langchain 内置缓存的键一致"""
+        if self.response_cache is None:
+            return None
+        flight = normalize_prompt(messages), self._get_llm_string(stop=stop, **kwargs)
+        if cache_key(*flight) in _leading.get():
+            return None
+        return flight
+
+    def _lookup(self, flight: tuple[str, str]) -> ChatResult | None:
+        cached = self.response_cache.lookup(*flight)
+        return ChatResult(generations=self._convert_cached_generations(cached)) if cached else None
+
+    async def _alookup(self, flight: tuple[str, str]) -> ChatResult | None:
+        cached = await self.response_cache.alookup(*flight)
+        return ChatResult(generations=self._convert_cached_generations(cached)) if cached else None
+
+    def _lead(self, key: str) -> contextvars.Token:
+        return _leading.set(_leading.get() | {key})
+
+    def _land(self, flight: tuple[str, str], future: Future, result: ChatResult) -> None:
+        """先写缓存再唤醒等待者，之后到达的相同请求直接命中缓存"""
+        self.response_cache.update(*flight, result.generations)
+        future.set_result(result)
+
+    @staticmethod
+    def _release(key: str, future: Future, token: contextvars.Token) -> None:
+        if not future.done():
+            future.set_exception(RuntimeError("LLM request was cancelled"))
+        _flights.leave(key)
+        try:
+            _leading.reset(token)
+        except ValueError:
+            pass   # 生成器在其他上下文中被关闭
+
+    # ---------- 非流式 ----------
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        flight = self._flight(messages, stop, kwargs)
+        if flight is None:
+            return self._governed_generate(messages, stop, run_manager, **kwargs)
+        cached = self._lookup(flight)
+        if cached:
+            return cached
+        key = cache_key(*flight)
+        leader, future = _flights.join(key)
+        if not leader:
+            return future.result()
+        token = self._lead(key)
+        try:
+            result = self._governed_generate(messages, stop, run_manager, **kwargs)
+            self._land(flight, future, result)
+            return result
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            self._release(key, future, token)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        flight = self._flight(messages, stop, kwargs)
+        if flight is None:
+            return await self._governed_agenerate(messages, stop, run_manager, **kwargs)
+        cached = await self._alookup(flight)
+        if cached:
+            return cached
+        key = cache_key(*flight)
+        leader, future = _flights.join(key)
+        if not leader:
+            return await asyncio.wrap_future(future)
+        token = self._lead(key)
+        try:
+            result = await self._governed_agenerate(messages, stop, run_manager, **kwargs)
+            self._land(flight, future, result)
+            return result
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            self._release(key, future, token)
+
+    def _governed_generate(self, messages, stop=None, run_manager=None, **kwargs):
+        governor = self._governor()
+        if not governor:
+            return super()._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        with governor.slot(estimate_tokens(messages)):
+            result = super()._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        governor.charge(sum(_output_tokens(g.message) for g in result.generations))
+        return result
+
+    async def _governed_agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        governor = self._governor()
+        if not governor:
+            return await super()._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        async with governor.aslot(estimate_tokens(messages)):
+            result = await super()._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        governor.charge(sum(_output_tokens(g.message) for g in result.generations))
+        return result
+
+    # ---------- 流式 ----------
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        flight = self._flight(messages, stop, kwargs)
+        if flight is None:
+            yield from self._governed_stream(messages, stop=stop, run_manager=run_manager, **kwargs)
+            return
+        cached = self._lookup(flight)
+        if cached:
+            yield _to_chunk(cached)
+            return
+        key = cache_key(*flight)
+        leader, future = _flights.join(key)
+        if not leader:
+            yield _to_chunk(future.result())
+            return
+        token = self._lead(key)
+        try:
+            chunks = []
+            for chunk in self._governed_stream(messages, stop=stop, run_manager=run_manager, **kwargs):
+                chunks.append(chunk)
+                yield chunk
+            self._land(flight, future, generate_from_stream(iter(chunks)))
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            self._release(key, future, token)
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        flight = self._flight(messages, stop, kwargs)
+        if flight is None:
+            async for chunk in self._governed_astream(messages, stop=stop, run_manager=run_manager, **kwargs):
+                yield chunk
+            return
+        cached = await self._alookup(flight)
+        if cached:
+            yield _to_chunk(cached)
+            return
+        key = cache_key(*flight)
+        leader, future = _flights.join(key)
+        if not leader:
+            yield _to_chunk(await asyncio.wrap_future(future))
+            return
+        token = self._lead(key)
+        try:
+            chunks = []
+            async for chunk in self._governed_astream(messages, stop=stop, run_manager=run_manager, **kwargs):
+                chunks.append(chunk)
+                yield chunk
+            self._land(flight, future, generate_from_stream(iter(chunks)))
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            self._release(key, future, token)
+
+    def _governed_stream(self, messages, *args, **kwargs):
+        governor = self._governor()
+        if not governor:
+            yield from super()._stream(messages, *args, **kwargs)
+            return
+        chunks = []
+        with governor.slot(estimate_tokens(messages)):
+            for chunk in super()._stream(messages, *args, **kwargs):
+                chunks.append(chunk)
+                yield chunk
+        governor.charge(_stream_tokens(chunks))
+
+    async def _governed_astream(self, messages, *args, **kwargs):
+        governor = self._governor()
+        if not governor:
+            async for chunk in super()._astream(messages, *args, **kwargs):
+                yield chunk
+            return
+        chunks = []
+        async with governor.aslot(estimate_tokens(messages)):
+            async for chunk in super()._astream(messages, *args, **kwargs):
+                chunks.append(chunk)
+                yield chunk
+        governor.charge(_stream_tokens(chunks))
+
+
+class GovernedChatOllama(GovernedChatModel, ChatOllama):
+    pass
+
+
+class GovernedChatOpenAI(GovernedChatModel, ChatOpenAI):
+    pass
+
+
+def _limits(llm_info: Dict[str, Any]) -> httpx.Limits:
+    size = LLMGovernor._limits(llm_info)[0] or DEFAULT_POOL_SIZE
+    return httpx.Limits(max_connections=size, max_keepalive_connections=size,
+                        keepalive_expiry=KEEPALIVE_EXPIRY)
+
+
+def _response_cache(llm_info: Dict[str, Any]) -> ResponseCache | None:
+    """response_cache 为真时开启响应缓存；cache_ttl（秒）为有效期，0 表示不过期"""
+    if not llm_info.get('response_cache'):
+        return None
+    try:
+        ttl = max(0, int(llm_info.get('cache_ttl', DEFAULT_TTL)))
+    except (TypeError, ValueError):
+        ttl = DEFAULT_TTL
+    return ResponseCache(ttl)
+
+
+def create_chat_model(llm_info: Dict[str, Any]) -> BaseChatModel | None:
+    """按 meta/llms 配置创建受 LLMGovernor 管控的对话模型（带 keep-alive 连接池，可选响应缓存）"""
+    LLMGovernor.for_llm(llm_info)
+    if llm_info['type'] == 'ollama':
+        return GovernedChatOllama(
+            llm_id=llm_info.get('id'),
+            response_cache=_response_cache(llm_info),
+            model=llm_info['model'],  # ollama list 里看到的模型名
+            base_url=llm_info['base_url'],
+            temperature=llm_info['temperature'],
+            client_kwargs={"limits": _limits(llm_info)},
+        )
+    elif llm_info['type'] == 'custom':
+        limits = _limits(llm_info)
+        return GovernedChatOpenAI(
+            llm_id=llm_info.get('id'),
+            response_cache=_response_cache(llm_info),
+            model=llm_info['model'],
+            base_url=llm_info['base_url'],
+            api_key=llm_info['api_key'],
+            temperature=llm_info['temperature'],
+            max_tokens=llm_info['max_tokens'],
+            http_client=httpx.Client(limits=limits),
+            http_async_client=httpx.AsyncClient(limits=limits),
+        )
+    return None
+
+
+def _http_clients(model: BaseChatModel) -> tuple[list, list]:
+    """取出模型底层的 httpx 客户端：(同步, 异步)"""
+    if isinstance(model, ChatOllama):
+        return [model._client._client], [model._async_client._client]
+    if isinstance(model, ChatOpenAI):
+        return [model.http_client], [model.http_async_client]
+    return [], []
+
+
+class LLMRegistry:
+    """
+    进程级的对话模型注册表：同一 meta/llms 配置（含参数）只创建一个模型实例，
+    所有 agent 共享它的 HTTP 连接池，减少 TCP/TLS 建连和文件句柄。
+    同一进程内的异步调用都来自同一个事件循环（JobManager 或工作进程的常驻循环），
+    因此异步连接池也可以安全共享。
+    """
+    _models: Dict[str, BaseChatModel] = {}
+    _lock = threading.Lock()
+
+    @staticmethod
+    def _key(llm_info: Dict[str, Any]) -> str:
+        params = {k: v for k, v in llm_info.items() if k not in ('created_at', 'updated_at')}
+        return json.dumps(params, sort_keys=True, ensure_ascii=False, default=str)
+
+    @classmethod
+    def get(cls, llm_info: Dict[str, Any]) -> BaseChatModel | None:
+        key = cls._key(llm_info)
+        with cls._lock:
+            model = cls._models.get(key)
+            if model is None:
+                model = create_chat_model(llm_info)
+                if model is not None:
+                    cls._models[key] = model
+                return model
+        LLMGovernor.for_llm(llm_info)   # 限流配置可能已修改
+        return model
+
+    @classmethod
+    def _drain(cls) -> List[BaseChatModel]:
+        with cls._lock:
+            models = list(cls._models.values())
+            cls._models.clear()
+        return models
+
+    @classmethod
+    def close(cls) -> None:
+        """关闭全部同步连接池；异步连接池由 aclose 关闭"""
+        with cls._lock:
+            models = list(cls._models.values())
+        for model in models:
+            for client in _http_clients(model)[0]:
+                try:
+                    client.close()
+                except Exception as e:
+                    logger.warning("Close LLM client %s failed: %s", getattr(model, 'llm_id', None), e)
+
+    @classmethod
+    async def aclose(cls) -> None:
+        for model in cls._drain():
+            for client in _http_clients(model)[1]:
+                try:
+                    await client.aclose()
+                except Exception as e:
+                    logger.warning("Close LLM async client %s failed: %s", getattr(model, 'llm_id', None), e)
@@ -0,0 +1,120 @@
+#service/entity/llm_cache.py
+import contextvars
+import hashlib
+import sqlite3
+import threading
+import warnings
+from concurrent.futures import Future
+from logging import getLogger
+from typing import Dict, Any, List, Sequence
+from langchain_core.caches import BaseCache, RETURN_VAL_TYPE
+from langchain_core.load import dumps, loads
+from service.result.store import SQLiteStore
+
+logger = getLogger(__name__)
+
+CACHE_FILE = "llm_responses.sqlite"
+DEFAULT_TTL = 7 * 24 * 3600   # 缓存有效期（秒），llm 配置 cache_ttl 可覆盖，0 表示不过期
+
+
+def cache_key(prompt: str, llm_string: str) -> str:
+    """模型配置（含解码参数）+ 渲染后的 prompt"""
+    return hashlib.sha256(f"{llm_string}\x00{prompt}".encode("utf-8")).hexdigest()
+
+
+class CacheStats:
+    """一次实验的缓存命中统计；通过 contextvar 传到该实验的各行（线程 / 协程）"""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0         # 未命中且实际调用了模型的次数
+        self.deduplicated = 0   # 未命中、但等待同一 prompt 的在途请求而没有重复调用的次数（不计入 misses）
+        self._lock = threading.Lock()
+
+    def record(self, field: str, n: int = 1) -> None:
+        with self._lock:
+            setattr(self, field, getattr(self, field) + n)
+
+    def merge(self, other: Dict[str, int]) -> None:
+        for field in ('hits', 'misses', 'deduplicated'):
+            self.record(field, other.get(field, 0))
+
+    def as_dict(self) -> Dict[str, int]:
+        return {'hits': self.hits, 'misses': self.misses, 'deduplicated': self.deduplicated}
+
+
+cache_stats: contextvars.ContextVar[CacheStats | None] = contextvars.ContextVar("llm_cache_stats", default=None)
+
+
+def _record(field: str) -> None:
+    stats = cache_stats.get()
+    if stats is not None:
+        stats.record(field)
+
+
+_store = SQLiteStore(CACHE_FILE)
+
+
+class ResponseCache(BaseCache):
+    """
+    LLM 响应缓存（langchain BaseCache），由 meta/llms 中的 response_cache 开启。
+    所有模型共用一个 SQLite 库，键已包含模型配置，ttl 按模型分别设置。
+    """
+
+    def __init__(self, ttl: int = DEFAULT_TTL):
+        self.ttl = ttl
+
+    def lookup(self, prompt: str, llm_string: str) -> RETURN_VAL_TYPE | None:
+        try:
+            value = _store.get(cache_key(prompt, llm_string), self.ttl)
+        except sqlite3.Error as e:
+            logger.warning("LLM response cache lookup failed: %s", e)
+            value = None
+        if value is None:
+            # 未命中由 SingleFlight.join 计数：调用模型的计为 misses，等待在途请求的计为 deduplicated
+            return None
+        _record('hits')
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")   # loads 为 beta 接口；缓存内容由本进程写入
+            return loads(value)
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        try:
+            _store.put(cache_key(prompt, llm_string), dumps(list(return_val)))
+        except sqlite3.Error as e:
+            logger.warning("LLM response cache update failed: %s", e)
+
+    def clear(self, **kwargs: Any) -> None:
+        _store.clear()
+
+
+class SingleFlight:
+    """相同 prompt 的并发请求只发一次，其余调用方等待并共享结果"""
+
+    def __init__(self):
+        self._flights: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def join(self, key: str) -> tuple[bool, Future]:
+        """返回 (是否由调用方执行, Future)；在缓存未命中后调用"""
+        with self._lock:
+            future = self._flights.get(key)
+            if future is not None:
+                _record('deduplicated')
+                return False, future
+            _record('misses')
+            future = self._flights[key] = Future()
+            return True, future
+
+    def leave(self, key: str) -> None:
+        with self._lock:
+            self._flights.pop(key, None)
+
+
+def normalize_prompt(messages: Sequence[Any]) -> str:
+    """与 langchain 内置缓存相同的 prompt 序列化（忽略消息 id）"""
+    normalized: List[Any] = [
+        msg.model_copy(update={"id": None}) if getattr(msg, "id", None) is not None else msg
+        for msg in messages
+    ]
+    return dumps(normalized)
@@ -0,0 +1,121 @@
+#service/entity/node_cache.py
+import contextvars
+import hashlib
+import json
+import threading
+from logging import getLogger
+from typing import Dict, Any, Callable
+from service.meta.loader import MetaLoader
+from service.result.store import SQLiteStore
+
+logger = getLogger(__name__)
+
+CACHE_FILE = "node_outputs.sqlite"
+_IGNORED = ('id', 'created_at', 'updated_at', 'name', 'description')   # 不影响节点输出的字段
+
+_store = SQLiteStore(CACHE_FILE)
+
+
+class NodeReport:
+    """一次实验中各节点复用 / 重新计算的次数"""
+
+    def __init__(self):
+        self.nodes: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, node: str, reused: bool, n: int = 1) -> None:
+        with self._lock:
+            counts = self.nodes.setdefault(node, {'reused': 0, 'recomputed': 0})
+            counts['reused' if reused else 'recomputed'] += n
+
+    def merge(self, other: Dict[str, Dict[str, int]]) -> None:
+        for node, counts in other.items():
+            self.record(node, True, counts.get('reused', 0))
+            self.record(node, False, counts.get('recomputed', 0))
+
+    def as_dict(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {node: dict(counts) for node, counts in self.nodes.items()}
+
+
+# 实验开启 node_cache 时由执行器设置；为 None 时不做节点缓存（如交互式测试）
+node_report: contextvars.ContextVar[NodeReport | None] = contextvars.ContextVar("node_report", default=None)
+
+
+def _definition(name: str, id: str) -> Dict[str, Any]:
+    meta = MetaLoader.load(name, id) or {}
+    return {k: v for k, v in meta.items() if k not in _IGNORED}
+
+
+def _collect(agent_id: str, parts: Dict[str, Any], meta: Dict[str, Any] | None = None) -> None:
+    """agent 定义 + 它用到的 llm / tool，SUB 还包括子图及子图中的 agent；meta 为覆盖 meta/agents 的定义"""
+    if f"agents/{agent_id}" in parts:
+        return
+    if meta is not None:
+        agent = {k: v for k, v in meta.items() if k not in _IGNORED}
+    else:
+        agent = _definition("agents", agent_id)
+    parts[f"agents/{agent_id}"] = agent
+    if agent.get("type") == "LLM" and agent.get("model"):
+        model = agent["model"].strip()
+        parts[f"llms/{model}"] = _definition("llms", model)
+    for tool_id in agent.get("tools") or []:
+        parts[f"tools/{tool_id}"] = _definition("tools", tool_id)
+    if agent.get("type") == "SUB":
+        graph = _definition("graphs", agent_id)
+        parts[f"graphs/{agent_id}"] = graph
+        for node in graph.get("nodes", []):
+            if node not in ("START", "END"):
+                _collect(node, parts)
+
+
+def definition_fingerprint(agent_id: str, meta: Dict[str, Any] | None = None) -> str:
+    """节点定义指纹：按内容计算（与文件修改时间无关），定义不变则跨运行保持一致"""
+    parts: Dict[str, Any] = {}
+    _collect(agent_id, parts, meta)
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+                          .encode("utf-8")).hexdigest()
+
+
+def _failed(out: Dict[str, Any]) -> bool:
+    """PGM 执行出错时 state['error'] 会出现在输出中，这类结果不缓存"""
+    return 'error' in out or any(isinstance(v, dict) and 'error' in v for v in out.values())
+
+
+def memoize(node: str, agent: Any, invoke: Callable[[Dict[str, Any]], Any],
+            meta: Dict[str, Any] | None = None) -> Callable[[Dict[str, Any]], Any]:
+    """
+    包装图节点：键为 节点定义指纹 + 输入 state 切片的哈希。
+    LLM 节点只读取 inputs 中的字段；PGM / SUB 可访问整个 state，因此按整个 state 计算。
+    上游输出变化会改变下游的输入切片，下游随之重新计算。
+    """
+    fingerprint = definition_fingerprint(node, meta)
+
+    def run(s):
+        report = node_report.get()
+        if report is None:
+            return invoke(s)
+        if agent.type == "LLM":
+            inputs = {k: s[k] for k in agent.inputs if k in s}
+        else:
+            inputs = dict(s)
+        try:
+            key = hashlib.sha256((fingerprint + json.dumps(inputs, sort_keys=True, ensure_ascii=False, default=str))
+                                 .encode("utf-8")).hexdigest()
+        except (TypeError, ValueError):
+            report.record(node, False)
+            return invoke(s)
+        cached = _store.get(key)
+        if cached is not None:
+            report.record(node, True)
+            return json.loads(cached)
+        out = invoke(s)
+        report.record(node, False)
+        if isinstance(out, dict) and not _failed(out):
+            try:
+                _store.put(key, json.dumps(out, ensure_ascii=False))
+            except (TypeError, ValueError) as e:
+                logger.debug("Output of node %s is not cacheable: %s", node, e)
+        return out
+
+    return run
@@ -1,16 +1,15 @@
-import json
-
+import threading
+from logging import getLogger
 from plugin.plugin_loader import get_plugin,aget_plugin
 from service.entity.agent import AgentEntity
 from service.entity.graph import GraphEntity
 from service.entity.entity import Entity, EntityLoader
-from typing import TypedDict, TypeVar, Dict, Any
+from typing import TypedDict, TypeVar, Dict, Any, Tuple, List
 from service.meta.loader import MetaLoader
-from langchain_core.runnables import RunnableConfig
-from pathlib import Path
+from service.result.loader import ResultLoader
 
 T = TypeVar("T", bound=TypedDict)
-RESULT_DIR = Path(__file__).resolve().parent.parent.parent  / "result"
+logger = getLogger(__name__)
 
 def _seek_checkpointer():
     postgres_checkpoint = get_plugin("AsyncPostgresSaver")
@@ -24,47 +23,119 @@ async def _seek_acheckpointer():
             return postgres_checkpoint
     return get_plugin("InMemorySaver")
 
+# 已编译的 runner：{(load/aload, id): (指纹, runner)}
+_runners: Dict[Tuple[str, str], Tuple[tuple, Entity]] = {}
+_runners_lock = threading.Lock()
+
+
+def _collect(name: str, id: str, deps: Dict[Tuple[str, str], Any]) -> None:
+    """递归收集 runner 依赖的全部配置文件及其 (mtime_ns, size)"""
+    if not id or (name, id) in deps:
+        return
+    deps[(name, id)] = MetaLoader.stat(name, id)
+    if deps[(name, id)] is None:
+        return
+    meta = MetaLoader.load(name, id) or {}
+    if name == "agents":
+        model = (meta.get("model") or "").strip()
+        if meta.get("type") == "LLM" and model:
+            deps[("llms", model)] = MetaLoader.stat("llms", model)
+        for tool_id in meta.get("tools") or []:
+            deps[("tools", tool_id)] = MetaLoader.stat("tools", tool_id)
+        if meta.get("type") == "SUB":
+            _collect("graphs", id, deps)
+    elif name == "graphs":
+        for node in meta.get("nodes", []):
+            if node in ("START", "END"):
+                continue
+            # 子图由节点 agent 的 type（SUB）决定，与运行时 _call_agent 一致，不看节点名
+            _collect("agents", node, deps)
+
+
+def fingerprint(runner_id: str, checkpointer: Any = None) -> tuple:
+    """runner 指纹：graph/agent/llm/tool 配置文件的状态 + checkpointer，任一变化即失效"""
+    deps: Dict[Tuple[str, str], Any] = {}
+    _collect("agents", runner_id, deps)
+    _collect("graphs", runner_id, deps)
+    return tuple(sorted(deps.items())), id(checkpointer)
+
+
+def _cached(kind: str, id: str, key: tuple) -> Entity | None:
+    with _runners_lock:
+        hit = _runners.get((kind, id))
+    if hit and hit[0] == key:
+        return hit[1]
+    return None
+
+
+def _store(kind: str, id: str, key: tuple, runner: Entity) -> Entity:
+    with _runners_lock:
+        _runners[(kind, id)] = (key, runner)
+    logger.debug("Runner %s compiled (%s)", id, kind)
+    return runner
+
+
 class RunnerLoader(EntityLoader):
+    """
+    编译好的 runner 按指纹缓存复用，避免每次请求都重建 StateGraph、模型客户端和工具。
+    不同行之间靠 thread_id 隔离状态，因此可以共享同一个 runner。
+    """
 
     @staticmethod
     def load(id: str,**extra_params) -> Entity | None:
         checkpointer = _seek_checkpointer()
+        key = fingerprint(id, checkpointer)
+        runner = _cached("load", id, key)
+        if runner:
+            return runner
         meta = MetaLoader.load("agents", id)
         if meta and not meta['type']=="SUB":
-                return AgentEntity(meta, checkpointer=checkpointer)
+                runner = AgentEntity(meta, checkpointer=checkpointer)
         else:
                 meta = MetaLoader.load("graphs",id)
-                return GraphEntity(meta, checkpointer=checkpointer)
+                runner = GraphEntity(meta, checkpointer=checkpointer)
+        return _store("load", id, key, runner)
 
     @staticmethod
     async def aload(id: str,**extra_params) -> Entity | None:
         checkpointer = await _seek_acheckpointer()
+        key = fingerprint(id, checkpointer)
+        runner = _cached("aload", id, key)
+        if runner:
+            return runner
         meta=MetaLoader.load("agents",id)
         if meta:
-            return AgentEntity(meta, checkpointer=checkpointer)
+            runner = AgentEntity(meta, checkpointer=checkpointer)
         else:
             meta = MetaLoader.load("graphs",id)
-            return GraphEntity(meta, checkpointer=checkpointer)
+            runner = GraphEntity(meta, checkpointer=checkpointer)
+        return _store("aload", id, key, runner)
+
+    @staticmethod
+    def load_partial(id: str, start_node: str, agents: Dict[str, Dict[str, Any]] | None = None,
+                     extra_state: List[str] | None = None) -> GraphEntity:
+        """只包含 start_node 及其下游节点的图 runner，用于重新评估；每次重新编译，不进缓存"""
+        meta = MetaLoader.load("graphs", id)
+        if not meta:
+            raise ValueError(f"Graph {id} not found")
+        return GraphEntity(meta, checkpointer=_seek_checkpointer(), start_node=start_node,
+                           agents=agents, extra_state=extra_state)
 
     @staticmethod
     def persistence(meta: Dict[str, Any]) -> None:
+        """
+        补写 checkpointer 中有、结果文件中还没有的行。
+        正常运行时每行结束即由执行器追加，这里只负责兜底（如外部直接标记 completed）。
+        """
         exp_id = meta["exp_id"]
-        path = RESULT_DIR / exp_id
-        path.mkdir(parents=True, exist_ok=True)
-
         total = meta["samples"]
+        stored = set(ResultLoader.indices(exp_id))
+        missing = [idx for idx in range(1, total + 1) if idx not in stored]
+        if not missing:
+            return
         runner = RunnerLoader.load(meta["runner_id"])
-
-        result = {}
-        for idx in range(1, total + 1):
+        for idx in missing:
             config = {"configurable": {"thread_id": f"{exp_id}_{idx}"}}
             state = runner.get_state(config)
             if state and state.values and state.created_at:
-                result[idx] = state.values
-
-        # 写入文件
-        (path / "states.json").write_text(
-            json.dumps(result, ensure_ascii=False, indent=2),
-            encoding="utf-8"
-        )
-
+                ResultLoader.append(exp_id, idx, state.values)
@@ -1,16 +1,56 @@
+import threading
+from collections.abc import Sequence
 from dataclasses import asdict
-from typing import Any
+from typing import Any, Iterator
 from logging import getLogger
 
 import csv
 from pathlib import Path
-from data.data_parser import CIDParser
+from data.data_parser import Article, iter_pubtator, count_pubtator
 from service.entity.entity import EntityLoader
+from utils.text_index import TextIndex, INDEX_SUFFIX, text_index, flatten
 
 TEST_DIR = Path(__file__).resolve().parent.parent.parent  / "tests"
 logger = getLogger(__name__)
 
 
+class LazyRows(Sequence):
+    """
+    按需解析的行序列：长度预先给出，按下标访问时才把生成器推进到该位置，
+    因此只看前几页、或按顺序逐行执行的实验不必等整个文件解析完。
+    """
+
+    def __init__(self, rows: Iterator[Any], total: int):
+        self._rows = rows
+        self._total = total
+        self._parsed: list = []
+        self._lock = threading.Lock()
+
+    def _fill(self, stop: int) -> None:
+        with self._lock:
+            while len(self._parsed) < stop:
+                try:
+                    self._parsed.append(next(self._rows))
+                except StopIteration:
+                    self._total = len(self._parsed)
+                    return
+
+    def __len__(self) -> int:
+        return self._total
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            start, stop, step = i.indices(self._total)
+            self._fill(stop)
+            return self._parsed[start:stop:step]
+        if i < 0:
+            i += self._total
+        self._fill(i + 1)
+        if not 0 <= i < len(self._parsed):
+            raise IndexError(i)
+        return self._parsed[i]
+
+
 class TestLoader(EntityLoader):
 
     @staticmethod
@@ -24,14 +64,31 @@ class TestLoader(EntityLoader):
                 rows = list(reader)
                 return list(rows[0].keys()), rows
         elif '.txt' in file:
-
-            parser=CIDParser(test_file.read_text(encoding='utf-8'))
-            articles = parser.get_articles()
-            field_names = list(articles[0].__dataclass_fields__.keys()) if articles else []
-            articles = [asdict(art) for art in articles]
+            # PubTator：逐行流式解析，行在第一次被访问时才构建
+            total = count_pubtator(test_file)
+            field_names = list(Article.__dataclass_fields__.keys()) if total else []
+            articles = LazyRows((asdict(art) for art in iter_pubtator(test_file)), total)
             return field_names, articles
         return [], []
 
+    @staticmethod
+    def search_index(id: str, file: str, fields: list, rows) -> TextIndex | None:
+        """
+        测试文件的倒排索引（tests/<id>/<file>.search.npz），文档位置即 rows 的下标。
+        fields 中每个字段都以 `字段:词` 收录；列表 / 字典字段（如实体）只收录叶子值。
+        """
+        test_file = TEST_DIR / id / file
+        if not test_file.is_file() or not fields:
+            return None
+        st = test_file.stat()
+        stamp = ((test_file.name, st.st_mtime_ns, st.st_size), tuple(fields))
+
+        def text(i):
+            row = rows[i]
+            return {f: flatten(row.get(f)) for f in fields}
+
+        return text_index(test_file, stamp, len(rows), text)
+
     @staticmethod
     def load_by_graph(graph, test_sets):
         graph_test_set_dir = TEST_DIR / graph['id']
@@ -228,14 +285,12 @@ class TestLoader(EntityLoader):
             try:
                 test_id = txt_file.stem
                 txt_path = agent_dir / f"{test_id}.txt"
-                parser=CIDParser(txt_path.read_text(encoding='utf-8'))
-                articles = parser.get_articles()
                 test_data = {
                     "id": test_id,
                     "name": txt_file.name,  # 默认用文件名作为name
                     "agent_id": agent_id,
                     "inputs": {"doc_id": "", "entities": "", "relations": ""},
-                    "count": len(articles),
+                    "count": count_pubtator(txt_path),
                 }
                 tests.append(test_data)
             except Exception as e:
@@ -249,6 +304,7 @@ class TestLoader(EntityLoader):
         csv_file = TEST_DIR / agent_id / f"{test_id}.csv"
         if csv_file.exists():
             csv_file.unlink()
+            csv_file.with_name(csv_file.name + INDEX_SUFFIX).unlink(missing_ok=True)
             return True
         return False
 
@@ -0,0 +1,268 @@
+#service/experiment/executor.py
+import asyncio
+import contextvars
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from logging import getLogger
+from typing import Dict, Any, List, AsyncIterator, Iterable
+from langchain_core.runnables import RunnableConfig
+from service.entity.entity import Entity
+from service.entity.llm_cache import CacheStats, cache_stats
+from service.entity.node_cache import NodeReport, node_report
+from service.result.loader import ResultLoader
+
+logger = getLogger(__name__)
+
+DEFAULT_CONCURRENCY = 4   # exps/*.json 未配置 concurrency 时的默认并发行数
+RUN_MODES = ('resume', 'retry_failed', 'all')
+DEFAULT_RUN_MODE = 'resume'
+EXECUTION_MODES = ('async', 'process')   # process: 按行分片到多进程，适合 CPU 密集的 PGM/Flair 图
+
+
+def get_concurrency(exp_cfg: Dict[str, Any]) -> int:
+    """读取实验配置中的 concurrency，非法值回退到默认值"""
+    try:
+        return max(1, int(exp_cfg.get("concurrency") or DEFAULT_CONCURRENCY))
+    except (TypeError, ValueError):
+        return DEFAULT_CONCURRENCY
+
+
+def get_workers(exp_cfg: Dict[str, Any]) -> int:
+    """process 模式下的工作进程数，默认使用全部 CPU"""
+    try:
+        return max(1, int(exp_cfg.get("workers") or os.cpu_count() or 1))
+    except (TypeError, ValueError):
+        return os.cpu_count() or 1
+
+
+class ExperimentExecutor:
+    """
+    有界并发地执行实验中的每一行数据。
+    每行使用独立的 thread_id `{exp_id}_{idx}`，进度消息按完成数单调递增。
+    """
+
+    def __init__(self, exp_cfg: Dict[str, Any], rows: List[Any], runner: Entity):
+        self.exp_id = exp_cfg["exp_id"]
+        self.rows = rows
+        self.runner = runner
+        self.total = len(rows)
+        self.concurrency = get_concurrency(exp_cfg)
+        self.failed_rows = set(exp_cfg.get("failed_rows") or [])
+        self.completed = 0
+        self.cache_stats = CacheStats()   # 本次运行的 LLM 响应缓存命中统计
+        # node_cache 开启时复用定义和输入都未变化的节点输出，并记录各节点复用 / 重算次数
+        self.node_report = NodeReport() if exp_cfg.get("node_cache") else None
+
+    def _config(self, idx: int) -> RunnableConfig:
+        return {"configurable": {"thread_id": f'{self.exp_id}_{idx}'}}
+
+    def _checkpoint_done(self, idx: int) -> bool | None:
+        """
+        根据 checkpointer 判断该行是否已跑到 END。
+        没有 checkpoint 时返回 None，由调用方参考运行记录。
+        """
+        try:
+            state = self.runner.get_state(self._config(idx))
+        except Exception as e:
+            logger.warning("Read checkpoint %s_%s failed: %s", self.exp_id, idx, e)
+            return None
+        if not state or not state.values:
+            return None
+        return not state.next
+
+    def select_rows(self, mode: str = DEFAULT_RUN_MODE, stored: Iterable[int] | None = None) -> List[int]:
+        """
+        按运行模式挑选需要执行的行号：
+        - resume: 跳过已到 END 的行（checkpoint 优先，其次是已保存的结果且未记为失败）
+        - retry_failed: 只重跑记为失败或 checkpoint 停在中途的行
+        - all: 全部重跑
+        没有输入的行（如重新评估时源实验缺少 state）始终跳过；
+        按需解析的数据集（LazyRows）不在这里逐行检查，避免提前解析整个文件。
+        """
+        indices = list(range(1, self.total + 1))
+        if isinstance(self.rows, list):
+            indices = [idx for idx in indices if self.rows[idx - 1] is not None]
+        if mode == 'all':
+            return list(indices)
+        stored = set(stored or [])
+        selected = []
+        for idx in indices:
+            done = self._checkpoint_done(idx)
+            if mode == 'retry_failed':
+                if idx in self.failed_rows or done is False:
+                    selected.append(idx)
+                continue
+            if done is None:
+                done = idx in stored and idx not in self.failed_rows
+            if not done:
+                selected.append(idx)
+        return selected
+
+    def _message(self, status: str, idx: int, **extra) -> Dict[str, Any]:
+        msg = {
+            'status': status,
+            'percent': int(self.completed / self.total * 100) if self.total else 100,
+            'completed': self.completed,
+            'total': self.total,
+            'current_index': idx  # 当前处理的行号
+        }
+        msg.update(extra)
+        return msg
+
+    async def _run_row(self, idx: int, semaphore: asyncio.Semaphore, queue: asyncio.Queue) -> None:
+        async with semaphore:
+            config = self._config(idx)
+            await queue.put(('running', idx, None))
+            try:
+                row = self.rows[idx - 1]   # 拿到并发名额后才取行，按需解析的数据集随执行进度逐步解析
+                finished = False
+                async for event in await self.runner.astream_events(row, config=config):
+                    # 根节点结束（tags 为空）即该行完成
+                    if not finished and event["event"] == "on_chain_end" and event.get("tags", []) == []:
+                        finished = True
+                if not finished:
+                    await queue.put(('failed', idx, 'Runner finished without output'))
+                    return
+                loop = asyncio.get_running_loop()
+                state = await loop.run_in_executor(None, self.runner.get_state, config)
+                await self._persist(idx, state.values if state else None)
+                await queue.put(('completed', idx, None))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Row %s of experiment %s failed: %s", idx, self.exp_id, e)
+                await queue.put(('failed', idx, str(e)))
+
+    async def _persist(self, idx: int, values: Any) -> None:
+        """每行结束立即追加到结果分段文件，不必等整个实验结束"""
+        if values:
+            await asyncio.get_running_loop().run_in_executor(None, ResultLoader.append, self.exp_id, idx, values)
+
+    async def run(self, indices: List[int] | None = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        逐条产出进度消息，直到所有待执行行结束。
+        indices 为待执行的行号（从 1 开始），未给出时执行全部；跳过的行计入已完成。
+        """
+        if indices is None:
+            indices = list(range(1, self.total + 1))
+        self.completed = self.total - len(indices)
+        queue: asyncio.Queue = asyncio.Queue()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        # 各行在带有本实验缓存统计的上下文中运行
+        context = contextvars.copy_context()
+        context.run(cache_stats.set, self.cache_stats)
+        context.run(node_report.set, self.node_report)
+        tasks = [asyncio.create_task(self._run_row(idx, semaphore, queue),
+                                     context=context.copy())
+                 for idx in indices]
+        finished = 0
+        try:
+            while finished < len(tasks):
+                status, idx, error = await queue.get()
+                if status == 'running':
+                    yield self._message('running', idx)
+                    continue
+                finished += 1
+                if status == 'completed':
+                    self.completed += 1
+                    self.failed_rows.discard(idx)
+                    yield self._message('completed', idx)
+                else:
+                    self.failed_rows.add(idx)
+                    yield self._message('failed', idx, error=error)
+        finally:
+            # 客户端断开或异常退出时，取消仍在运行的行
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+
+# ---------- process 模式：工作进程 ----------
+_worker_runner: Entity | None = None
+_worker_loop: asyncio.AbstractEventLoop | None = None
+
+
+def _init_worker(runner_id: str) -> None:
+    """每个工作进程只加载一次插件和 runner，并使用一个常驻事件循环（共享的 LLM 异步连接池绑定在该循环上）"""
+    global _worker_runner, _worker_loop
+    from plugin.plugin_loader import load_plugins
+    load_plugins()
+    from service.entity.runner import RunnerLoader
+    _worker_runner = RunnerLoader.load(runner_id)
+    _worker_loop = asyncio.new_event_loop()
+
+
+async def _drain(runner: Entity, row: Any, config: RunnableConfig) -> bool:
+    finished = False
+    async for event in await runner.astream_events(row, config=config):
+        if event["event"] == "on_chain_end" and event.get("tags", []) == []:
+            finished = True
+    return finished
+
+
+def _process_row(exp_id: str, idx: int, row: Any, memo: bool = False) -> tuple[Any, Dict[str, int], Dict[str, Any] | None]:
+    """在工作进程中执行一行，返回 (最终 state, 缓存统计, 节点报告) 由主进程追加到结果文件并汇总"""
+    config: RunnableConfig = {"configurable": {"thread_id": f'{exp_id}_{idx}'}}
+    stats = CacheStats()
+    cache_stats.set(stats)
+    report = NodeReport() if memo else None
+    node_report.set(report)
+    if not _worker_loop.run_until_complete(_drain(_worker_runner, row, config)):
+        raise RuntimeError('Runner finished without output')
+    state = _worker_runner.get_state(config)
+    return (state.values if state else None), stats.as_dict(), report.as_dict() if report else None
+
+
+class ProcessExperimentExecutor(ExperimentExecutor):
+    """
+    把行分片到进程池执行，绕开 GIL。
+    每个工作进程通过 plugin_loader 加载插件、用 RunnerLoader.load 构建 runner，
+    单行结果回传主进程用于进度与持久化。
+    """
+
+    def __init__(self, exp_cfg: Dict[str, Any], rows: List[Any], runner: Entity):
+        super().__init__(exp_cfg, rows, runner)
+        self.runner_id = exp_cfg["runner_id"]
+        self.concurrency = get_workers(exp_cfg)
+        self.pool: ProcessPoolExecutor | None = None
+
+    async def _run_row(self, idx: int, semaphore: asyncio.Semaphore, queue: asyncio.Queue) -> None:
+        async with semaphore:
+            await queue.put(('running', idx, None))
+            try:
+                row = self.rows[idx - 1]
+                loop = asyncio.get_running_loop()
+                values, stats, report = await loop.run_in_executor(self.pool, _process_row, self.exp_id, idx, row,
+                                                                   self.node_report is not None)
+                self.cache_stats.merge(stats)
+                if report:
+                    self.node_report.merge(report)
+                await self._persist(idx, values)
+                await queue.put(('completed', idx, None))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Row %s of experiment %s failed: %s", idx, self.exp_id, e)
+                await queue.put(('failed', idx, str(e)))
+
+    async def run(self, indices: List[int] | None = None) -> AsyncIterator[Dict[str, Any]]:
+        # spawn：避免 fork 复制后台线程与事件循环
+        self.pool = ProcessPoolExecutor(max_workers=self.concurrency,
+                                        mp_context=multiprocessing.get_context("spawn"),
+                                        initializer=_init_worker,
+                                        initargs=(self.runner_id,))
+        try:
+            async for msg in super().run(indices):
+                yield msg
+        finally:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            self.pool = None
+
+
+def create_executor(exp_cfg: Dict[str, Any], rows: List[Any], runner: Entity) -> ExperimentExecutor:
+    """按实验配置中的 execution（async / process）创建执行器；重新评估的部分图只能在本进程中运行"""
+    if exp_cfg.get("execution") == 'process' and not exp_cfg.get("source_exp"):
+        return ProcessExperimentExecutor(exp_cfg, rows, runner)
+    return ExperimentExecutor(exp_cfg, rows, runner)
@@ -0,0 +1,197 @@
+#service/experiment/job.py
+import asyncio
+import queue
+import threading
+from concurrent.futures import Future
+from logging import getLogger
+from typing import Dict, Any, List, Iterator
+from service.entity.runner import RunnerLoader
+from service.entity.test import TestLoader
+from service.experiment.executor import create_executor, RUN_MODES, DEFAULT_RUN_MODE
+from service.experiment.reevaluate import load_reevaluation
+from service.meta.loader import MetaLoader
+from service.result.loader import ResultLoader
+
+logger = getLogger(__name__)
+
+_DONE = object()   # 订阅队列里的结束标记
+
+
+class ExperimentJob:
+    """一次实验运行：保存最近的进度，并把进度消息广播给所有订阅者"""
+
+    def __init__(self, exp_id: str, mode: str = DEFAULT_RUN_MODE):
+        self.exp_id = exp_id
+        self.mode = mode if mode in RUN_MODES else DEFAULT_RUN_MODE
+        self.status = 'pending'
+        self.last_message: Dict[str, Any] | None = None
+        self.future: Future | None = None
+        self._subscribers: List[queue.Queue] = []
+        self._lock = threading.Lock()
+
+    @property
+    def done(self) -> bool:
+        return self.status in ('completed', 'failed')
+
+    def publish(self, msg: Dict[str, Any]) -> None:
+        with self._lock:
+            self.last_message = msg
+            for q in self._subscribers:
+                q.put_nowait(msg)
+
+    def finish(self, status: str) -> None:
+        with self._lock:
+            self.status = status
+            for q in self._subscribers:
+                q.put_nowait(_DONE)
+            self._subscribers.clear()
+
+    def subscribe(self) -> queue.Queue:
+        q: queue.Queue = queue.Queue()
+        with self._lock:
+            if self.last_message:
+                q.put_nowait(self.last_message)   # 新订阅者先拿到当前进度
+            if self.done:
+                q.put_nowait(_DONE)
+            else:
+                self._subscribers.append(q)
+        return q
+
+    def unsubscribe(self, q: queue.Queue) -> None:
+        with self._lock:
+            if q in self._subscribers:
+                self._subscribers.remove(q)
+
+
+class JobManager:
+    """
+    进程级实验任务管理器。
+    所有实验都在一个常驻后台线程的事件循环中运行，与 SSE 连接解耦：
+    浏览器断开只会取消订阅，不会中断实验。
+    """
+    _loop: asyncio.AbstractEventLoop | None = None
+    _thread: threading.Thread | None = None
+    _jobs: Dict[str, ExperimentJob] = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def _ensure_loop(cls) -> asyncio.AbstractEventLoop:
+        with cls._lock:
+            if cls._loop is None:
+                cls._loop = asyncio.new_event_loop()
+                cls._thread = threading.Thread(target=cls._loop.run_forever,
+                                               name="experiment-jobs", daemon=True)
+                cls._thread.start()
+            return cls._loop
+
+    @classmethod
+    def submit(cls, exp_id: str, mode: str = DEFAULT_RUN_MODE) -> ExperimentJob:
+        """
+        提交实验；同一实验正在运行时直接返回已有任务。
+        mode 见 ExperimentExecutor.select_rows（resume / retry_failed / all）
+        """
+        loop = cls._ensure_loop()
+        with cls._lock:
+            job = cls._jobs.get(exp_id)
+            if job and not job.done:
+                return job
+            job = ExperimentJob(exp_id, mode)
+            cls._jobs[exp_id] = job
+        job.future = asyncio.run_coroutine_threadsafe(cls._run(job), loop)
+        return job
+
+    @classmethod
+    def get(cls, exp_id: str) -> ExperimentJob | None:
+        return cls._jobs.get(exp_id)
+
+    @classmethod
+    def saved_status(cls, exp_cfg: Dict[str, Any]) -> str:
+        """
+        实验保存的状态。保存为 running 却没有后台任务（服务重启或崩溃后）时改为 interrupted 并写回，
+        否则页面会一直订阅一个不存在的任务。
+        """
+        status = exp_cfg.get('status', 'pending')
+        if status == 'running' and cls.get(exp_cfg['exp_id']) is None:
+            status = exp_cfg['status'] = 'interrupted'
+            MetaLoader.update("exps", exp_cfg['exp_id'], {'status': status})
+            logger.warning("Experiment %s was running without a job, marked as interrupted", exp_cfg['exp_id'])
+        return status
+
+    @classmethod
+    def subscribe(cls, exp_id: str, timeout: float = 15) -> Iterator[Dict[str, Any] | None]:
+        """
+        阻塞式订阅进度消息。
+        超时没有新消息时产出 None（调用方可发送心跳），任务结束后退出。
+        """
+        job = cls.get(exp_id)
+        if job is None:
+            return
+        q = job.subscribe()
+        try:
+            while True:
+                try:
+                    msg = q.get(timeout=timeout)
+                except queue.Empty:
+                    yield None
+                    continue
+                if msg is _DONE:
+                    return
+                yield msg
+        finally:
+            job.unsubscribe(q)
+
+    @classmethod
+    async def _run(cls, job: ExperimentJob) -> None:
+        exp_id = job.exp_id
+        job.status = 'running'
+        progress = 0
+        update = {}
+        try:
+            # 在 try 内读取：实验已被删除时任务也会正常结束并通知订阅者
+            exp_cfg = MetaLoader.load("exps", exp_id)
+            if not exp_cfg:
+                raise ValueError(f"Experiment {exp_id} not found")
+            MetaLoader.update("exps", exp_id, {'status': 'running', 'progress': 0})
+            loop = asyncio.get_running_loop()
+            runner_id = exp_cfg['runner_id']
+            if exp_cfg.get('source_exp'):
+                # 重新评估：输入为源实验保存的 state，只运行 start_node 及其下游节点
+                data, runner = await loop.run_in_executor(None, load_reevaluation, exp_cfg)
+            else:
+                fields, data = await loop.run_in_executor(None, TestLoader.load_by_id_file,
+                                                          runner_id, exp_cfg['dataset'])
+                runner = await RunnerLoader.aload(runner_id)
+            executor = create_executor(exp_cfg, data, runner)
+            if job.mode == 'all':
+                # 全部重跑：先清空旧结果，失败或跳过的行不会留下上一次的结果
+                await loop.run_in_executor(None, ResultLoader.clear, exp_id)
+            stored = ResultLoader.indices(exp_id) if job.mode != 'all' else None
+            indices = await loop.run_in_executor(None, executor.select_rows, job.mode, stored)
+            logger.info("Experiment %s (%s): %d of %d rows to run",
+                        exp_id, job.mode, len(indices), executor.total)
+            async for msg in executor.run(indices):
+                job.publish(msg)
+                if msg['percent'] != progress:
+                    progress = msg['percent']
+                    MetaLoader.update("exps", exp_id, {'progress': progress})
+            progress = int(executor.completed / executor.total * 100) if executor.total else 100
+            update['failed_rows'] = sorted(executor.failed_rows)
+            stats = executor.cache_stats.as_dict()
+            if stats['hits'] or stats['misses']:
+                update['llm_cache'] = stats
+            if executor.node_report is not None:
+                update['node_report'] = executor.node_report.as_dict()
+            status = 'failed' if executor.failed_rows else 'completed'
+            final = {'status': status, 'percent': progress, 'final': True}
+        except Exception as e:
+            logger.error("Experiment %s failed: %s", exp_id, e)
+            status = 'failed'
+            final = {'status': status, 'percent': progress, 'final': True, 'error': str(e)}
+        try:
+            update.update({'status': status, 'progress': progress})
+            if MetaLoader.load("exps", exp_id):
+                MetaLoader.update("exps", exp_id, update)
+        finally:
+            # 最后一条消息带 final：页面据此判断任务已结束
+            job.publish(final)
+            job.finish(status)
@@ -0,0 +1,88 @@
+#service/experiment/reevaluate.py
+import uuid
+from datetime import datetime
+from logging import getLogger
+from typing import Dict, Any, List
+from service.entity.entity import Entity
+from service.entity.runner import RunnerLoader
+from service.meta.loader import MetaLoader
+from service.result.loader import ResultLoader
+from utils.graphutils import downstream_nodes
+
+logger = getLogger(__name__)
+
+# 从源实验复制到新实验的字段
+_COPIED = ('dataset', 'runner_type', 'runner_id', 'runner_display', 'samples', 'concurrency', 'node_cache')
+
+
+def create_reevaluation(exp_id: str, start_node: str, agent: Dict[str, Any] | None = None) -> Dict[str, Any]:
+    """
+    基于已完成的图实验创建重新评估实验：只重放 start_node 及其下游节点，
+    上游节点的输出取自源实验保存的 state。agent 为 start_node 的新定义（可选，不写入 meta/agents）。
+    参数不合法时抛出 ValueError。
+    """
+    source = MetaLoader.load("exps", exp_id)
+    if not source:
+        raise ValueError(f"Experiment {exp_id} not found")
+    if source.get('runner_type') != 'graph':
+        raise ValueError("Only graph experiments can be re-evaluated")
+    graph = MetaLoader.load("graphs", source['runner_id'])
+    if not graph:
+        raise ValueError(f"Graph {source['runner_id']} not found")
+    downstream_nodes(graph, start_node)   # 校验节点是否在图中
+    if source.get('status') not in ('completed', 'failed', 'interrupted'):
+        # 有行失败（failed）或运行中断（interrupted）的实验，已保存的行仍可重新评估
+        raise ValueError(f"Experiment {exp_id} has not finished")
+    if not ResultLoader.indices(exp_id):
+        raise ValueError(f"Experiment {exp_id} has no stored states")
+    if agent is not None and not (isinstance(agent, dict) and agent.get('type')):
+        raise ValueError("Agent definition must be an object with a type")
+
+    new_id = str(uuid.uuid4())
+    exp_cfg = {k: source[k] for k in _COPIED if k in source}
+    exp_cfg.update({
+        'exp_id': new_id,
+        'name': f"{source.get('name', exp_id)}_reeval_{start_node}_{datetime.now().strftime('%Y%m%d%H%M%S')}",
+        'source_exp': exp_id,
+        'start_node': start_node,
+        'status': 'pending',
+        'progress': 0,
+    })
+    if agent is not None:
+        exp_cfg['agent_override'] = agent
+    MetaLoader.dump("exps", new_id, exp_cfg)
+    return exp_cfg
+
+
+def _source_state(exp_cfg: Dict[str, Any], idx: int) -> Dict[str, Any] | None:
+    """结果文件中缺少的行，回退到源实验 checkpointer 中的 state"""
+    try:
+        runner = RunnerLoader.load(exp_cfg['runner_id'])
+        state = runner.get_state({"configurable": {"thread_id": f"{exp_cfg['source_exp']}_{idx}"}})
+    except Exception as e:
+        logger.warning("Read checkpoint %s_%s failed: %s", exp_cfg['source_exp'], idx, e)
+        return None
+    return state.values if state and state.values else None
+
+
+def load_reevaluation(exp_cfg: Dict[str, Any]) -> tuple[List[Dict[str, Any] | None], Entity]:
+    """
+    返回 (各行输入 state, 部分图 runner)。
+    源实验中找不到 state 的行为 None，执行器会跳过这些行。
+    """
+    source_exp = exp_cfg['source_exp']
+    total = int(exp_cfg.get('samples') or 0) or max(ResultLoader.indices(source_exp), default=0)
+    stored = ResultLoader.load_rows(source_exp, range(1, total + 1))
+    rows: List[Dict[str, Any] | None] = []
+    for idx in range(1, total + 1):
+        row = stored.get(idx)
+        rows.append(row if row else _source_state(exp_cfg, idx))
+    missing = sum(1 for row in rows if row is None)
+    if missing:
+        logger.warning("Re-evaluation %s: %d of %d rows have no stored state in %s",
+                       exp_cfg['exp_id'], missing, total, source_exp)
+    keys = {k for row in rows if row for k in row}
+    start_node = exp_cfg['start_node']
+    agents = {start_node: exp_cfg['agent_override']} if exp_cfg.get('agent_override') else None
+    runner = RunnerLoader.load_partial(exp_cfg['runner_id'], start_node, agents, sorted(keys))
+    return rows, runner
@@ -1,7 +1,10 @@
 #service/meta/loader.py
 from pathlib import Path
 from typing import List, Dict, Any
+import copy
 import json
+import os
+import threading
 from logging import getLogger
 from datetime import datetime
 logger = getLogger(__name__)
@@ -13,29 +16,105 @@ def _get_path(name):
     return path
 
 
+class _MetaIndex:
+    """
+    meta/<name> 的内存索引：每个文件只解析一次，之后按 (mtime_ns, size) 判断是否需要重新解析；
+    文件列表按目录 mtime 判断是否需要重新扫描。对外一律返回深拷贝，调用方修改不会污染缓存。
+    """
+
+    def __init__(self, name: str):
+        self.path = _get_path(name)
+        self.entries: Dict[str, tuple[int, int, Dict[str, Any]]] = {}
+        self.ids: List[str] = []
+        self.dir_mtime: int | None = None
+        self.lock = threading.Lock()
+        self.write_lock = threading.Lock()   # 串行化 update 的读-改-写
+
+    def _file(self, id: str) -> Path:
+        return self.path / f"{id}.json"
+
+    def _parse(self, id: str, st: os.stat_result) -> Dict[str, Any]:
+        entry = self.entries.get(id)
+        if entry and entry[:2] == (st.st_mtime_ns, st.st_size):
+            return entry[2]
+        cfg = json.loads(self._file(id).read_text(encoding="utf-8"))
+        # 确保配置中有id字段
+        cfg["id"] = id
+        self.entries[id] = (st.st_mtime_ns, st.st_size, cfg)
+        return cfg
+
+    def get(self, id: str) -> Dict[str, Any] | None:
+        """文件不存在时抛出 FileNotFoundError"""
+        with self.lock:
+            try:
+                st = self._file(id).stat()
+            except FileNotFoundError:
+                self.entries.pop(id, None)
+                raise
+            return copy.deepcopy(self._parse(id, st))
+
+    def list_ids(self) -> List[str]:
+        with self.lock:
+            mtime = self.path.stat().st_mtime_ns
+            if mtime != self.dir_mtime:
+                self.ids = [e.name[:-5] for e in os.scandir(self.path)
+                            if e.name.endswith(".json") and e.is_file()]
+                self.dir_mtime = mtime
+                alive = set(self.ids)
+                for id in [k for k in self.entries if k not in alive]:
+                    del self.entries[id]
+            return list(self.ids)
+
+    def all(self) -> List[Dict[str, Any]]:
+        cfgs = []
+        for id in self.list_ids():
+            try:
+                cfgs.append(self.get(id))
+            except FileNotFoundError:
+                continue
+        return cfgs
+
+    def put(self, id: str, cfg: Dict[str, Any]) -> None:
+        """写入文件后同步更新索引（write-through）"""
+        with self.lock:
+            st = self._file(id).stat()
+            cfg = copy.deepcopy(cfg)
+            cfg["id"] = id
+            self.entries[id] = (st.st_mtime_ns, st.st_size, cfg)
+            if id not in self.ids:
+                self.ids.append(id)
+
+    def remove(self, id: str) -> None:
+        with self.lock:
+            self.entries.pop(id, None)
+            if id in self.ids:
+                self.ids.remove(id)
+
+
+_indexes: Dict[str, _MetaIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def _index(name: str) -> _MetaIndex:
+    with _indexes_lock:
+        index = _indexes.get(name)
+        if index is None:
+            index = _indexes[name] = _MetaIndex(name)
+        return index
+
+
 class MetaLoader:
     @staticmethod
     def load(name:str, id:str) -> Dict[str, Any] | None:
         try:
-            path=_get_path(name)
-            cfg_path = path  / f"{id}.json"
-            cfg = json.loads(cfg_path.read_text(encoding="utf-8"))
-            # 确保配置中有id字段
-            cfg["id"] = id
-            return cfg
+            return _index(name).get(id)
         except FileNotFoundError as e:
             return None
 
     @staticmethod
     def loads(name) -> List[Dict[str, Any]] | None:
         try:
-            path=_get_path(name)
-            cfgs = []
-            for file in path.glob("*.json"):
-                cfg = json.loads(file.read_text(encoding="utf-8"))
-                cfg['id'] = file.stem
-                cfgs.append(cfg)
-            return cfgs
+            return _index(name).all()
         except FileNotFoundError as e:
             logger.error(e)
             return None
@@ -50,6 +129,7 @@ class MetaLoader:
             if 'created_at' not in data:
                 data['created_at'] = datetime.now().isoformat()
             cfg_path.write_text(json.dumps(data, indent=2, ensure_ascii=False), encoding="utf-8")
+            _index(name).put(id, data)
             return True
         except FileNotFoundError as e:
             logger.error(e)
@@ -57,8 +137,7 @@ class MetaLoader:
 
     @staticmethod
     def count(name) -> int:
-        path = _get_path(name)
-        return len(list(path.glob("*.json")))
+        return len(_index(name).list_ids())
 
     @staticmethod
     def delete(name:str,id:str) -> bool:
@@ -66,6 +145,7 @@ class MetaLoader:
             path = _get_path(name)
             file = path / f"{id}.json"
             file.unlink()
+            _index(name).remove(id)
             return True
         except FileNotFoundError as e:
             logger.error(e)
@@ -73,20 +153,29 @@ class MetaLoader:
 
     @staticmethod
     def exists(name:str, id:str) -> bool:
-        path = _get_path(name)
-        file = path / f"{id}.json"
-        return file.exists()
+        return id in _index(name).list_ids()
+
+    @staticmethod
+    def stat(name:str, id:str) -> tuple[int, int] | None:
+        """返回 (mtime_ns, size)，文件不存在时返回 None；用于判断配置是否变更"""
+        try:
+            st = (_get_path(name) / f"{id}.json").stat()
+            return st.st_mtime_ns, st.st_size
+        except FileNotFoundError:
+            return None
 
     @staticmethod
     def update(name:str,id:str, data: Dict[str, Any]) -> bool:
         try:
             path = _get_path(name)
             cfg_path = path / f"{id}.json"
-            cfg = json.loads(cfg_path.read_text(encoding="utf-8"))
-            cfg['id'] = id
-            cfg.update(data)
-            cfg['updated_at'] = datetime.now().isoformat()
-            cfg_path.write_text(json.dumps(cfg, indent=2, ensure_ascii=False), encoding="utf-8")
+            index = _index(name)
+            with index.write_lock:
+                cfg = index.get(id)
+                cfg.update(data)
+                cfg['updated_at'] = datetime.now().isoformat()
+                cfg_path.write_text(json.dumps(cfg, indent=2, ensure_ascii=False), encoding="utf-8")
+                index.put(id, cfg)
             return True
         except FileNotFoundError as e:
             logger.error(e)
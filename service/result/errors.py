@@ -0,0 +1,275 @@
+#service/result/errors.py
+import json
+import threading
+from logging import getLogger
+from pathlib import Path
+from typing import Dict, Any, List
+import numpy as np
+from data.corpus import Corpus
+from service.entity.test import TestLoader, TEST_DIR
+from service.result.loader import ResultLoader, _get_path, SEGMENT_FILE, LEGACY_FILE
+
+logger = getLogger(__name__)
+
+ERRORS_FILE = "errors.json"
+GROUPS = ('surface', 'label', 'mesh', 'doc')
+KINDS = ('fp', 'fn')
+_VERSION = 2
+
+# 进程内缓存：{exp_id: (stamp, ErrorIndex)}
+_indexes: Dict[str, tuple[tuple, "ErrorIndex"]] = {}
+_lock = threading.Lock()
+
+
+class ErrorIndex:
+    """
+    一个实验全部 FP / FN 的列式索引：每条错误一行，字符串列映射为整数 ID。
+    row 为实验行号，doc 为文档（PMID，没有时为行号），kind 0 = FP、1 = FN。
+    """
+
+    def __init__(self, vocab: Dict[str, List[str]], columns: Dict[str, List[int]]):
+        self.vocab = vocab
+        self.columns = {k: np.asarray(v, dtype=np.int64) for k, v in columns.items()}
+
+    def __len__(self) -> int:
+        return len(self.columns['doc'])
+
+    def _ids(self, name: str, match) -> List[int]:
+        return [i for i, v in enumerate(self.vocab[name]) if match(v)]
+
+    def query(self, by: str = 'surface', kind: str | None = None, label: str | None = None,
+              q: str | None = None, page: int = 1, per_page: int = 20) -> Dict[str, Any]:
+        """按 surface / label / mesh / doc 聚合 FP、FN 数，按错误总数降序分页；q 为 key 的子串过滤"""
+        if by not in GROUPS:
+            raise ValueError(f"by must be one of {', '.join(GROUPS)}")
+        if kind and kind not in KINDS:
+            raise ValueError(f"kind must be one of {', '.join(KINDS)}")
+        cols = self.columns
+        mask = np.ones(len(self), dtype=bool)
+        if kind:
+            mask &= cols['kind'] == KINDS.index(kind)
+        if label:
+            mask &= np.isin(cols['label'], self._ids('label', lambda v: v == label))
+        if q:
+            q = q.lower()
+            mask &= np.isin(cols[by], self._ids(by, lambda v: q in v.lower()))
+        keys, kinds, docs = cols[by][mask], cols['kind'][mask], cols['doc'][mask]
+
+        size = len(self.vocab[by])
+        fp = np.bincount(keys[kinds == 0], minlength=size)
+        fn = np.bincount(keys[kinds == 1], minlength=size)
+        # 每个 key 出现在多少篇文档：(key, doc) 去重后计数
+        span = max(len(self.vocab['doc']), 1)
+        n_docs = np.bincount(np.unique(keys * span + docs) // span, minlength=size)
+        total = fp + fn
+        present = np.flatnonzero(total)
+        order = present[np.lexsort((present, -total[present]))]
+        page, per_page = max(1, page), max(1, per_page)
+        start = (page - 1) * per_page
+        names = self.vocab[by]
+        items = [{'key': names[i], 'fp': int(fp[i]), 'fn': int(fn[i]), 'total': int(total[i]), 'docs': int(n_docs[i])}
+                 for i in order[start:start + per_page]]
+        return {'by': by, 'items': items, 'total': int(len(order)), 'errors': int(total.sum()),
+                'page': page, 'per_page': per_page}
+
+    def records(self, by: str, key: str, limit: int = 100) -> List[Dict[str, Any]]:
+        """某个 key 的错误明细（行号、文档、类型、表面形式、标签、MeSH）"""
+        if by not in GROUPS:
+            raise ValueError(f"by must be one of {', '.join(GROUPS)}")
+        cols, vocab = self.columns, self.vocab
+        rows = np.flatnonzero(np.isin(cols[by], self._ids(by, lambda v: v == key)))[:limit]
+        return [{'row': int(cols['row'][i]), 'doc': vocab['doc'][cols['doc'][i]], 'kind': KINDS[cols['kind'][i]],
+                 'surface': vocab['surface'][cols['surface'][i]], 'label': vocab['label'][cols['label'][i]],
+                 'mesh': vocab['mesh'][cols['mesh'][i]]} for i in rows]
+
+
+class _Builder:
+    def __init__(self):
+        self.vocab: Dict[str, Dict[str, int]] = {k: {} for k in ('surface', 'label', 'mesh', 'doc')}
+        self.columns: Dict[str, List[int]] = {k: [] for k in ('row', 'doc', 'kind', 'surface', 'label', 'mesh')}
+
+    def _id(self, name: str, value: str) -> int:
+        ids = self.vocab[name]
+        return ids.setdefault(value, len(ids))
+
+    def add(self, row: int, doc: str, kind: int, surface: str, label: str, mesh: str) -> None:
+        c = self.columns
+        c['row'].append(row)
+        c['doc'].append(self._id('doc', doc))
+        c['kind'].append(kind)
+        c['surface'].append(self._id('surface', surface))
+        c['label'].append(self._id('label', label))
+        c['mesh'].append(self._id('mesh', mesh))
+
+    def dump(self) -> Dict[str, Any]:
+        return {'vocab': {k: list(v) for k, v in self.vocab.items()}, 'columns': self.columns}
+
+
+def _parse(value: Any) -> Any:
+    if isinstance(value, str):
+        from ast import literal_eval
+        try:
+            return literal_eval(value)
+        except (ValueError, SyntaxError):
+            return None
+    return value
+
+
+def _mesh_map(article: Dict[str, Any]) -> Dict[str, str]:
+    """小写表面形式 → MeSH（多个 ID 用 | 连接）"""
+    link = {}
+    for text, mesh in (article.get('entity_link') or {}).items():
+        link.setdefault(text.lower(), '|'.join(mesh) if isinstance(mesh, list) else mesh)
+    return link
+
+
+def _mesh_names(article: Dict[str, Any]) -> Dict[str, str]:
+    """MeSH → 第一次出现的表面形式"""
+    names = {}
+    for ent in article.get('entities') or []:
+        names.setdefault(ent.get('mesh'), ent.get('text'))
+    return names
+
+
+def _ner_errors(builder: _Builder, row: int, doc: str, gold: Dict[str, List[str]], pred: Dict[str, List[str]],
+                link: Dict[str, str], corpus_link: Dict[str, str]) -> None:
+    """与 MetricsCalculation 相同的归一化：(实体小写, 标签)"""
+    g = {(e.lower(), lbl) for lbl, ents in gold.items() for e in ents}
+    p = {(e.lower(), lbl) for lbl, ents in pred.items() for e in ents}
+    for kind, items in ((0, p - g), (1, g - p)):
+        for surface, label in sorted(items):
+            builder.add(row, doc, kind, surface, label, link.get(surface) or corpus_link.get(surface, ''))
+
+
+def _re_errors(builder: _Builder, row: int, doc: str, gold: List[Any], pred: List[Any],
+               names: Dict[str, str]) -> None:
+    def norm(pairs):
+        return {(h.upper(), t.upper()) for h, t in (tuple(x) for x in pairs if len(x) == 2)}
+    g, p = norm(gold), norm(pred)
+    for kind, items in ((0, p - g), (1, g - p)):
+        for head, tail in sorted(items):
+            surface = f"{names.get(head, head)} -> {names.get(tail, tail)}".lower()
+            builder.add(row, doc, kind, surface, 'CID', f"{head}-{tail}")
+
+
+def _stamp(exp_cfg: Dict[str, Any]) -> tuple:
+    """结果文件与数据集文件的 (mtime_ns, size)，任一变化则重建索引"""
+    stamp = []
+    path = _get_path(exp_cfg['exp_id'])
+    for file in (path / SEGMENT_FILE, path / LEGACY_FILE,
+                 TEST_DIR / exp_cfg.get('runner_id', '') / exp_cfg.get('dataset', '')):
+        try:
+            st = file.stat()
+            stamp.append((st.st_mtime_ns, st.st_size))
+        except (FileNotFoundError, NotADirectoryError):
+            stamp.append(None)
+    return tuple(stamp)
+
+
+class _GoldLookup:
+    """
+    结果行 → 数据集中的文档：行中保存了 pmid 时按 pmid 找（同一 PMID 多次出现时优先同一位置），
+    没有 pmid 时按行号。PMID → 位置 的映射只在行号对不上时才建立。
+    """
+
+    def __init__(self, articles):
+        self.articles = articles
+        self._positions: Dict[str, int] | None = None
+
+    def _position(self, pmid: str) -> int | None:
+        if self._positions is None:
+            pmids = getattr(self.articles, 'pmids', None)  # 列式语料直接取 PMID 列
+            if pmids is None:
+                pmids = [article.get('pmid') for article in self.articles]
+            self._positions = {}
+            for i, value in enumerate(pmids):
+                self._positions.setdefault(str(value), i)
+        return self._positions.get(pmid)
+
+    def get(self, idx: int, values: Dict[str, Any]):
+        at_row = self.articles[idx - 1] if idx <= len(self.articles) else {}
+        pmid = values.get('pmid')
+        if pmid in (None, ''):
+            return at_row
+        pmid = str(pmid)
+        if str(at_row.get('pmid')) == pmid:
+            return at_row
+        pos = self._position(pmid)
+        return self.articles[pos] if pos is not None else {}
+
+
+def _build(exp_cfg: Dict[str, Any]) -> Dict[str, Any]:
+    exp_id = exp_cfg['exp_id']
+    rows = ResultLoader.load_rows(exp_id, ResultLoader.indices(exp_id))
+    # FP 的表面形式不一定出现在本文档的标注中，退回到整个数据集的 表面形式 → MeSH
+    corpus_link: Dict[str, str] = {}
+    try:
+        if exp_cfg['dataset'].endswith('.txt'):
+            # PubTator：列式语料，各行的 gold 字段在访问时才计算
+            articles = Corpus.from_file(TEST_DIR / exp_cfg['runner_id'] / exp_cfg['dataset'])
+            corpus_link = articles.surface_mesh()
+        else:
+            _, articles = TestLoader.load_by_id_file(exp_cfg['runner_id'], exp_cfg['dataset'])
+            for article in articles:
+                for text, mesh in _mesh_map(article).items():
+                    corpus_link.setdefault(text, mesh)
+    except (OSError, ValueError) as e:
+        logger.warning("Load gold data of %s failed, using stored expected: %s", exp_id, e)
+        articles = []
+    gold_lookup = _GoldLookup(articles)
+    builder = _Builder()
+    for idx in sorted(rows):
+        values = rows[idx]
+        if not isinstance(values, dict) or 'predicted' not in values:
+            continue
+        pred = _parse(values['predicted'])
+        article = gold_lookup.get(idx, values)
+        doc = str(article.get('pmid') or idx)
+        # gold 优先取数据集（PubTator 语料的文档视图），CSV 等没有标注的数据集退回到行中保存的 expected
+        if isinstance(pred, dict):
+            gold = article.get('expected_entities')
+            if not isinstance(gold, dict):
+                gold = _parse(values.get('expected'))
+            if isinstance(gold, dict):
+                _ner_errors(builder, idx, doc, gold, pred, _mesh_map(article), corpus_link)
+        elif isinstance(pred, list):
+            gold = article.get('expected_relations')
+            if not isinstance(gold, list):
+                gold = _parse(values.get('expected'))
+            if isinstance(gold, list):
+                _re_errors(builder, idx, doc, gold, pred, _mesh_names(article))
+    return builder.dump()
+
+
+def error_index(exp_cfg: Dict[str, Any]) -> ErrorIndex:
+    """
+    读取或构建实验的错误索引：内存缓存 → result/<exp_id>/errors.json → 重新构建。
+    结果文件或数据集变化后自动重建；errors.json 写不进去时只保留在内存中。
+    """
+    exp_id = exp_cfg['exp_id']
+    stamp = _stamp(exp_cfg)
+    with _lock:
+        hit = _indexes.get(exp_id)
+    if hit and hit[0] == stamp:
+        return hit[1]
+    file: Path = _get_path(exp_id) / ERRORS_FILE
+    data = None
+    if file.exists():
+        try:
+            cached = json.loads(file.read_text(encoding="utf-8"))
+            if cached.get('version') == _VERSION and tuple(
+                    tuple(s) if s else None for s in cached.get('stamp', [])) == stamp:
+                data = cached
+        except ValueError as e:
+            logger.warning("Error index %s is corrupt, rebuilding: %s", file, e)
+    if data is None:
+        data = _build(exp_cfg)
+        data.update({'version': _VERSION, 'stamp': stamp})
+        try:
+            file.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+        except OSError as e:
+            logger.warning("Write error index %s failed: %s", file, e)
+    index = ErrorIndex(data['vocab'], data['columns'])
+    with _lock:
+        _indexes[exp_id] = (stamp, index)
+    return index
@@ -1,10 +1,21 @@
 #service/result/loader.py
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, List, Iterable
 import json
+import struct
+import threading
 from logging import getLogger
 logger = getLogger(__name__)
 
+# 结果按行追加到 states.jsonl，states.idx 记录每行的 (行号, 偏移, 长度)，同一行以最后一条为准
+SEGMENT_FILE = "states.jsonl"
+INDEX_FILE = "states.idx"
+LEGACY_FILE = "states.json"
+_RECORD = struct.Struct("<IQI")
+
+_locks: Dict[str, threading.Lock] = {}
+_locks_guard = threading.Lock()
+
 
 def _get_path(name):
     path = Path(__file__).resolve().parent.parent.parent / "result" / name
@@ -12,16 +23,101 @@ def _get_path(name):
     return path
 
 
+def _lock(id: str) -> threading.Lock:
+    with _locks_guard:
+        return _locks.setdefault(id, threading.Lock())
+
+
 class ResultLoader:
+    @staticmethod
+    def append(id: str, idx: int, values: Any) -> None:
+        """追加一行结果（行号从 1 开始），写完数据后再写索引，索引里有的行一定完整"""
+        path = _get_path(id)
+        with _lock(id):
+            if not (path / INDEX_FILE).exists():
+                # 旧实验只有 states.json：先整体迁移进分段文件
+                legacy = ResultLoader._load_legacy(id) or {}
+                for k in sorted((k for k in legacy if k.isdigit()), key=int):
+                    ResultLoader._write(path, int(k), legacy[k])
+            ResultLoader._write(path, idx, values)
+
+    @staticmethod
+    def clear(id: str) -> None:
+        """删除已保存的全部结果（分段文件、索引与旧的 states.json），重新运行全部行前调用"""
+        path = _get_path(id)
+        with _lock(id):
+            for name in (INDEX_FILE, SEGMENT_FILE, LEGACY_FILE):
+                (path / name).unlink(missing_ok=True)
+
+    @staticmethod
+    def _write(path: Path, idx: int, values: Any) -> None:
+        line = (json.dumps({"idx": idx, "values": values}, ensure_ascii=False, default=str) + "\n").encode("utf-8")
+        with (path / SEGMENT_FILE).open("ab") as f:
+            offset = f.seek(0, 2)
+            f.write(line)
+        with (path / INDEX_FILE).open("ab") as f:
+            f.write(_RECORD.pack(idx, offset, len(line)))
+
+    @staticmethod
+    def index(id: str) -> Dict[int, tuple[int, int]]:
+        """{行号: (偏移, 长度)}，只读取很小的索引文件"""
+        index_file = _get_path(id) / INDEX_FILE
+        if not index_file.exists():
+            return {}
+        data = index_file.read_bytes()
+        usable = len(data) - len(data) % _RECORD.size   # 忽略写了一半的尾部记录
+        return {idx: (offset, length) for idx, offset, length in _RECORD.iter_unpack(data[:usable])}
+
+    @staticmethod
+    def indices(id: str) -> List[int]:
+        """已有结果的行号（升序），兼容旧的 states.json"""
+        index = ResultLoader.index(id)
+        if index:
+            return sorted(index)
+        legacy = ResultLoader._load_legacy(id)
+        return sorted(int(k) for k in legacy if k.isdigit()) if legacy else []
+
+    @staticmethod
+    def load_rows(id: str, idxs: Iterable[int]) -> Dict[int, Any]:
+        """按行号随机读取结果，不解析整个文件"""
+        index = ResultLoader.index(id)
+        if not index:
+            legacy = ResultLoader._load_legacy(id) or {}
+            return {idx: legacy[str(idx)] for idx in idxs if str(idx) in legacy}
+        rows = {}
+        with (_get_path(id) / SEGMENT_FILE).open("rb") as f:
+            for idx in idxs:
+                if idx not in index:
+                    continue
+                offset, length = index[idx]
+                f.seek(offset)
+                rows[idx] = json.loads(f.read(length))["values"]
+        return rows
+
+    @staticmethod
+    def load_row(id: str, idx: int) -> Any | None:
+        return ResultLoader.load_rows(id, [idx]).get(idx)
+
     @staticmethod
     def load(id:str) -> Dict[str, Any] | None:
+        """读取全部结果 {"行号": state}；大实验请优先用 load_rows"""
+        index = ResultLoader.index(id)
+        if not index:
+            return ResultLoader._load_legacy(id)
+        cfg = {str(idx): values for idx, values in ResultLoader.load_rows(id, sorted(index)).items()}
+        # 确保配置中有id字段
+        cfg["id"] = id
+        return cfg
+
+    @staticmethod
+    def _load_legacy(id: str) -> Dict[str, Any] | None:
         try:
             path=_get_path(id)
-            cfg_path = path  / "states.json"
+            cfg_path = path  / LEGACY_FILE
             cfg = json.loads(cfg_path.read_text(encoding="utf-8"))
             # 确保配置中有id字段
             cfg["id"] = id
             return cfg
         except FileNotFoundError as e:
-            logger.error(e)
+            logger.debug(e)
             return None
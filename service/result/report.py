@@ -0,0 +1,124 @@
+#service/result/report.py
+from ast import literal_eval
+from logging import getLogger
+from typing import Dict, Any, List
+import numpy as np
+from plugin.plugin_loader import get_plugin
+from service.result.loader import ResultLoader
+from service.result.statistics import confidence_intervals
+
+logger = getLogger(__name__)
+
+WORST_DOCUMENTS = 10     # 最差文档表的行数
+MAX_LABELS = 20          # 标签表按 gold 数量只列出前 N 个
+REPORT_RESAMPLES = 1000  # 报告中置信区间的重采样次数（完整精度用 /exp/api/stats）
+_BUCKETS = np.linspace(0, 1, 6)
+
+
+def _table(header: List[str], rows: List[List[Any]]) -> str:
+    def cell(v):
+        return f"{v:.3f}" if isinstance(v, float) else str(v)
+    lines = ["| " + " | ".join(header) + " |", "|" + "---|" * len(header)]
+    lines += ["| " + " | ".join(cell(v) for v in row) + " |" for row in rows]
+    return "\n".join(lines)
+
+
+def _labelled(expected: Any) -> bool:
+    """NER 的 {标签: [实体, ...]} 格式；RE 的 (head, tail) MeSH 对列表没有标签维度"""
+    if isinstance(expected, str):
+        try:
+            expected = literal_eval(expected)
+        except (ValueError, SyntaxError):
+            return False
+    return isinstance(expected, dict)
+
+
+def _scores(rows: Dict[int, Any]) -> tuple[List[int], List[Dict[str, Any]], Dict[str, Dict[str, Any]]]:
+    """
+    返回 (行号, 每篇文档指标, 每个标签指标)。
+    各行有 expected / predicted 时用 calculate_batch 一次重新计算，
+    只有 expected 为 {标签: [实体, ...]} 时才返回标签维度（RE 的 MeSH 对会把 tail MeSH 当作标签）；
+    否则使用各行保存的 metrics。
+    """
+    if rows and all(isinstance(v, dict) and 'expected' in v and 'predicted' in v for v in rows.values()):
+        idxs = sorted(rows)
+        try:
+            batch = get_plugin('MetricsCalculation').calculate_batch([rows[i]['expected'] for i in idxs],
+                                                                      [rows[i]['predicted'] for i in idxs])
+            labels = batch['labels'] if all(_labelled(rows[i]['expected']) for i in idxs) else {}
+            return idxs, batch['documents'], labels
+        except (ValueError, SyntaxError, TypeError, AttributeError) as e:
+            logger.warning("Rescoring stored predictions failed, using stored metrics: %s", e)
+    idxs = sorted(i for i, v in rows.items()
+                  if isinstance(v, dict) and isinstance(v.get('metrics'), dict) and 'f1' in v['metrics'])
+    return idxs, [rows[i]['metrics'] for i in idxs], {}
+
+
+def reportable(exp_cfg: Dict[str, Any]) -> bool:
+    """已完成，或有行失败（failed）/ 运行中断（interrupted）但已保存了部分结果的实验"""
+    status = exp_cfg.get('status')
+    return status == 'completed' or (status in ('failed', 'interrupted')
+                                     and bool(ResultLoader.indices(exp_cfg['exp_id'])))
+
+
+def build_report(exp_id: str, exp_cfg: Dict[str, Any]) -> str:
+    """由已保存的结果直接生成 Markdown 报告（总体、标签、文档 F1 分布、最差文档），不调用 LLM"""
+    rows = ResultLoader.load_rows(exp_id, ResultLoader.indices(exp_id))
+    lines = [f"# {exp_cfg.get('name', exp_id)}", "",
+             f"- Runner: {exp_cfg.get('runner_display') or exp_cfg.get('runner_id')}",
+             f"- Dataset: {exp_cfg.get('dataset')}",
+             f"- Records: {len(rows)} of {exp_cfg.get('samples', len(rows))}"
+             + (f" ({len(exp_cfg['failed_rows'])} failed)" if exp_cfg.get('failed_rows') else "")]
+    if exp_cfg.get('source_exp'):
+        lines.append(f"- Re-evaluated from {exp_cfg['source_exp']} at node `{exp_cfg.get('start_node')}`")
+
+    idxs, docs, labels = _scores(rows)
+    if not docs:
+        lines += ["", "No per-record metrics were found in the results."]
+        return "\n".join(lines) + "\n"
+
+    metrics = {k: np.array([d.get(k, 0) for d in docs], dtype=np.float64)
+               for k in ('precision', 'recall', 'f1', 'tp', 'fp', 'fn')}
+    tp, fp, fn = (int(metrics[k].sum()) for k in ('tp', 'fp', 'fn'))
+    micro_p = tp / (tp + fp) if tp + fp else 0.
+    micro_r = tp / (tp + fn) if tp + fn else 0.
+    micro_f = 2 * tp / (2 * tp + fp + fn) if tp + fp + fn else 0.
+    overall = [["micro", micro_p, micro_r, micro_f, tp, fp, fn],
+               ["macro", float(metrics['precision'].mean()), float(metrics['recall'].mean()),
+                float(metrics['f1'].mean()), "", "", ""]]
+    lines += ["", "## Overall", "",
+              _table(["Average", "Precision", "Recall", "F1", "TP", "FP", "FN"], overall)]
+    try:
+        counts = np.stack([metrics['tp'], metrics['fp'], metrics['fn']], axis=1).astype(int).tolist()
+        ci = confidence_intervals(counts, resamples=REPORT_RESAMPLES)
+        lines += ["", f"{int(ci['confidence'] * 100)}% bootstrap confidence intervals "
+                      f"({ci['resamples']} resamples over {ci['documents']} records): "
+                      f"micro F1 [{ci['micro_f1']['low']:.3f}, {ci['micro_f1']['high']:.3f}], "
+                      f"macro F1 [{ci['macro_f1']['low']:.3f}, {ci['macro_f1']['high']:.3f}]"]
+    except ValueError as e:
+        logger.debug("No confidence intervals for %s: %s", exp_id, e)
+
+    if labels:
+        ranked = sorted(labels.items(), key=lambda kv: -(kv[1]['tp'] + kv[1]['fn']))
+        lines += ["", "## Per label", "",
+                  _table(["Label", "Precision", "Recall", "F1", "TP", "FP", "FN"],
+                         [[lbl, m['precision'], m['recall'], m['f1'], m['tp'], m['fp'], m['fn']]
+                          for lbl, m in ranked[:MAX_LABELS]])]
+        if len(ranked) > MAX_LABELS:
+            lines.append(f"\n{len(ranked) - MAX_LABELS} more labels not shown.")
+
+    f1 = metrics['f1']
+    hist, _ = np.histogram(f1, bins=_BUCKETS)
+    lines += ["", "## Per-record F1 distribution", "",
+              f"mean {f1.mean():.3f}, median {np.median(f1):.3f}, min {f1.min():.3f}, max {f1.max():.3f}, "
+              f"{int((f1 == 1).sum())} perfect, {int((f1 == 0).sum())} zero", "",
+              _table(["F1", "Records"],
+                     [[f"{lo:.1f} - {hi:.1f}", int(c)] for lo, hi, c in zip(_BUCKETS[:-1], _BUCKETS[1:], hist)])]
+
+    # 最差文档：F1 升序，同分时错误数多的在前
+    order = np.lexsort((-(metrics['fp'] + metrics['fn']), f1))[:WORST_DOCUMENTS]
+    lines += ["", f"## Worst {len(order)} records", "",
+              _table(["Record", "Precision", "Recall", "F1", "TP", "FP", "FN"],
+                     [[idxs[i], float(metrics['precision'][i]), float(metrics['recall'][i]), float(f1[i]),
+                       int(metrics['tp'][i]), int(metrics['fp'][i]), int(metrics['fn'][i])] for i in order])]
+    return "\n".join(lines) + "\n"
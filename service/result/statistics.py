@@ -0,0 +1,195 @@
+#service/result/statistics.py
+import hashlib
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from logging import getLogger
+from typing import Dict, Any, List
+import numpy as np
+from service.meta.loader import MetaLoader
+from service.entity.test import TEST_DIR
+from service.result.loader import ResultLoader
+
+logger = getLogger(__name__)
+
+DEFAULT_RESAMPLES = 10000
+MAX_RESAMPLES = 100_000        # 接口允许的最大重采样次数（计算量随 重采样数 × 文档数 增长）
+DEFAULT_CONFIDENCE = 0.95
+DEFAULT_SEED = 0               # 固定种子，同一实验多次请求结果一致
+METHODS = ('bootstrap', 'permutation')
+_CHUNK_CELLS = 4_000_000       # 每个分片的 重采样数 × 文档数 上限（控制内存）
+_PARALLEL_MIN = 20_000_000     # 总量超过该值才使用多进程，小实验进程启动开销更大
+
+
+def document_counts(exp_id: str) -> Dict[int, tuple[int, int, int]]:
+    """{行号: (tp, fp, fn)}，取自各行保存的 metrics；没有计数的行跳过"""
+    rows = ResultLoader.load_rows(exp_id, ResultLoader.indices(exp_id))
+    counts = {}
+    for idx, values in rows.items():
+        metrics = values.get('metrics') if isinstance(values, dict) else None
+        if isinstance(metrics, dict) and all(k in metrics for k in ('tp', 'fp', 'fn')):
+            counts[idx] = (int(metrics['tp']), int(metrics['fp']), int(metrics['fn']))
+    return counts
+
+
+@lru_cache(maxsize=64)
+def _file_digest(path: str, mtime_ns: int, size: int) -> str:
+    """文件内容的 sha256；(mtime_ns, size) 只作为缓存键，文件变化后重新计算"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _dataset_key(cfg: Dict[str, Any]) -> tuple:
+    """
+    实验所用数据集的标识：数据集按 runner 存放（tests/<runner_id>/<dataset>），同名文件内容可能不同，
+    因此比较文件内容的哈希；文件已不存在时退回到 (runner_id, dataset)
+    """
+    path = TEST_DIR / cfg.get('runner_id', '') / cfg.get('dataset', '')
+    try:
+        st = path.stat()
+        return ('sha256', _file_digest(str(path), st.st_mtime_ns, st.st_size))
+    except (FileNotFoundError, NotADirectoryError, IsADirectoryError):
+        return ('file', cfg.get('runner_id'), cfg.get('dataset'))
+
+
+def _matrix(counts: List[tuple[int, int, int]]) -> np.ndarray:
+    """(n, 4)：tp, fp, fn, 文档 F1"""
+    m = np.zeros((len(counts), 4), dtype=np.float64)
+    if counts:
+        m[:, :3] = counts
+    tp, fp, fn = m[:, 0], m[:, 1], m[:, 2]
+    np.divide(2 * tp, 2 * tp + fp + fn, out=m[:, 3], where=(2 * tp + fp + fn) > 0)
+    return m
+
+
+def _scores(sums: np.ndarray, n: int) -> np.ndarray:
+    """sums[..., 4] 为 tp/fp/fn/F1 的加权和 → [..., (micro F1, macro F1)]"""
+    tp, fp, fn, f1 = sums[..., 0], sums[..., 1], sums[..., 2], sums[..., 3]
+    denom = 2 * tp + fp + fn
+    micro = np.divide(2 * tp, denom, out=np.zeros_like(tp), where=denom > 0)
+    return np.stack([micro, f1 / max(n, 1)], axis=-1)
+
+
+def _resample_chunk(method: str, a: np.ndarray, b: np.ndarray | None, size: int, seed: Any) -> np.ndarray:
+    """
+    一个分片的重采样统计量，shape (size, 2)：
+    - bootstrap: 有放回抽取文档（多项分布计数矩阵 W），统计量为 score(a) 或 score(a) - score(b)
+    - permutation: 每篇文档以 1/2 概率交换 a / b，统计量为 score(a') - score(b')
+    """
+    rng = np.random.default_rng(seed)
+    n = len(a)
+    if method == 'bootstrap':
+        weights = rng.multinomial(n, np.full(n, 1 / n), size=size).astype(np.float64)
+        stats = _scores(weights @ a, n)
+        if b is not None:
+            stats -= _scores(weights @ b, n)
+        return stats
+    swap = (rng.random((size, n)) < 0.5).astype(np.float64)
+    shift = swap @ (b - a)
+    return _scores(a.sum(axis=0) + shift, n) - _scores(b.sum(axis=0) - shift, n)
+
+
+def _resample(method: str, a: np.ndarray, b: np.ndarray | None, resamples: int, seed: int) -> np.ndarray:
+    """按分片生成 resamples 个统计量；工作量大时分到多个进程"""
+    n = max(len(a), 1)
+    size = max(1, min(resamples, _CHUNK_CELLS // n))
+    sizes = [min(size, resamples - start) for start in range(0, resamples, size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    if resamples * n < _PARALLEL_MIN or len(sizes) == 1:
+        return np.concatenate([_resample_chunk(method, a, b, s, sd) for s, sd in zip(sizes, seeds)])
+    workers = min(len(sizes), os.cpu_count() or 1)
+    # spawn：与 process 执行模式一致，避免 fork 复制后台线程；以 python -m ui 启动时工作进程不导入 ui.app
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        parts = pool.map(_resample_chunk, [method] * len(sizes), [a] * len(sizes), [b] * len(sizes), sizes, seeds)
+        return np.concatenate(list(parts))
+
+
+def _interval(point: float, samples: np.ndarray, confidence: float) -> Dict[str, float]:
+    low, high = np.quantile(samples, [(1 - confidence) / 2, (1 + confidence) / 2])
+    return {'value': float(point), 'low': float(low), 'high': float(high)}
+
+
+def _check(resamples: int, confidence: float) -> None:
+    if not 1 <= resamples <= MAX_RESAMPLES:
+        raise ValueError(f"resamples must be between 1 and {MAX_RESAMPLES}")
+    if not 0 < confidence < 1:
+        raise ValueError("confidence must be between 0 and 1")
+
+
+def confidence_intervals(counts: List[tuple[int, int, int]], resamples: int = DEFAULT_RESAMPLES,
+                         confidence: float = DEFAULT_CONFIDENCE, seed: int = DEFAULT_SEED) -> Dict[str, Any]:
+    """按文档 (tp, fp, fn) 计算 micro / macro F1 的 bootstrap 百分位置信区间"""
+    _check(resamples, confidence)
+    if not counts:
+        raise ValueError("No per-document counts")
+    a = _matrix(counts)
+    point = _scores(a.sum(axis=0), len(a))
+    samples = _resample('bootstrap', a, None, resamples, seed)
+    return {
+        'documents': len(a),
+        'resamples': resamples,
+        'confidence': confidence,
+        'micro_f1': _interval(point[0], samples[:, 0], confidence),
+        'macro_f1': _interval(point[1], samples[:, 1], confidence),
+    }
+
+
+def bootstrap_ci(exp_id: str, resamples: int = DEFAULT_RESAMPLES, confidence: float = DEFAULT_CONFIDENCE,
+                 seed: int = DEFAULT_SEED) -> Dict[str, Any]:
+    """实验的 micro / macro F1 置信区间"""
+    _check(resamples, confidence)
+    counts = document_counts(exp_id)
+    if not counts:
+        raise ValueError(f"Experiment {exp_id} has no per-document metrics")
+    return {'exp_id': exp_id, **confidence_intervals(list(counts.values()), resamples, confidence, seed)}
+
+
+def paired_test(exp_a: str, exp_b: str, method: str = 'bootstrap', resamples: int = DEFAULT_RESAMPLES,
+                confidence: float = DEFAULT_CONFIDENCE, seed: int = DEFAULT_SEED) -> Dict[str, Any]:
+    """
+    同一数据集（内容相同、行数一致）上两个实验的配对检验（按行号对齐，只用两边都有计数的行）。
+    delta = A - B；bootstrap 给出 delta 的置信区间和双侧 p 值，permutation 为随机交换检验的双侧 p 值。
+    """
+    _check(resamples, confidence)
+    if method not in METHODS:
+        raise ValueError(f"method must be one of {', '.join(METHODS)}")
+    cfg_a, cfg_b = MetaLoader.load("exps", exp_a), MetaLoader.load("exps", exp_b)
+    for exp_id, cfg in ((exp_a, cfg_a), (exp_b, cfg_b)):
+        if not cfg:
+            raise ValueError(f"Experiment {exp_id} not found")
+    if _dataset_key(cfg_a) != _dataset_key(cfg_b):
+        raise ValueError("Experiments must use the same dataset")
+    # 行号对齐的前提：两边数据集行数一致（samples 为保存实验时数据集的行数）
+    samples_a, samples_b = cfg_a.get('samples'), cfg_b.get('samples')
+    if samples_a and samples_b and int(samples_a) != int(samples_b):
+        raise ValueError(f"Experiments have different row counts ({samples_a} vs {samples_b})")
+    counts_a, counts_b = document_counts(exp_a), document_counts(exp_b)
+    common = sorted(set(counts_a) & set(counts_b))
+    if not common:
+        raise ValueError("The experiments have no documents with metrics in common")
+    a = _matrix([counts_a[idx] for idx in common])
+    b = _matrix([counts_b[idx] for idx in common])
+    n = len(common)
+    score_a, score_b = _scores(a.sum(axis=0), n), _scores(b.sum(axis=0), n)
+    delta = score_a - score_b
+    samples = _resample(method, a, b, resamples, seed)
+
+    result: Dict[str, Any] = {'exp_a': exp_a, 'exp_b': exp_b, 'dataset': cfg_a.get('dataset'),
+                              'documents': n, 'method': method, 'resamples': resamples, 'confidence': confidence}
+    for col, name in enumerate(('micro_f1', 'macro_f1')):
+        d, s = float(delta[col]), samples[:, col]
+        if method == 'bootstrap':
+            # 双侧：bootstrap 分布落在 0 另一侧的比例 × 2
+            p = min(1.0, 2 * min(float(np.mean(s <= 0)), float(np.mean(s >= 0))))
+            entry = {'delta': _interval(d, s, confidence)}
+        else:
+            p = float((np.count_nonzero(np.abs(s) >= abs(d) - 1e-12) + 1) / (resamples + 1))
+            entry = {'delta': {'value': d}}
+        entry.update({'a': float(score_a[col]), 'b': float(score_b[col]), 'p_value': p})
+        result[name] = entry
+    return result
+
@@ -0,0 +1,93 @@
+#service/result/store.py
+import sqlite3
+import threading
+import time
+from logging import getLogger
+from pathlib import Path
+
+logger = getLogger(__name__)
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024  # 单个缓存库总大小上限，超出后按最近访问时间淘汰
+_EVICT_EVERY = 100                     # 每写入多少条检查一次淘汰
+
+
+def cache_path(file: str) -> Path:
+    path = Path(__file__).resolve().parent.parent.parent / "result" / ".cache"
+    path.mkdir(parents=True, exist_ok=True)
+    return path / file
+
+
+class SQLiteStore:
+    """
+    result/.cache 下的键值缓存库（WAL，多进程可同时读写）。
+    进程内共享一个连接；支持按创建时间过期、按最近访问时间淘汰。
+    """
+
+    def __init__(self, file: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.file = file
+        self.max_bytes = max_bytes
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+        self._writes = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(cache_path(self.file), check_same_thread=False, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""CREATE TABLE IF NOT EXISTS entries (
+                                key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL,
+                                created REAL NOT NULL, accessed REAL NOT NULL)""")
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries(accessed)")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def get(self, key: str, ttl: int = 0) -> str | None:
+        """ttl 为 0 表示不过期"""
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute("SELECT value, created FROM entries WHERE key=?", (key,)).fetchone()
+            if not row:
+                return None
+            if ttl and now - row[1] > ttl:
+                conn.execute("DELETE FROM entries WHERE key=?", (key,))
+                conn.commit()
+                return None
+            conn.execute("UPDATE entries SET accessed=? WHERE key=?", (now, key))
+            conn.commit()
+            return row[0]
+
+    def put(self, key: str, value: str) -> None:
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)",
+                         (key, value, len(value), now, now))
+            conn.commit()
+            self._writes += 1
+            if self._writes % _EVICT_EVERY == 0:
+                self._evict(conn)
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        """按最近访问时间淘汰，直到总大小降到上限的 90%"""
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        target = total - int(self.max_bytes * 0.9)
+        removed = 0
+        keys = []
+        for key, size in conn.execute("SELECT key, size FROM entries ORDER BY accessed"):
+            keys.append((key,))
+            removed += size
+            if removed >= target:
+                break
+        conn.executemany("DELETE FROM entries WHERE key=?", keys)
+        conn.commit()
+        logger.info("Cache %s evicted %d entries (%d bytes)", self.file, len(keys), removed)
+
+    def clear(self) -> None:
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM entries")
+            conn.commit()
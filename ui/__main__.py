@@ -0,0 +1,8 @@
+#ui/__main__.py
+# 启动入口：python -m ui（run.sh）。
+# spawn / forkserver 进程池的工作进程会重新导入启动模块，但跳过名为 *.__main__ 的模块：
+# 从这里启动时，统计、语料解析等工作进程不会导入 ui.app（全部蓝图、LangChain 和插件模型）。
+
+if __name__ == '__main__':
+    from ui.app import main
+    main()
@@ -8,7 +8,8 @@ from ui.tool_api import tool_bp
 from ui.llm_api import llm_bp
 from ui.experiment_api import exp_bp
 from ui.components.runner_selector import common_bp
-from plugin.plugin_loader import get_plugin, _aclose_plugins
+from plugin.plugin_loader import get_plugin, load_plugins, _aclose_plugins
+from service.entity.llm import LLMRegistry
 import sys
 import asyncio
 import atexit
@@ -18,6 +19,7 @@ if sys.platform == 'win32':
 
 def create_app():
     app = Flask(__name__)
+    load_plugins()  # 启动时加载模型，第一个请求不必等待
 
     def close_sync_plugins(exc=None):
         """关闭所有同步资源"""
@@ -28,6 +30,11 @@ def create_app():
 
         except Exception as e:
             print(__name__).warning("sync close failed: %s", e)
+        LLMRegistry.close()
+
+        async def aclose_all():
+            await LLMRegistry.aclose()
+            await _aclose_plugins()
 
         try:
             loop = asyncio.get_running_loop()
@@ -35,10 +42,10 @@ def create_app():
             loop = None
 
         if loop:
-            loop.create_task(_aclose_plugins())
+            loop.create_task(aclose_all())
         else:
             # 循环已关闭（少见），新建一个跑最后一次
-            asyncio.run(_aclose_plugins())
+            asyncio.run(aclose_all())
 
 
 
@@ -71,6 +78,13 @@ def create_app():
         return render_template("index.html", stats=stats)
 
     return app
-if __name__ == '__main__':
+
+
+def main():
+    """请用 python -m ui 启动（见 ui/__main__.py），进程池的工作进程不会重新导入本模块"""
     app=create_app()
     app.run(host='0.0.0.0', port=5001, debug=True)
+
+
+if __name__ == '__main__':
+    main()
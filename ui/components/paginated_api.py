@@ -2,16 +2,25 @@
 from flask import request
 
 
-def get_paginated_data(items, per_page=20, search_fields=None):
+def get_paginated_data(items, per_page=20, search_fields=None, search_index=None):
     """
     返回 (page_items, page, per_page, total, search)
     items: 原始完整 list
+    search_index: 可选，无参函数，返回 items 的倒排索引（TextIndex）；只在有搜索词时调用，
+                  搜索改为按词前缀查索引，只取当前页的行
     """
     page = max(1, int(request.args.get('page', 1)))
     per_page = max(1, min(100, per_page))
     search = request.args.get('search', '').strip()
 
 
+    start_idx = (page - 1) * per_page
+    end_idx = start_idx + per_page
+    index = search_index() if search and search_index else None
+    if index is not None:
+        hits = index.search(search)
+        return [items[i] for i in hits[start_idx:end_idx]], page, per_page, len(hits), search
+
     filtered = items
     if search and search_fields:
         search_lower = search.lower()
@@ -22,8 +31,6 @@ def get_paginated_data(items, per_page=20, search_fields=None):
 
 
     total = len(filtered)
-    start_idx = (page - 1) * per_page
-    end_idx = start_idx + per_page
     page_items = filtered[start_idx:end_idx]
 
     return page_items, page, per_page, total, search
\ No newline at end of file
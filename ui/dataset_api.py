@@ -1,6 +1,6 @@
 from flask import Blueprint, request, jsonify,render_template
 import html as html_lib
-from data.data_load import load_parser,load_datasets
+from data.data_load import load_index,load_search_index,load_profile,load_datasets
 
 
 ENTITY_CSS_MAP = {
@@ -22,22 +22,25 @@ def dataset_list_view():
     dataset = request.args.get('dataset', next(iter(datasets.keys()), ''))
     curr_file = request.args.get('file', (datasets.get(dataset, '')[0]))
 
-    parser = load_parser(dataset, curr_file)
-    articles=parser.get_articles()
+    # 只读取索引中的标题和计数，不解析文档
+    index = load_index(dataset, curr_file) if curr_file else None
+    articles = index.docs if index else []
 
-    # 2. 搜索
+    # 2. 搜索：倒排索引按词前缀匹配标题、摘要、PMID、实体和 MeSH（mesh:D0087 等限定字段）
     search = request.args.get('search', '').strip()
-    if search:
-        articles = [a for a in articles
-                    if search.lower() in a.pmid.lower()
-                    or search.lower() in a.title.lower()]
+    hits = None
+    if search and index:
+        hits = load_search_index(dataset, curr_file).search(search)
 
     # 3. 分页
-    total = len(articles)
+    total = len(articles) if hits is None else len(hits)
     max_page = (total + PER_PAGE - 1) // PER_PAGE
     page = max(1, min(int(request.args.get('page', 1)), max_page))
     offset = (page - 1) * PER_PAGE
-    page_arts = articles[offset: offset + PER_PAGE]
+    if hits is None:
+        page_arts = articles[offset: offset + PER_PAGE]
+    else:
+        page_arts = [articles[i] for i in hits[offset: offset + PER_PAGE]]
 
     # 4. 输出
     if request.args.get('format') == 'json':
@@ -47,10 +50,10 @@ def dataset_list_view():
             'page': page,
             'max_page': max_page,
             'search': search,
-            'data': [{'pmid': a.pmid,
-                      'title': a.title,
-                      'entities_cnt': len(a.entities),
-                      'relations_cnt': len(a.cids)} for a in page_arts]
+            'data': [{'pmid': a['pmid'],
+                      'title': a['title'],
+                      'entities_cnt': a['entities_cnt'],
+                      'relations_cnt': a['relations_cnt']} for a in page_arts]
         })
 
     # 5. HTML
@@ -65,14 +68,31 @@ def dataset_list_view():
                            active_page='dataset')
 
 
+# ---------- 统计 ----------
+@dataset_bp.route('/api/profile')
+def dataset_profile():
+    """
+    ?dataset=&file=（可选）：文档数、各类型实体 / 关系数、MeSH 数、句子 / 词 / 估算 token 分布，
+    按文件修改时间缓存，用于启动实验前估算规模和 LLM 成本
+    """
+    dataset = request.args.get('dataset', '')
+    file_name = request.args.get('file') or None
+    # 只接受 data/ 下已有的数据集和文件
+    files = load_datasets().get(dataset)
+    if files is None or (file_name and file_name not in files):
+        return jsonify({'error': 'Dataset or file not found'}), 404
+    return jsonify(load_profile(dataset, file_name))
+
+
 # ---------- 详情 ----------
 @dataset_bp.route('/detail/<pmid>')
 def dataset_get_doc(pmid):
     dataset = request.args.get('dataset')
     file_name = request.args.get('file')
-    parser = load_parser(dataset, file_name)
-    doc = parser.get(pmid)
-    if doc is None:
+    index = load_index(dataset, file_name) if dataset and file_name else None
+    # 按字节范围只读取这一篇
+    doc = index.get(pmid) if index else None
+    if not doc:
         return 'Document not found', 404
 
     full_text = doc['title'] + ' ' + doc['abstract']
@@ -5,11 +5,16 @@ from datetime import datetime
 from ui.components.paginated_api import get_paginated_data
 from service.result.loader import ResultLoader
 from dataclasses import is_dataclass,asdict
-from langchain_core.runnables import RunnableConfig
 
 from service.entity.test import TestLoader
 from service.meta.loader import MetaLoader
 from service.entity.runner import RunnerLoader
+from service.experiment.executor import DEFAULT_CONCURRENCY, DEFAULT_RUN_MODE, get_concurrency
+from service.experiment.job import JobManager
+from service.experiment.reevaluate import create_reevaluation
+from service.result.statistics import bootstrap_ci, paired_test, DEFAULT_RESAMPLES, DEFAULT_CONFIDENCE
+from service.result.errors import error_index
+from service.result.report import reportable
 exp_bp = Blueprint('exp', __name__, url_prefix='/exp')
 
 def render_list(search='',page=1,per_page=20):
@@ -42,6 +47,7 @@ def render_list(search='',page=1,per_page=20):
                 'running': '<span class="badge text-bg-primary">Running</span>',
                 'pending': '<span class="badge text-bg-warning">Pending</span>',
                 'failed': '<span class="badge text-bg-danger">Failed</span>',
+                'interrupted': '<span class="badge text-bg-secondary">Interrupted</span>',
             }.get(e.get('status', 'unknown').lower(), '<span class="badge text-bg-secondary">Unknown</span>'),
             'actions': f'''
                 <a href="/exp/delete/{e["exp_id"]}" class="btn btn-outline-danger" title="Delete" 
@@ -82,22 +88,24 @@ def render_html(template, runner_id,test_file,runner_type,runner_display, progre
         page_items, preview_page, preview_per_page, preview_total, _ = get_paginated_data(
                 raw_data,
                 per_page=preview_per_page,
-                search_fields=fields
+                search_fields=fields,
+                search_index=lambda: TestLoader.search_index(runner_id, test_file, fields, raw_data)
             )
-        results=ResultLoader.load(exp_id)
-        for idx, item in enumerate(page_items, start=(preview_page - 1) * preview_per_page + 1):
+        first = (preview_page - 1) * preview_per_page + 1
+        # 只按行号读取当前页的结果
+        results = ResultLoader.load_rows(exp_id, range(first, first + len(page_items))) if exp_id else {}
+        for idx, item in enumerate(page_items, start=first):
             if is_dataclass(item):
                 # 如果是 dataclass，使用 asdict() 转换为字典
                 item_dict = asdict(item)
             else:
                 item_dict = dict(item)  # 转 dict 方便加字段
             item_dict['#'] = idx  # 第一列序号
-            idx_str=str(idx)
-            if results and idx_str in results:
+            if idx in results:
                 item_dict['status'] = '<span class="badge text-bg-success">Completed</span>'
                 item_dict['actions'] = f'''<a class="btn btn-outline-info btn-replay" title="Replay" data-index='{idx}'>
                                                                                               <i class="fas fa-play"></i></a>'''
-                snapshots[idx] = results[idx_str]
+                snapshots[idx] = results[idx]
             else:
                 item_dict['status'] = '<span class="badge text-bg-warning">Pending</span>'
                 item_dict['actions'] = ''
@@ -154,7 +162,9 @@ def experiment_new():
         runner_type=runner_type,
         runner_display=runner_display,
         progress=0,
-        exp_id=''
+        exp_id='',
+        concurrency=DEFAULT_CONCURRENCY,
+        status='pending'
     )
 
 @exp_bp.route('/delete/<exp_id>',methods=["GET"])
@@ -184,10 +194,27 @@ def experiment_detail(exp_id):
         runner_type=runner_type,
         runner_display=runner_display,
         exp_id=exp_cfg['exp_id'],
-        progress=exp_cfg['progress']
+        progress=exp_cfg['progress'],
+        concurrency=get_concurrency(exp_cfg),
+        status=JobManager.saved_status(exp_cfg),
+        reportable=reportable(exp_cfg),
+        llm_cache=exp_cfg.get('llm_cache'),
+        node_cache=exp_cfg.get('node_cache', False),
+        node_report=exp_cfg.get('node_report'),
+        graph_nodes=_graph_nodes(exp_cfg),
+        source_exp=exp_cfg.get('source_exp'),
+        start_node=exp_cfg.get('start_node')
     )
 
 
+def _graph_nodes(exp_cfg):
+    """图实验可作为重新评估起点的节点"""
+    if exp_cfg.get('runner_type') != 'graph':
+        return []
+    graph = MetaLoader.load("graphs", exp_cfg['runner_id']) or {}
+    return [n for n in graph.get('nodes', []) if n not in ('START', 'END')]
+
+
 @exp_bp.route('/api/save', methods=['POST'])
 def experiment_save():
     try:
@@ -207,6 +234,7 @@ def experiment_save():
             data["name"]= f"{data['runner_id']}_{data['dataset']}_{datetime.now().strftime('%Y%m%d%H%M%S')}"
             data['status']="pending"  # 后续可以改成 running/completed/failed
             data["progress"]=0
+            data["concurrency"]=get_concurrency(data)
             MetaLoader.dump("exps", data['exp_id'], data)
         else:
             exp_id=data['exp_id']
@@ -226,20 +254,6 @@ def experiment_save():
         return jsonify({"success": False, "error": str(e)}), 500
 
 
-async def _run_with_saver( exp_id, exp_cfg, dataset):
-    runner_id=exp_cfg['runner_id']
-    runner=RunnerLoader.aload(runner_id)
-    #runner= load_graph(runner_id, saver) if exp_cfg['runner_type']=='graph' else get_agent(runner_id,saver)
-    fields, data= TestLoader.load_by_id_file(runner_id,dataset)
-    for idx, row in enumerate(data):
-        input_dict = dict(zip(fields, row))
-        config: RunnableConfig = {"configurable": {"thread_id": f'{exp_id}_{idx}'} }
-        await runner.ainvoke(input_dict,config=config)
-
-
-async def run_experiment_background(exp_id, exp_cfg, dataset):
-        await _run_with_saver(exp_id, exp_cfg, dataset)
-
 # 启动端点
 @exp_bp.route('/api/update', methods=['POST'])
 async def update_exp():
@@ -247,13 +261,15 @@ async def update_exp():
     exp_id=data['exp_id']
     exp_cfg = MetaLoader.load("exps",exp_id)
 
+    mode = data.pop('mode', DEFAULT_RUN_MODE)
     MetaLoader.update("exps",exp_id,data)
-    if data['status']=='completed':
+    if data['status']=='running':
+        # 立即启动后台任务，浏览器只通过 /stream/run/<exp_id> 订阅进度
+        JobManager.submit(exp_id, mode)
+    elif data['status']=='completed':
         #perststence state
         exp_cfg = MetaLoader.load("exps", exp_id)
         RunnerLoader.persistence(exp_cfg)
-    # 立即启动后台任务
-    #asyncio.create_task(run_experiment_background(exp_id, exp_cfg, dataset))
 
     return jsonify({
         'success': True,
@@ -261,3 +277,83 @@ async def update_exp():
         'message': 'Experiment started in background',
     })
 
+
+
+@exp_bp.route('/api/reevaluate', methods=['POST'])
+def reevaluate_exp():
+    """从已完成实验的某个节点开始重新评估：{exp_id, start_node, agent?}，结果写入新实验"""
+    data = request.get_json(force=True) or {}
+    if not data.get('exp_id') or not data.get('start_node'):
+        return jsonify({"success": False, "error": "Missing fields: exp_id, start_node"}), 400
+    try:
+        exp_cfg = create_reevaluation(data['exp_id'], data['start_node'], data.get('agent'))
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    # 与 /api/update 一样先标记为 running，跳转后的页面会直接订阅进度
+    MetaLoader.update("exps", exp_cfg['exp_id'], {'status': 'running'})
+    JobManager.submit(exp_cfg['exp_id'], 'all')
+    return jsonify({
+        'success': True,
+        'exp_id': exp_cfg['exp_id'],
+        'message': 'Re-evaluation started in background',
+    })
+
+
+def _stats_params():
+    """只做类型转换；取值范围（resamples ≤ MAX_RESAMPLES、0 < confidence < 1）由 statistics 校验"""
+    try:
+        resamples = int(request.args.get('resamples', DEFAULT_RESAMPLES))
+    except ValueError:
+        raise ValueError("resamples must be an integer")
+    try:
+        confidence = float(request.args.get('confidence', DEFAULT_CONFIDENCE))
+    except ValueError:
+        raise ValueError("confidence must be a number")
+    return resamples, confidence
+
+
+@exp_bp.route('/api/stats/<exp_id>', methods=['GET'])
+def experiment_stats(exp_id):
+    """micro / macro F1 的 bootstrap 置信区间：?resamples=10000&confidence=0.95"""
+    try:
+        resamples, confidence = _stats_params()
+        return jsonify({"success": True, **bootstrap_ci(exp_id, resamples, confidence)})
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+
+
+@exp_bp.route('/api/compare', methods=['GET'])
+def experiment_compare():
+    """两个实验的配对检验：?a=<exp_id>&b=<exp_id>&method=bootstrap|permutation&resamples=10000"""
+    a, b = request.args.get('a', '').strip(), request.args.get('b', '').strip()
+    if not a or not b:
+        return jsonify({"success": False, "error": "Missing fields: a, b"}), 400
+    try:
+        resamples, confidence = _stats_params()
+        result = paired_test(a, b, request.args.get('method', 'bootstrap'), resamples, confidence)
+        return jsonify({"success": True, **result})
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+
+
+@exp_bp.route('/api/errors/<exp_id>', methods=['GET'])
+def experiment_errors(exp_id):
+    """
+    错误分析：?by=surface|label|mesh|doc&kind=fp|fn&label=&q=&page=1&per_page=20
+    给出 key 时返回该 key 的错误明细
+    """
+    exp_cfg = MetaLoader.load("exps", exp_id)
+    if not exp_cfg:
+        return jsonify({"success": False, "error": f"Experiment {exp_id} not found"}), 404
+    args = request.args
+    by = args.get('by', 'surface')
+    try:
+        index = error_index(exp_cfg)
+        if 'key' in args:
+            return jsonify({"success": True, "by": by, "key": args['key'],
+                            "records": index.records(by, args['key'], int(args.get('limit', 100)))})
+        result = index.query(by, args.get('kind') or None, args.get('label') or None, args.get('q') or None,
+                             int(args.get('page', 1)), int(args.get('per_page', 20)))
+        return jsonify({"success": True, **result})
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
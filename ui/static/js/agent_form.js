@@ -244,6 +244,7 @@ $('#llmConfigSelect').on('change', function() {
         if (formData.type==='SUB'){
             const idx= $('#indexForLoop').val();
             if (idx) formData.idx=parseCommaList(idx);
+            formData.concurrency=parseInt($('#subConcurrency').val(), 10) || 1;
         }
         return formData;
     }
@@ -36,6 +36,12 @@ $(document).ready(function () {
             });
     });
 
+    // 实验仍在后台运行时，重新订阅进度
+    if (expId && expStatus === 'running') {
+        $('#runExpBtn').addClass('d-none').hide();
+        stream(expId);
+    }
+
     observer.observe(runnerType[0], {attributes: true, childList: true, subtree: true});
     observer.observe(runnerId[0], {attributes: true, childList: true, subtree: true});
 
@@ -59,7 +65,7 @@ $(document).ready(function () {
 
     $(document).on('shown.bs.tab', 'a[data-bs-toggle="tab"]', function (e) {
         const paneId = $(e.target).attr('href');   // 例如 "#report"
-        if(paneId==='#report' && expId && progress===100 ) {
+        if(paneId==='#report' && expId && expReportable) {
             renderReport(expId);
         }
     });
@@ -98,6 +104,8 @@ $('#expForm').submit(function (e) {
         runner_id: $('#runnerId').val(),
         runner_display: $('#runnerDisplay').val(),
         samples: $('#datasetSelect').find(':selected').data('samples') || 0,
+        concurrency: parseInt($('#concurrencyInput').val(), 10) || undefined,
+        node_cache: $('#nodeCacheInput').is(':checked'),
         exp_id: $('#exp_id').data('id')
     };
 
@@ -139,7 +147,7 @@ function start_task(exp_id){
         url: `/exp/api/update`,
         type: 'POST',
         contentType: 'application/json',
-        data: JSON.stringify({ "exp_id": exp_id, "status": "running" ,"progress": 0}),
+        data: JSON.stringify({ "exp_id": exp_id, "status": "running", "mode": $('#runModeSelect').val() || 'resume' }),
         success: function (resp) {
             if (resp.success) {
                 //start stream
@@ -155,27 +163,46 @@ function start_task(exp_id){
     });
 }
 
-function complete_task(exp_id,progress,status){
-    if(status!=='failed'){
-        status='completed';
+$(document).on('click', '#llmReportBtn', function () {
+    renderReport($('#exp_id').data('id'), true);
+});
+
+// 重新评估：创建新实验并跳转，新实验在后台运行
+$(document).on('click', '#reevaluateBtn', function () {
+    const payload = {
+        exp_id: $('#exp_id').data('id'),
+        start_node: $('#startNodeSelect').val()
+    };
+    const agentText = $('#agentOverrideInput').val().trim();
+    if (agentText) {
+        try {
+            payload.agent = JSON.parse(agentText);
+        } catch (e) {
+            alert('Agent definition is not valid JSON: ' + e.message);
+            return;
+        }
     }
     $.ajax({
-        url: `/exp/api/update`,
+        url: '/exp/api/reevaluate',
         type: 'POST',
         contentType: 'application/json',
-        data: JSON.stringify({ "exp_id": exp_id, "status":status,"progress":progress }),
+        data: JSON.stringify(payload),
         success: function (resp) {
             if (resp.success) {
-                window.location.href = `/exp/${exp_id}`;
+                window.location.href = `/exp/${resp.exp_id}`;
             } else {
-                alert('Save Failed: ' + (resp.error || 'unknown error'));
+                alert('Re-evaluate Failed: ' + (resp.error || 'unknown error'));
             }
         },
         error: function (xhr) {
-            console.error(xhr);
-            alert('Request failed: ' + xhr.status + ' ' + xhr.statusText);
+            alert('Re-evaluate Failed: ' + (xhr.responseJSON?.error || xhr.status + ' ' + xhr.statusText));
         }
     });
+});
+
+function complete_task(exp_id){
+    // 状态与进度由后台任务写回，这里只刷新页面
+    window.location.href = `/exp/${exp_id}`;
 }
 
 
@@ -254,6 +281,7 @@ function freezeInputAndLink(){
 function stream(exp_id){
     let current_process=0;
     let current_status='pending';
+    let final_status=null;   // 后台任务结束时最后一条消息（final）带的实验状态
         /* 4. 关闭旧连接 */
     updateProgress(current_process);
     freezeInputAndLink();
@@ -263,12 +291,22 @@ function stream(exp_id){
     window.agentEventSource.onmessage = e => {
         if (e.data === '[DONE]') {
             window.agentEventSource.close();
-            complete_task(exp_id,current_process,current_status)
+            // 只有收到结束状态且不是 running 时才刷新，否则没有后台任务的实验会反复刷新
+            if (final_status && final_status !== 'running') {
+                complete_task(exp_id);
+            } else {
+                $('#runExpBtn').removeClass('d-none').show();
+            }
             return;
         }
         try {
             const msg = JSON.parse(e.data);  // 后端推 JSON 更灵活
-            if(msg.status==='failed'){
+            if (msg.final) {
+                final_status = msg.status;
+                if (msg.error) {
+                    $('#error_message').text(msg.error);
+                }
+            } else if(msg.status==='failed'){
                $('#error_message').text(msg.error);
                current_status='failed';
             }else{
@@ -293,12 +331,14 @@ function stream(exp_id){
 
 
 
-function renderReport(exp_id) {
-    $('#reportMarkdown').html('<span class="spinner-border spinner-border-sm" role="status" aria-hidden="true"></span> Make report...');
+// withLlm: 在表格报告之后再由 make_report agent 写分析（较慢）
+function renderReport(exp_id, withLlm) {
+    const spinner = '<span class="spinner-border spinner-border-sm" role="status" aria-hidden="true"></span>';
+    $('#reportMarkdown').html(spinner + ' Make report...');
     window.agentEventSource?.close();
     let buffer = '';
     /* 6. 新开 SSE */
-    window.agentEventSource = new EventSource(`/stream/report/${exp_id}`);
+    window.agentEventSource = new EventSource(`/stream/report/${exp_id}` + (withLlm ? '?llm=1' : ''));
     window.agentEventSource.onmessage = e => {
         if (e.data === '[DONE]') {
             $('#reportMarkdown').html(marked.parse(buffer));  // 实时解析成 HTML
@@ -306,6 +346,8 @@ function renderReport(exp_id) {
             return;
         }
         buffer+=e.data.replace(/\\n/g,'\n');
+        // 表格报告先显示，LLM 分析到达后追加
+        $('#reportMarkdown').html(marked.parse(buffer) + (withLlm ? spinner + ' Analysing...' : ''));
     };
     window.agentEventSource.onerror = err => {
         console.error('SSE error:', err);
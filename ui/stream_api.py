@@ -6,10 +6,10 @@ from service.meta.loader import MetaLoader
 from service.entity.agent import AgentLoader
 from service.result.loader import ResultLoader
 from service.entity.runner import RunnerLoader
-from plugin.plugin_loader import get_plugin
+from service.experiment.job import JobManager
+from service.result.report import build_report, reportable
 import json
 from datetime import datetime
-import asyncio
 sse_bp = Blueprint('sse', __name__, url_prefix='/stream')
 
 def process(chunk):
@@ -62,60 +62,29 @@ def stream_test():
     config: RunnableConfig = {"configurable": {"thread_id": f'test_{datetime_str}'}}
     return run(target_id, scope, form_data,config)
 
-def _is_metrics_list(obj) -> bool:
-    """
-    判断是否为 {idx: {'f1': float, 'precision': float, 'recall': float}, ...}
-    """
-    if not isinstance(obj, dict):
-        return False
-    # 空 dict 也算合格
-    if not obj:
-        return True
-    # 抽检第一个 value
-    sample = next(iter(obj.values()))
-    return (
-        isinstance(sample, dict) and
-        {'f1', 'precision', 'recall'}.issubset(sample.keys())
-    )
-
 @sse_bp.route('/report/<exp_id>', methods=['GET'])
 def stream_report(exp_id):
+    """
+    默认直接由已保存的结果生成 Markdown 报告；?llm=1 时再把该报告交给 make_report agent 写分析。
+    """
     exp_cfg=MetaLoader.load("exps",exp_id)
-    if exp_cfg['status']!='completed':
-        error= f"The experiment {exp_id} is not completed yet."
-        Response(error, mimetype='text/event-stream')
-    snapshots={}
-    results=ResultLoader.load(exp_id)
-    if not results:
-        dataset = exp_cfg['dataset']
-        runner_id = exp_cfg['runner_id']
-        fields, data = TestLoader.load_by_id_file(runner_id, dataset)
-        runner = RunnerLoader.load(runner_id)
-        for idx, data in enumerate(data, start=1):
-                config: RunnableConfig = {"configurable": {"thread_id": f'{exp_id}_{idx}'}}
-                state = runner.get_state(config)
-                if isinstance(state.values, dict) and 'metrics' in state.values.keys():
-                    snapshots[str(idx)] = state.values['metrics']
-                else:
-                    snapshots[str(idx)] = state.values
-    else:
-        for idx in results:
-            if isinstance(results[idx], dict) and 'metrics' in results[idx]:
-                snapshots[idx] = results[idx]['metrics']
-
-    input = {}
-    agent=AgentLoader.load('make_report')
-    if len(snapshots)>20 and  _is_metrics_list(snapshots): # 符合 metrics 格式
-            calculator=get_plugin('MetricsCalculation')
-            result=calculator.compute_micro_macro(snapshots)
-            input={'text': result}
-    else:
-            input={'text': snapshots}
+    if not exp_cfg or not reportable(exp_cfg):
+        error= f"The experiment {exp_id} has no results to report yet."
+        return Response(f"data: {error}\n\ndata: [DONE]\n\n", mimetype='text/event-stream')
+    if not ResultLoader.indices(exp_id):
+        # 结果文件缺失时从 checkpointer 补写一次
+        RunnerLoader.persistence(exp_cfg)
+    report = build_report(exp_id, exp_cfg)
+    with_llm = request.args.get('llm') in ('1', 'true')
 
     def generate():
-        chunk=agent.invoke(input)
-        safe_chunk = chunk['text'].replace("\n", "\\n")
-        yield f"data: {safe_chunk}\n\n"
+        safe_report = report.replace("\n", "\\n")
+        yield f"data: {safe_report}\n\n"
+        if with_llm:
+            agent=AgentLoader.load('make_report')
+            chunk=agent.invoke({'text': report})
+            safe_chunk = ("\n## Analysis\n\n" + chunk['text']).replace("\n", "\\n")
+            yield f"data: {safe_chunk}\n\n"
         yield "data: [DONE]\n\n"
     return Response(generate(),mimetype='text/event-stream')
 
@@ -123,89 +92,23 @@ def stream_report(exp_id):
 
 @sse_bp.route('/run/<exp_id>', methods=['GET'])
 def stream_exp_batch(exp_id):
+    """只订阅后台任务的进度；实验由 /exp/api/update (status=running) 启动"""
     exp_cfg = MetaLoader.load("exps",exp_id)
-    dataset = exp_cfg['dataset']
-    runner_id = exp_cfg['runner_id']
-    fields, data = TestLoader.load_by_id_file(runner_id, dataset)
-    total = len(data)
-
-    async def event_generator(exp_id):
-
-            runner = await RunnerLoader.aload(runner_id)
-            #runner = load_graph(runner_id, saver) if exp_cfg['runner_type'] == 'graph' else load_agent_as_graph(runner_id, saver)
-            completed = 0
-            for idx, row in enumerate(data, start=1):
-                config: RunnableConfig = {"configurable": {"thread_id": f'{exp_id}_{idx}'}}
-                try:
-                    async for event in await runner.astream_events(row, config=config):
-                        tags = event.get("tags", [])
-                        if event["event"] == "on_chain_end" and tags == []:
-                            completed += 1
-                            msg = {
-                                'status': 'completed',
-                                'percent': int(completed / total * 100),
-                                'completed': completed,
-                                'total': total,
-                                'current_index': idx  # 添加当前处理的索引
-
-                            }
-                        else:
-                            msg = {
-                                'status': 'running',
-                                'percent': int(completed / total * 100),
-                                'completed': completed,
-                                'total': total,
-                                'current_index': idx  # 添加当前处理的索引
-                            }
-                        yield f'data: {json.dumps(msg)}\n\n'
-                except asyncio.CancelledError:
-                    # 客户端断开连接，正常退出
-                    raise
-                except Exception as e:
-                    msg = {
-                        'status': 'failed',
-                        'percent': int(completed / total * 100),
-                        'completed': completed,
-                        'total': total,
-                        'current_index': idx, # 添加当前处理的索引
-                        'error': str(e)
-                    }
-                    yield f'data: {json.dumps(msg)}\n\n'
-            yield 'data: [DONE]\n\n'
-
+    if not exp_cfg:
+        return jsonify({'result': f'Experiment {exp_id} not found'}), 404
 
     def generate():
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        gen = event_generator(exp_id)
-        try:
-            while True:
-                try:
-                    data = loop.run_until_complete(anext(gen))
-                    yield data
-                except StopAsyncIteration:
-                    break
-                except GeneratorExit:
-                    # 客户端关闭连接
-                    break
-                except asyncio.CancelledError:
-                    break
-        finally:
-            # 确保事件循环正确关闭（关键！）
-            try:
-                # 取消所有 pending tasks
-                pending = asyncio.all_tasks(loop)
-                for task in pending:
-                    task.cancel()
-
-                if pending:
-                    loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
-
-                loop.run_until_complete(loop.shutdown_asyncgens())
-                loop.close()
-            except Exception as e:
-                pass
-
+        if JobManager.get(exp_id) is None:
+            # 没有后台任务（例如服务重启后），只回报已保存的状态；残留的 running 改为 interrupted
+            msg = {'status': JobManager.saved_status(exp_cfg), 'percent': exp_cfg.get('progress', 0), 'final': True}
+            yield f'data: {json.dumps(msg)}\n\n'
+        else:
+            for msg in JobManager.subscribe(exp_id):
+                if msg is None:
+                    yield ': keep-alive\n\n'
+                    continue
+                yield f'data: {json.dumps(msg)}\n\n'
+        yield 'data: [DONE]\n\n'
 
     return Response(generate(),mimetype='text/event-stream')
 
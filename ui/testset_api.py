@@ -157,7 +157,8 @@ def api_testset_preview(runner_id, filename):
     page_items, page, per_page, total, search = get_paginated_data(
         raw_data,
         per_page=int(request.args.get('per_page', 20)),
-        search_fields=fields  # 支持所有字段搜索
+        search_fields=fields,  # 支持所有字段搜索
+        search_index=lambda: TestLoader.search_index(runner_id, filename, fields, raw_data)
     )
 
     # 3. 返回标准结构
@@ -93,3 +93,41 @@ def create_graph(agent,checkpointer=None):
 
 
 
+
+
+def _sources(src) -> List[str]:
+    return src if isinstance(src, list) else [src]
+
+
+def downstream_nodes(graph: Dict[str, Any], start_node: str) -> List[str]:
+    """start_node 及其全部下游节点，按 graph['nodes'] 中的顺序返回"""
+    if start_node not in graph["nodes"]:
+        raise ValueError(f"Node {start_node} is not in graph {graph.get('id')}")
+    reached = {start_node}
+    frontier = [start_node]
+    while frontier:
+        node = frontier.pop()
+        for src, tgt in graph["edges"]:
+            if node in _sources(src) and tgt != "END" and tgt not in reached:
+                reached.add(tgt)
+                frontier.append(tgt)
+    return [n for n in graph["nodes"] if n in reached]
+
+
+def partial_edges(graph: Dict[str, Any], start_node: str) -> List[Any]:
+    """
+    只包含 start_node 及其下游节点的边：START 直接连到 start_node；
+    来自上游节点的边去掉（汇合边只保留下游内的来源），上游输出由输入 state 提供。
+    """
+    keep = set(downstream_nodes(graph, start_node))
+    edges = [["START", start_node]]
+    for src, tgt in graph["edges"]:
+        if tgt != "END" and tgt not in keep:
+            continue
+        inside = [s for s in _sources(src) if s in keep]
+        if not inside:
+            continue
+        edge = [inside if isinstance(src, list) and len(inside) > 1 else inside[0], tgt]
+        if edge not in edges:
+            edges.append(edge)
+    return edges
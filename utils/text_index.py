@@ -0,0 +1,193 @@
+#utils/text_index.py
+import hashlib
+import json
+import re
+import threading
+from itertools import chain
+from logging import getLogger
+from pathlib import Path
+from typing import Dict, Any, List, Callable
+import numpy as np
+
+logger = getLogger(__name__)
+
+# 数据文件旁的倒排索引：<file>.search.npz
+INDEX_SUFFIX = '.search.npz'
+_VERSION = 1
+_TOKEN = re.compile(r'\w+')
+_TOP = '\U0010ffff'   # 前缀查询的上界
+
+# 进程内缓存：{文件路径: (stamp, TextIndex)}
+_indexes: Dict[str, tuple[tuple, "TextIndex"]] = {}
+_lock = threading.Lock()
+
+
+def flatten(value: Any) -> str:
+    """dict / list 只取叶子值，避免字段名（text、mesh 等）成为每篇文档都有的词"""
+    if isinstance(value, dict):
+        return ' '.join(flatten(v) for v in value.values())
+    if isinstance(value, (list, tuple, set)):
+        return ' '.join(flatten(v) for v in value)
+    return '' if value is None else str(value)
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN.findall(text.lower())
+
+
+def _doc_tokens(doc: str | Dict[str, str]) -> set:
+    """文档可以是字符串，或 {字段: 文本}；字段内的词同时以 `字段:词` 收录，支持按字段检索"""
+    if isinstance(doc, str):
+        return set(tokenize(doc))
+    tokens = set()
+    for name, text in doc.items():
+        words = tokenize(text)
+        tokens.update(words)
+        tokens.update(f'{name}:{w}' for w in words)
+    return tokens
+
+
+class TextIndex:
+    """
+    词 → 文档位置 的倒排索引。
+    tokens 按字典序排列，postings 按 (词, 文档) 排序后拼接，offsets[i]:offsets[i+1] 为第 i 个词的文档；
+    同一前缀的词在 tokens 中相邻，因此前缀查询只需两次二分查找和一段连续的 postings。
+    """
+
+    def __init__(self, tokens: np.ndarray, offsets: np.ndarray, postings: np.ndarray, keys: List[str]):
+        self.tokens = tokens
+        self.offsets = offsets
+        self.postings = postings
+        self.keys = keys
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def _prefix(self, prefix: str, mask: np.ndarray) -> None:
+        """把前缀匹配的全部文档标记到 mask（不排序去重，短前缀匹配大量词时也是线性的）"""
+        lo = int(np.searchsorted(self.tokens, prefix, 'left'))
+        hi = int(np.searchsorted(self.tokens, prefix + _TOP, 'left'))
+        mask[self.postings[self.offsets[lo]:self.offsets[hi]]] = True
+
+    def search(self, query: str) -> np.ndarray:
+        """
+        返回匹配文档的位置（升序）。每个词按前缀匹配，多个词取交集；
+        `字段:值`（如 mesh:D0087、entities:cocaine）只在该字段中匹配。
+        """
+        terms = []
+        for part in query.lower().split():
+            name, sep, value = part.partition(':')
+            if sep and value:
+                terms += [f'{name}:{w}' for w in tokenize(value)]
+            else:
+                terms += tokenize(part)
+        if not terms:
+            return np.arange(0)
+        hits = None
+        match = np.zeros(len(self.keys), dtype=bool)
+        # 先算最长（通常最稀有）的词，没有结果时提前结束
+        for term in sorted(set(terms), key=len, reverse=True):
+            match[:] = False
+            self._prefix(term, match)
+            hits = match.copy() if hits is None else hits & match
+            if not hits.any():
+                break
+        return np.flatnonzero(hits)
+
+
+def _merge(old: "TextIndex | None", reuse: int, docs: List[set], keys: List[str]) -> TextIndex:
+    """沿用旧索引前 reuse 篇文档的 postings，加入新分词的文档，重新排序"""
+    # 词表用 dict 编号，只对去重后的词排序，避免对全部 (词, 文档) 对做字符串排序
+    ids: Dict[str, int] = {}
+    if old is not None:
+        ids.update((t, i) for i, t in enumerate(old.tokens.tolist()))
+    for t in set().union(*docs).difference(ids):
+        ids[t] = len(ids)
+    new_ids = np.fromiter(map(ids.__getitem__, chain.from_iterable(docs)), dtype=np.int64)
+    new_docs = np.repeat(np.arange(reuse, reuse + len(docs), dtype=np.int32), [len(t) for t in docs])
+    if old is not None:
+        old_ids = np.repeat(np.arange(len(old.tokens)), np.diff(old.offsets))
+        keep = old.postings < reuse
+        old_ids, old_docs = old_ids[keep], old.postings[keep]
+    else:
+        old_ids, old_docs = np.array([], dtype=np.int64), np.array([], dtype=np.int32)
+    token_ids = np.concatenate([old_ids, new_ids])
+    # 去掉已没有文档的词（只出现在被替换的旧文档中），其余按字典序重新编号
+    used = np.bincount(token_ids, minlength=len(ids)) > 0
+    words = np.array(list(ids), dtype=str)[used]
+    rank = np.full(len(ids), -1, dtype=np.int64)
+    rank[np.flatnonzero(used)[np.argsort(words, kind='stable')]] = np.arange(len(words))
+    token_ids = rank[token_ids]
+    vocab = np.sort(words)
+    doc_ids = np.concatenate([old_docs.astype(np.int32), new_docs])
+    # 旧 postings 已按 (词, 文档) 排好，新文档位置递增且都在旧文档之后，按词稳定排序即可
+    order = np.argsort(token_ids, kind='stable')
+    offsets = np.zeros(len(vocab) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(token_ids, minlength=len(vocab)), out=offsets[1:])
+    return TextIndex(vocab, offsets, doc_ids[order], keys)
+
+
+def _load(file: Path) -> tuple[tuple, TextIndex] | None:
+    try:
+        with np.load(file, allow_pickle=False) as data:
+            meta = json.loads(str(data['meta']))
+            if meta.get('version') != _VERSION:
+                return None
+            index = TextIndex(data['tokens'], data['offsets'], data['postings'], data['keys'].tolist())
+            return tuple(tuple(s) for s in meta['stamp']), index
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, KeyError) as e:
+        logger.warning("Search index %s is unreadable, rebuilding: %s", file, e)
+        return None
+
+
+def _dump(file: Path, stamp: tuple, index: TextIndex) -> None:
+    meta = json.dumps({'version': _VERSION, 'stamp': stamp})
+    try:
+        with open(file, 'wb') as f:
+            np.savez(f, meta=np.array(meta), tokens=index.tokens, offsets=index.offsets,
+                     postings=index.postings, keys=np.array(index.keys, dtype=str))
+    except OSError as e:
+        logger.warning("Write search index %s failed: %s", file, e)
+
+
+def text_index(path: Path, stamp: tuple, count: int, text: Callable[[int], str | Dict[str, str]],
+               key: Callable[[int], str] | None = None) -> TextIndex:
+    """
+    读取或构建 path 的倒排索引：内存缓存 → <path>.search.npz → 构建。
+    stamp 变化时增量重建：key(i) 为第 i 篇文档的标识（默认取文本的哈希），
+    与旧索引相同的前缀部分沿用旧的 postings，只对之后的文档分词。
+    """
+    path = Path(path)
+    cache_key = str(path.resolve())
+    with _lock:
+        hit = _indexes.get(cache_key)
+    if hit and hit[0] == stamp:
+        return hit[1]
+    file = path.with_name(path.name + INDEX_SUFFIX)
+    loaded = hit or _load(file)
+    if loaded and loaded[0] == stamp:
+        index = loaded[1]
+    else:
+        old = loaded[1] if loaded else None
+        texts: Dict[int, Any] = {}
+        if key is None:
+            def key(i):
+                texts[i] = text(i)
+                raw = texts[i] if isinstance(texts[i], str) else json.dumps(texts[i], sort_keys=True)
+                return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+        keys = [key(i) for i in range(count)]
+        reuse = 0
+        if old is not None:
+            for a, b in zip(old.keys, keys):
+                if a != b:
+                    break
+                reuse += 1
+        docs = [_doc_tokens(texts[i] if i in texts else text(i)) for i in range(reuse, count)]
+        index = _merge(old, reuse, docs, keys)
+        logger.info("Search index %s: reused %d, indexed %d documents", path.name, reuse, count - reuse)
+        _dump(file, stamp, index)
+    with _lock:
+        _indexes[cache_key] = (stamp, index)
+    return index